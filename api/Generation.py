@@ -1,89 +1,215 @@
-import openai
 import re
-import pandas as pd
 import random
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import time
+import hashlib
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from llm_cache import get_llm_cache
+from token_budget import DOCUMENT_TOKEN_BUDGET, compact_documents, estimate_usage, log_usage
+import hedge
+import metrics
+import singleflight
+from vote_log import get_vote_log
 
 random.seed(7180)
 
-OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
-openai.api_key = OPEN_AI_API_KEY
-
 model = "text-embedding-ada-002"
 
+# Seconds a judge may take before it is counted as abstaining
+JUDGE_TIMEOUT = float(os.getenv("JUDGE_TIMEOUT", "30"))
+
+# Shared pool so judges of one round run concurrently without per-request setup
+judge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("JUDGE_WORKERS", "32")), thread_name_prefix="judge"
+)
+
+# Adaptive voting: the second round is skipped when the first-round winner
+# leads the runner-up by at least VOTE_MARGIN of the votes one diagnosis can
+# get; a round stops waiting once VOTE_QUORUM judges rank the same diagnosis
+# first (0 turns the quorum off)
+ADAPTIVE_VOTING = os.getenv("ADAPTIVE_VOTING", "1") == "1"
+VOTE_MARGIN = float(os.getenv("VOTE_MARGIN", "0.3"))
+VOTE_QUORUM = int(os.getenv("VOTE_QUORUM", "0"))
+MAX_LIKELIHOOD = 5
+
+# final_agent samples above LLM_CACHE_MAX_TEMPERATURE but opts in to the
+# LLM cache, so a repeated /api/analyze with the same inputs gets the answer
+# already given; LLM_CACHE_FINAL=0 samples every answer afresh
+CACHE_FINAL = os.getenv("LLM_CACHE_FINAL", "1") == "1"
+
+# Caps concurrent follow-up requests made by the batch endpoint
+followup_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FOLLOWUP_CONCURRENCY", "8")), thread_name_prefix="followup"
+)
+
+
+def record_usage(agent, model, response):
+    """Log the call's token usage and add it to the llm_tokens_total counter.
+
+    Replies answered from the LLM cache spent no tokens and are skipped.
+    """
+    if response.get("cached"):
+        return {}
+    usage = log_usage(agent, model, response)
+    for kind in ("prompt", "completion"):
+        metrics.registry.inc(
+            "llm_tokens_total", usage.get(f"{kind}_tokens", 0), agent=agent, model=model, type=kind
+        )
+
 
 def normalize_diagnosis(diagnosis):
     return re.sub(r"[-–]", "-", diagnosis.strip().lower())
 
 
 # introduce agents
-def followup_agent(input_text, candidates):
-    try:
-        # Construct the dynamic prompt
-        # candidate_list = "\n".join(
-        #     [f"- {topic}: {summary}" for topic, summary in candidates.items()]
-        # )
-        candidate_list = "\n".join(
-            [f"- {topic}: {summary[:50]}" for topic, summary in candidates.items()]
-        )
+def followup_messages(input_text, candidates):
+    # Construct the dynamic prompt
+    # candidate_list = "\n".join(
+    #     [f"- {topic}: {summary}" for topic, summary in candidates.items()]
+    # )
+    candidate_list = "\n".join(
+        [f"- {topic}: {summary[:50]}" for topic, summary in candidates.items()]
+    )
 
-        prompt = (
-            f"User input:{input_text}\n"
-            f"Candidates:\n{candidate_list}\n"
-            "Based on the input and candidates, generate clear, concise, and "
-            "distinguishable follow-up questions that help refine the selection of the most relevant candidate. "
-            "Focus on clinical relevance, behavioral patterns, environmental factors, and distinguishing details. "
-            "Do not include statements such as: 'These questions aim to differentiate between potential OCD "
-            "characteristics and other disorders like insomnia-related issues or neurodevelopmental conditions such as Tourette syndrome.'"
-        )
+    prompt = (
+        f"User input:{input_text}\n"
+        f"Candidates:\n{candidate_list}\n"
+        "Based on the input and candidates, generate clear, concise, and "
+        "distinguishable follow-up questions that help refine the selection of the most relevant candidate. "
+        "Focus on clinical relevance, behavioral patterns, environmental factors, and distinguishing details. "
+        "Do not include statements such as: 'These questions aim to differentiate between potential OCD "
+        "characteristics and other disorders like insomnia-related issues or neurodevelopmental conditions such as Tourette syndrome.'"
+    )
+
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an independent diagnostic assistant based on DSM-5 principles. "
+                "Your role is to ask clear, concise, and distinguishable follow-up questions "
+                "that help refine the selection of the most relevant psychological answer. "
+                "Hard Limit the questions to five questions. Each question should be ended with a question mark, and no question mark within the questions "
+                "Avoid making references to the purpose of the questions or comparisons with other disorders."
+            ),
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+FOLLOWUP_PARAMS = dict(
+    model="gpt-4o",
+    temperature=0.7,  # Slight randomness for diverse follow-up questions
+    max_tokens=500,  # Adjust based on the expected length of the response
+    top_p=1.0,  # Nucleus sampling for high-quality outputs
+    frequency_penalty=0.5,  # Reduce redundancy
+    presence_penalty=0.0,  # Neutral presence penalty
+)
+
+
+class QuestionParser:
+    """Split streamed follow-up text into questions as each "?" arrives.
+
+    Produces the same list as splitting the complete text on "?".
+    """
+
+    def __init__(self):
+        self._pending = ""
 
+    def feed(self, text):
+        """Add a chunk of text; return the questions it completed."""
+        *questions, self._pending = (self._pending + text).split("?")
+        return [q.strip() + "?" for q in questions if q.strip()]
+
+    def close(self):
+        """Return the trailing question that had no "?" (if any)."""
+        rest, self._pending = self._pending.strip(), ""
+        return [rest + "?"] if rest else []
+
+
+@metrics.timed("followup_agent")
+def followup_agent(input_text, candidates):
+    try:
         # Query the OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an independent diagnostic assistant based on DSM-5 principles. "
-                        "Your role is to ask clear, concise, and distinguishable follow-up questions "
-                        "that help refine the selection of the most relevant psychological answer. "
-                        "Hard Limit the questions to five questions. Each question should be ended with a question mark, and no question mark within the questions "
-                        "Avoid making references to the purpose of the questions or comparisons with other disorders."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,  # Slight randomness for diverse follow-up questions
-            max_tokens=500,  # Adjust based on the expected length of the response
-            top_p=1.0,  # Nucleus sampling for high-quality outputs
-            frequency_penalty=0.5,  # Reduce redundancy
-            presence_penalty=0.0,  # Neutral presence penalty
+        model, response = hedge.create(
+            "followup_agent", messages=followup_messages(input_text, candidates), **FOLLOWUP_PARAMS
         )
 
         # Extract the assistant's message from the response
         followup_questions = response["choices"][0]["message"]["content"]
 
         # Check token usage
-        # token_usage = response["usage"]["total_tokens"]
-        # print(
-        #     f"************** 1->Total tokens used in function followup_agent: {token_usage}"
-        # )
+        record_usage("followup_agent", model, response)
 
         # Splitting the block of text into individual questions
-        questions = followup_questions.split("?")
-        # print("questions: ", questions)
-        parsed_questions = [q.strip() + "?" for q in questions if q.strip()]
-        # print(parsed_questions)
-        return parsed_questions
+        parser = QuestionParser()
+        return parser.feed(followup_questions) + parser.close()
 
     except Exception as e:
         return f"An error occurred: {e}"
 
 
-def diagnostic_agent(formatted_documents, initial_inputs, formatted_followup, model):
+def followup_agent_batch(input_texts, candidate_sets):
+    """Run followup_agent for many inputs, at most FOLLOWUP_CONCURRENCY at a time."""
+    futures = [
+        metrics.submit(followup_pool, followup_agent, input_text, candidates)
+        for input_text, candidates in zip(input_texts, candidate_sets)
+    ]
+    return [future.result() for future in futures]
+
+
+def stream_deltas(response, agent=None, model=None, messages=()):
+    """Yield the content deltas of a streamed ChatCompletion.
+
+    Streams carry no usage block, so with `agent` given the tokens are
+    counted locally once the stream ends (or is abandoned) and recorded
+    as for a blocking call.
+    """
+    parts = []
+    cached = False
+    try:
+        for chunk in response:
+            cached = cached or chunk.get("cached", False)
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                parts.append(content)
+                yield content
+    finally:
+        if agent is not None and not cached:
+            record_usage(agent, model, {"usage": estimate_usage(model, messages, "".join(parts))})
+
+
+def followup_agent_stream(input_text, candidates):
+    """Stream followup_agent: yields ("token", text) and ("question", question) events.
+
+    Each question is yielded as soon as its "?" has been streamed.
+    """
+    messages = followup_messages(input_text, candidates)
+    response = get_llm_cache().stream(messages=messages, **FOLLOWUP_PARAMS)
+    parser = QuestionParser()
+    for content in stream_deltas(
+        response, "followup_agent", FOLLOWUP_PARAMS["model"], messages
+    ):
+        yield "token", content
+        for question in parser.feed(content):
+            yield "question", question
+    for question in parser.close():
+        yield "question", question
+
+
+# Identical concurrent ballots (same judge and prompt) are asked for once
+@singleflight.coalesce(
+    "diagnostic_agent",
+    key=lambda formatted_documents, initial_inputs, formatted_followup, model, timeout=None: (
+        model,
+        str(formatted_documents),
+        initial_inputs,
+        formatted_followup,
+    ),
+)
+def diagnostic_agent(
+    formatted_documents, initial_inputs, formatted_followup, model, timeout=None
+):
     try:
         # system prompt
         agent_prompt = (
@@ -98,7 +224,7 @@ def diagnostic_agent(formatted_documents, initial_inputs, formatted_followup, mo
             "Likelihoods: 5, 4, 3, 2, 1"
         )
 
-        response = openai.ChatCompletion.create(
+        response = get_llm_cache().create(
             model=model,
             messages=[
                 {
@@ -115,16 +241,14 @@ def diagnostic_agent(formatted_documents, initial_inputs, formatted_followup, mo
             top_p=1.0,
             frequency_penalty=0.0,
             presence_penalty=0.0,
+            request_timeout=timeout,
         )
 
         # Extract raw response text
         response_text = response["choices"][0]["message"]["content"]
 
         # Check token usage
-        # token_usage = response["usage"]["total_tokens"]
-        # print(
-        #     f"************** 2->Total tokens used in function diagnostic_agent: {token_usage}"
-        # )
+        record_usage("diagnostic_agent", model, response)
 
         # Parse the response into diagnoses and likelihoods
         diagnoses = []
@@ -145,31 +269,176 @@ def diagnostic_agent(formatted_documents, initial_inputs, formatted_followup, mo
         return diagnoses, likelihoods
 
     except Exception as e:
+        # Reached only once openai_client has given up retrying
+        print(f"diagnostic_agent ({model}) failed: {e}")
         return ([], [f"An error occurred: {e}"])
 
 
+def timed_judge(
+    voting_round, formatted_documents, initial_inputs, formatted_followup, model, timeout
+):
+    with metrics.span("diagnostic_agent", model=model, round=voting_round):
+        return diagnostic_agent(
+            formatted_documents, initial_inputs, formatted_followup, model, timeout
+        )
+
+
+def top_choice(diagnoses, likelihoods):
+    """The diagnosis a judge ranked most likely, or None for an empty ballot."""
+    ranked = [(l, d) for d, l in zip(diagnoses, likelihoods) if isinstance(l, int)]
+    return normalize_diagnosis(max(ranked)[1]) if ranked else None
+
+
+def run_judges(
+    judges,
+    formatted_documents,
+    initial_inputs,
+    formatted_followup,
+    timeout=None,
+    voting_round=1,
+    quorum=0,
+):
+    """Ask every judge concurrently; return (diagnostics, seconds, skipped, judge_seconds).
+
+    diagnostics is {model: {diagnosis: likelihood}} and judge_seconds
+    {model: seconds} for the judges that answered. A judge that fails or
+    doesn't answer within `timeout` abstains with an empty ballot instead
+    of holding up the round. With a `quorum`, the round also ends as soon
+    as that many judges rank the same diagnosis first; the judges still
+    outstanding abstain and are listed in `skipped`.
+    """
+    timeout = JUDGE_TIMEOUT if timeout is None else timeout
+    start = time.perf_counter()
+    futures = {
+        metrics.submit(
+            judge_pool,
+            timed_judge,
+            voting_round,
+            formatted_documents,
+            initial_inputs,
+            formatted_followup,
+            model,
+            timeout,
+        ): model
+        for model in judges
+    }
+    # Collect ballots as they arrive so a quorum can end the round early
+    done, pending = set(), set(futures)
+    first_choices = Counter()
+    judge_seconds = {}
+    quorum_reached = False
+    while pending and not quorum_reached:
+        remaining = timeout - (time.perf_counter() - start)
+        finished, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+        if not finished:
+            break
+        done |= finished
+        for future in finished:
+            if future.exception() is None:
+                judge_seconds[futures[future]] = time.perf_counter() - start
+                choice = top_choice(*future.result())
+                if choice is not None:
+                    first_choices[choice] += 1
+                    quorum_reached = quorum_reached or 0 < quorum <= first_choices[choice]
+
+    diagnostics = {}
+    skipped = []
+    for future, model in futures.items():
+        diagnoses, likelihoods = [], []
+        if future in done and future.exception() is None:
+            diagnoses, likelihoods = future.result()
+        elif future in done:
+            print(f"Judge {model} failed and abstains: {future.exception()!r}")
+        elif quorum_reached and future in pending:
+            future.cancel()
+            skipped.append(model)
+            print(f"Judge {model} skipped: {quorum} judges already agree.")
+        else:
+            future.cancel()
+            print(f"Judge {model} did not answer within {timeout}s and abstains.")
+        normalized_diagnoses = [normalize_diagnosis(diag) for diag in diagnoses]
+        diagnostics[model] = {
+            diag: likelihood
+            for diag, likelihood in zip(normalized_diagnoses, likelihoods)
+        }
+
+    return diagnostics, time.perf_counter() - start, skipped, judge_seconds
+
+
+def vote_margin(votes, ballots):
+    """Lead of the top diagnosis over the runner-up, as a share of the most votes one can get."""
+    if not ballots or votes.empty:
+        return 0.0
+    top = sorted(votes.tolist(), reverse=True) + [0]
+    return (top[0] - top[1]) / (MAX_LIKELIHOOD * ballots)
+
+
+def record_saved_calls(saved, total, not_waited_for):
+    """Log and count judge calls never made; judges a quorum didn't wait for were still sent."""
+    print(
+        f"Adaptive voting saved {saved} of {total} judge calls "
+        f"({not_waited_for} more not waited for)"
+    )
+    metrics.registry.inc("vote_judge_calls_saved_total", saved)
+    metrics.registry.inc("vote_judges_not_waited_for_total", not_waited_for)
+
+
+def vote_round(number, diagnostics, seconds, skipped, judge_seconds):
+    """One round of a vote log record: per judge, its scores and seconds to answer."""
+    return {
+        "round": number,
+        "seconds": seconds,
+        "skipped": skipped,
+        "judges": {
+            model: {"scores": scores, "seconds": judge_seconds.get(model)}
+            for model, scores in diagnostics.items()
+        },
+    }
+
+
+def log_vote(initial_inputs, judges, rounds, df, decided_by, start):
+    """Queue the vote's record for the vote log; returns without touching disk."""
+    votes = {diag: int(total) for diag, total in df["Votes"].items()}
+    get_vote_log().record(
+        # Statements are health data; a hash still groups repeats
+        query_hash=hashlib.sha1(initial_inputs.encode("utf-8")).hexdigest()[:16],
+        judges=judges,
+        rounds=rounds,
+        votes=votes,
+        winner=max(votes, key=votes.get) if votes else None,
+        margin=df.attrs.get("margin"),
+        decided_by=decided_by,
+        seconds=time.perf_counter() - start,
+    )
+
+
 def vote_for_results(documents, initial_inputs, followupQ, followupA):
+    # pandas is only needed here; startup warm-up imports it ahead of the first vote
+    import pandas as pd
+
     # Define agents
     judges = ["gpt-4o", "gpt-3.5-turbo", "gpt-4"]
 
+    # Drop repeated sentences and trim the summaries to the prompt token budget
+    compacted = compact_documents(documents, DOCUMENT_TOKEN_BUDGET, query=initial_inputs)
     formatted_documents = "\n".join(
-        [f"- {topic}: {summary}" for topic, summary in documents.items()]
+        [f"- {topic}: {summary}" for topic, summary in compacted.items()]
     )
     formatted_followup = "\n".join(
         [f"Q: {q}\nA: {a}" for q, a in zip(followupQ, followupA)]
     )
 
+    quorum = VOTE_QUORUM if ADAPTIVE_VOTING else 0
+    # Two full rounds are the most this request can cost
+    total_calls = 2 * len(judges)
+
+    start = time.perf_counter()
     # Store diagnostics from each agent
-    diagnostics = {}
-    for model in judges:
-        diagnoses, likelihoods = diagnostic_agent(
-            formatted_documents, initial_inputs, formatted_followup, model
-        )
-        normalized_diagnoses = [normalize_diagnosis(diag) for diag in diagnoses]
-        diagnostics[model] = {
-            diag: likelihood
-            for diag, likelihood in zip(normalized_diagnoses, likelihoods)
-        }
+    diagnostics, first_round_seconds, skipped, judge_seconds = run_judges(
+        judges, formatted_documents, initial_inputs, formatted_followup, quorum=quorum
+    )
+    print(f"First round voting took {first_round_seconds:.2f}s")
+    rounds = [vote_round(1, diagnostics, first_round_seconds, skipped, judge_seconds)]
 
     # Collect all unique diagnoses
     all_diagnoses = set(
@@ -183,32 +452,46 @@ def vote_for_results(documents, initial_inputs, followupQ, followupA):
     }
     df = pd.DataFrame(table_data)
     df["Votes"] = df.sum(axis=1)
+    df.attrs["round_seconds"] = [first_round_seconds]
 
     shortlisted_diagnoses = df[df["Votes"] >= 5].index.tolist()
 
     if not shortlisted_diagnoses:
+        log_vote(initial_inputs, judges, rounds, df, "no_shortlist", start)
         return df
 
+    if ADAPTIVE_VOTING:
+        # The winner is already decided: by a quorum, or by a wide enough margin
+        ballots = sum(1 for result in diagnostics.values() if result)
+        margin = vote_margin(df["Votes"], ballots)
+        df.attrs["margin"] = margin
+        if skipped or margin >= VOTE_MARGIN:
+            print(f"First round decided the vote (margin {margin:.2f}); second round skipped")
+            record_saved_calls(len(judges), total_calls, len(skipped))
+            log_vote(
+                initial_inputs, judges, rounds, df, "quorum" if skipped else "margin", start
+            )
+            return df
+
     # Second Round Voting
-    second_round_diagnostics = {}
-    for model in judges:
-        # Use the shortlisted diagnoses as the rankable documents
-        second_round_diagnoses, second_round_likelihoods = diagnostic_agent(
-            shortlisted_diagnoses,  # Replace rankable docs with shortlisted topics
-            initial_inputs,
-            formatted_followup
-            + f"\n\nShortlisted Diagnoses: {', '.join(shortlisted_diagnoses)}",
-            model,
+    # Use the shortlisted diagnoses as the rankable documents
+    second_round_diagnostics, second_round_seconds, second_skipped, judge_seconds = run_judges(
+        judges,
+        shortlisted_diagnoses,  # Replace rankable docs with shortlisted topics
+        initial_inputs,
+        formatted_followup
+        + f"\n\nShortlisted Diagnoses: {', '.join(shortlisted_diagnoses)}",
+        voting_round=2,
+        quorum=quorum,
+    )
+    print(f"Second round voting took {second_round_seconds:.2f}s")
+    rounds.append(
+        vote_round(
+            2, second_round_diagnostics, second_round_seconds, second_skipped, judge_seconds
         )
-        normalized_second_diagnoses = [
-            normalize_diagnosis(diag) for diag in second_round_diagnoses
-        ]
-        second_round_diagnostics[model] = {
-            diag: likelihood
-            for diag, likelihood in zip(
-                normalized_second_diagnoses, second_round_likelihoods
-            )
-        }
+    )
+    if ADAPTIVE_VOTING:
+        record_saved_calls(0, total_calls, len(skipped) + len(second_skipped))
 
     # Combine second round results into a DataFrame
     second_round_table_data = {
@@ -220,15 +503,16 @@ def vote_for_results(documents, initial_inputs, followupQ, followupA):
     }
     second_round_df = pd.DataFrame(second_round_table_data)
     second_round_df["Votes"] = second_round_df.sum(axis=1)
-    second_round_df.to_csv("./ranktable.csv")
+    second_round_df.attrs["round_seconds"] = [first_round_seconds, second_round_seconds]
+    # Appended by the vote log's writer thread; no disk I/O on the request path
+    log_vote(initial_inputs, judges, rounds, second_round_df, "second_round", start)
 
     return second_round_df
 
 
-def final_agent(
-    selected_agent, selected_diagnosis, documents, initial_inputs, followupQ, followupA
+def final_messages(
+    selected_diagnosis, documents, initial_inputs, followupQ, followupA
 ):
-
     # Format documents and follow-up into strings for context
     formatted_documents = "\n".join(
         [f"-{topic}: {summary}" for topic, summary in documents.items()]
@@ -238,7 +522,7 @@ def final_agent(
     )
 
     # Initialize conversation history with full context
-    conversation_history = [
+    return [
         {
             "role": "system",
             "content": (
@@ -267,31 +551,44 @@ def final_agent(
         },
     ]
 
+
+FINAL_PARAMS = dict(
+    temperature=0.7,
+    max_tokens=700,
+    top_p=1.0,
+    frequency_penalty=0.5,
+    presence_penalty=0.0,
+)
+
+
+def final_agent(
+    selected_agent, selected_diagnosis, documents, initial_inputs, followupQ, followupA
+):
+    conversation_history = final_messages(
+        selected_diagnosis, documents, initial_inputs, followupQ, followupA
+    )
+
     # print("\n--- Diagnostic Chat with MemeMinds ---")
     print("Type 'exit' or 'quit' to end the conversation.\n")
 
     # Start chat loop
     while True:
         # Query the assistant for the next response
-        response = openai.ChatCompletion.create(
-            model=selected_agent,
-            messages=conversation_history,
-            temperature=0.7,
-            max_tokens=700,
-            top_p=1.0,
-            frequency_penalty=0.5,
-            presence_penalty=0.0,
-        )
+        with metrics.span("final_agent", model=selected_agent):
+            model, response = hedge.create(
+                "final_agent",
+                cache=CACHE_FINAL or None,
+                model=selected_agent,
+                messages=conversation_history,
+                **FINAL_PARAMS,
+            )
 
         # Extract and display the assistant's response
         agent_response = response["choices"][0]["message"]["content"]
         print(f"MemeMinds in function final_agent: {agent_response}")
-        return agent_response
         # check token usage
-        # token_usage = response["usage"]["total_tokens"]
-        # print(
-        #     f"************** 3->Total tokens used in function final_agent: {token_usage}"
-        # )
+        record_usage("final_agent", model, response)
+        return agent_response
 
         # Ask for user input
         # user_input = input("You: ").strip()
@@ -308,6 +605,18 @@ def final_agent(
         # conversation_history.append({"role": "assistant", "content": agent_response})
 
 
+def final_agent_stream(
+    selected_agent, selected_diagnosis, documents, initial_inputs, followupQ, followupA
+):
+    """Stream final_agent: yields the markdown answer in chunks as the model emits them."""
+    messages = final_messages(selected_diagnosis, documents, initial_inputs, followupQ, followupA)
+    response = get_llm_cache().stream(
+        cache=CACHE_FINAL or None, model=selected_agent, messages=messages, **FINAL_PARAMS
+    )
+    yield from stream_deltas(response, "final_agent", selected_agent, messages)
+
+
+@metrics.timed("select_agent")
 def select_agent(vote_df):
     # highest votes
     max_votes = vote_df["Votes"].max()
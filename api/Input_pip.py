@@ -1,117 +1,195 @@
-from transformers import AutoTokenizer, RobertaModel
-import torch.nn.functional as F
-import openai
-import faiss
 import numpy as np
-from pymongo import MongoClient
-from rank_bm25 import BM25Okapi
-
-# Set OpenAI API key
+import time
+from concurrent.futures import ThreadPoolExecutor
+from retrieval_context import get_context
+from embedding_cache import get_cache
+import metrics
+import retrieval_server
+import singleflight
+
+# Pooled, rate-limited OpenAI access; also sets the API key from .env
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
-openai.api_key = OPEN_AI_API_KEY
+import openai_client
 
 model = "text-embedding-ada-002"
 
+# Inputs per embedding request, and statements handled together by the batch path
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+
+# Runs BM25 retrieval while the embedding request is in flight
+retrieval_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RETRIEVAL_WORKERS", "8")), thread_name_prefix="retrieval"
+)
+
 
 class Query:
 
-    # Embed the input
+    # Embed a batch of texts with the OpenAI API, EMBED_BATCH_SIZE inputs per request
+    def embedTexts(texts):
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            response = openai_client.embedding(
+                input=texts[start : start + EMBED_BATCH_SIZE], model=model
+            )
+            data = sorted(response["data"], key=lambda item: item["index"])
+            vectors.extend(item["embedding"] for item in data)
+        return vectors
+
+    # Embed the input, reusing cached vectors for text seen before
+    @metrics.timed("understand")
+    @singleflight.coalesce("understand", key=lambda input_text: (model, input_text))
     def Understand(input_text):
 
         try:
-            response = openai.Embedding.create(input=[input_text], model=model)
+            vector = get_cache().embed(model, [input_text], Query.embedTexts)[0]
 
-            return np.array(response["data"][0]["embedding"], dtype="float32").reshape(
-                1, -1
-            )
+            return np.array(vector, dtype="float32").reshape(1, -1)
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
 
     # Retrive DB by FAISS with top n topics
+    @metrics.timed("retrieve_faiss")
     def retrieveFAISS(embedding, n):
-        """Retrieve top-k relevant documents from FAISS index and MongoDB."""
+        """Retrieve top-k relevant documents from FAISS index and the doc store."""
         try:
-            # Load FAISS index
-            index = faiss.read_index("wiki_faiss.index")
-            distances, indices = index.search(embedding, n)
-
-            # Connect to MongoDB
-            client = MongoClient("mongodb://localhost:27017/")
-            db = client["RetrivalDB"]
-            collection = db["wiki_data"]
-
-            # Collect matching results
-            results = []
-            for idx in indices[0]:
-                result = collection.find_one({"_id": int(idx)})
-                if result:
-                    filtered_result = {
-                        "Topic": result.get("Topic", "No topic available"),
-                        "Summary": result.get("Summary", "No summary available"),
-                    }
-                    results.append(filtered_result)
-
-            return results
+            # A shared retrieval server, when configured, holds the index instead of this worker
+            if retrieval_server.SOCKET:
+                return retrieval_server.get_client().faiss(embedding, n)[0]
+
+            # Use the resident FAISS index and resolve all hits in one lookup
+            context = get_context()
+            distances, indices = context.index().search(embedding, n)
+            ids = [int(idx) for idx in indices[0] if idx != -1]
+
+            return context.doc_store().get_many(ids)
 
         except Exception as e:
             print(f"Error during retrieval: {e}")
             return []
 
     # Retrive DB by BM25 with top n docs
+    @metrics.timed("retrieve_bm25")
     def retrieveBM25(input_text, n):
 
-        # Connect to MongoDB and fetch all documents
-        client = MongoClient("mongodb://localhost:27017/")
-        db = client["RetrivalDB"]
-        collection = db["wiki_data"]
+        if retrieval_server.SOCKET:
+            return retrieval_server.get_client().bm25([input_text], n)[0]
 
-        # Fetch documents and filter for valid strings in 'Summary' and presence of 'Topic'
-        documents = collection.find({}, {"Topic": 1, "Summary": 1, "_id": 0})
-        valid_docs = [
-            doc
-            for doc in documents
-            if isinstance(doc.get("Summary"), str)
-            and doc["Summary"].strip()
-            and "Topic" in doc
-        ]
-
-        # Create corpus and a mapping from Summary to Topic
-        corpus = [doc["Summary"] for doc in valid_docs]
+        # Score against the prebuilt BM25 index; only the query terms' postings are read
+        context = get_context()
+        hits = context.bm25().top_n(input_text.split(), n)
 
         # Check if the corpus is empty
-        if not corpus:
+        if not hits:
             print("Error: No valid summaries found in the database.")
             return []
 
-        # Create a mapping from summaries to topics
-        summary_topic_map = {doc["Summary"]: doc["Topic"] for doc in valid_docs}
+        # Resolve the hits through the shared doc store
+        return context.doc_store().get_many([doc_id for doc_id, _ in hits])
+
+    # Embed many inputs as one matrix, reusing cached vectors
+    @metrics.timed("understand_batch")
+    def UnderstandBatch(input_texts):
+
+        try:
+            vectors = get_cache().embed(model, list(input_texts), Query.embedTexts)
+
+            return np.vstack(vectors).astype("float32", copy=False)
+        except Exception as e:
+            print(f"Error generating embeddings: {e}")
+            return None
 
-        # Initialize BM25 with tokenized corpus
-        bm25 = BM25Okapi([doc.split() for doc in corpus])
+    # Retrive DB by FAISS for a matrix of queries: one search, one doc-store lookup
+    @metrics.timed("retrieve_faiss_batch")
+    def retrieveFAISSBatch(embeddings, n):
+
+        try:
+            if retrieval_server.SOCKET:
+                return retrieval_server.get_client().faiss(embeddings, n)
 
-        # Retrieve top-n summaries based on input tokens
-        top_n_summaries = bm25.get_top_n(input_text.split(), corpus, n=n)
+            context = get_context()
+            distances, indices = context.index().search(embeddings, n)
+            docs = context.doc_store().get_by_id(indices[indices != -1])
 
-        # Match summaries to their topics
-        results = [
-            {"Topic": summary_topic_map[summary], "Summary": summary}
-            for summary in top_n_summaries
-        ]
+            return [[docs[int(i)] for i in row if i != -1 and int(i) in docs] for row in indices]
 
+        except Exception as e:
+            print(f"Error during retrieval: {e}")
+            return [[] for _ in range(len(embeddings))]
+
+    # Retrive DB by BM25 for many inputs, scored together
+    @metrics.timed("retrieve_bm25_batch")
+    def retrieveBM25Batch(input_texts, n):
+
+        if retrieval_server.SOCKET:
+            return retrieval_server.get_client().bm25(input_texts, n)
+
+        context = get_context()
+        hits = context.bm25().top_n_many([text.split() for text in input_texts], n)
+        docs = context.doc_store().get_by_id([doc_id for row in hits for doc_id, _ in row])
+
+        return [[docs[doc_id] for doc_id, _ in row if doc_id in docs] for row in hits]
+
+    def generate_candidates(input_texts, n_each_method, chunk_size=BATCH_CHUNK_SIZE):
+        """Return generate_candidate(text, n_each_method) for every input text.
+
+        Inputs are handled chunk_size at a time: the chunk's embeddings come
+        from multi-input requests, FAISS runs one matrix search, and BM25
+        scores the whole chunk in one pass (overlapped with the embedding).
+        If the embedding fails, that chunk's candidates are BM25-only.
+        """
+        results = []
+        for start in range(0, len(input_texts), chunk_size):
+            chunk = list(input_texts[start : start + chunk_size])
+            bm25_future = metrics.submit(
+                retrieval_pool, Query.retrieveBM25Batch, chunk, n_each_method
+            )
+            embeddings = Query.UnderstandBatch(chunk)
+            if embeddings is None:
+                faiss_docs = [[] for _ in chunk]
+            else:
+                faiss_docs = Query.retrieveFAISSBatch(embeddings, n_each_method)
+            for faiss_hits, bm25_hits in zip(faiss_docs, bm25_future.result()):
+                combined_results = {}
+                for doc in faiss_hits + bm25_hits:
+                    combined_results.setdefault(doc["Topic"], doc["Summary"])
+                results.append(combined_results)
         return results
 
-    def generate_candidate(input_text, n_each_method):
-        # print("generate_candidate is called in input_pip.py")
+    # Identical concurrent queries share one retrieval (generate_candidate goes through here too)
+    @singleflight.coalesce(
+        "generate_candidate", key=lambda input_text, n_each_method: (input_text, n_each_method)
+    )
+    def generate_candidate_timed(input_text, n_each_method):
+        """Return (candidates, timings, embedding) with BM25 overlapped with embedding and FAISS.
+
+        BM25 doesn't need the embedding, so it starts immediately on the
+        retrieval pool; FAISS runs as soon as the vector arrives. Timings are
+        seconds per stage plus the overall wall clock; the query embedding is
+        returned so callers can keep it (e.g. in the session store).
+        """
+        start = time.perf_counter()
+        timings = {}
+
+        def timed_bm25():
+            bm25_start = time.perf_counter()
+            docs = Query.retrieveBM25(input_text, n=n_each_method)
+            timings["bm25"] = time.perf_counter() - bm25_start
+            return docs
+
+        bm25_future = metrics.submit(retrieval_pool, timed_bm25)
+
+        stage_start = time.perf_counter()
         embedding = Query.Understand(input_text)
+        timings["embed"] = time.perf_counter() - stage_start
 
-        # Retrieve documents using FAISS and BM25
+        stage_start = time.perf_counter()
         faiss_docs = Query.retrieveFAISS(embedding, n=n_each_method)
-        bm25_docs = Query.retrieveBM25(input_text, n=n_each_method)
+        timings["faiss"] = time.perf_counter() - stage_start
+
+        bm25_docs = bm25_future.result()
+        timings["total"] = time.perf_counter() - start
 
         # Combine results into a dictionary
         combined_results = {}
@@ -121,6 +199,12 @@ class Query:
             if topic not in combined_results:
                 combined_results[topic] = summary
 
+        return combined_results, timings, embedding
+
+    def generate_candidate(input_text, n_each_method):
+        # print("generate_candidate is called in input_pip.py")
+        combined_results, _, _ = Query.generate_candidate_timed(input_text, n_each_method)
+
         return combined_results
 
 
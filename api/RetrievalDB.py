@@ -1,17 +1,22 @@
 import wikipediaapi
 import pandas as pd
-from tqdm import tqdm
 import os
 from pymongo import MongoClient
-from nltk.corpus import stopwords
-import openai
-import time
 import faiss_index
-import faiss
 import numpy as np
-from pymongo import MongoClient
-import os
-from dotenv import load_dotenv
+from embedding_cache import get_cache
+from ingest import CHECKPOINT_PATH, ingest, read_checkpoint
+from corpus_store import (
+    META_PATH,
+    VECTORS_PATH,
+    convert_csv,
+    corpus_exists,
+    load_vectors,
+    write_corpus,
+)
+
+# Pooled, rate-limited OpenAI access; also sets the API key from .env
+import openai_client
 
 
 # Declare the identity of requestor
@@ -19,11 +24,6 @@ wiki_wiki = wikipediaapi.Wikipedia(
     "Psychology_LLM_Agent (fan.qih@northeastern.edu)", "en"
 )
 
-
-load_dotenv()
-OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
-openai.api_key = OPEN_AI_API_KEY
-
 model = "text-embedding-ada-002"
 
 
@@ -68,14 +68,22 @@ def mongoDB(csv_file, db_name, collection_name, host):
     print(f"Retrival Database [{db_name}] has been created!")
 
 
+def embedTexts(texts):
+    response = openai_client.embedding(input=texts, model=model)
+    # Extract the embeddings from the API response in input order
+    data = sorted(response["data"], key=lambda item: item["index"])
+    return [item["embedding"] for item in data]
+
+
+def embedSummaries(summaries):
+    # Batched embedding for ingestion; repeated summaries come from the cache
+    return [vector.tolist() for vector in get_cache().embed(model, summaries, embedTexts)]
+
+
 def textEmbed(text):
     try:
-        # Ensure the input is passed as a list
-        response = openai.Embedding.create(
-            input=[text], model=model  # Wrap input in a list
-        )
-        # Extract the embedding from the API response
-        return response["data"][0]["embedding"]
+        # Summaries embedded before are served from the shared cache
+        return get_cache().embed(model, [text], embedTexts)[0].tolist()
     except Exception as e:
         print(f"Error generating embedding: {e}")
         return None
@@ -84,72 +92,50 @@ def textEmbed(text):
 def main():
     csv_file = "./wiki_raw.csv"
 
-    # Step 1: Check if the CSV file exists
-    if not os.path.isfile(csv_file):
-        # Fetch and combine lists of topics
-        Mental_Disorder = get_list("List_of_mental_disorders")
-        Neuro_Disorder = get_list("List of neurological conditions and disorders")
-        all_topics = remove_duplicates(Mental_Disorder, Neuro_Disorder)
-
-        data_list = []
-        for idx, topic in tqdm(enumerate(all_topics), total=len(all_topics)):
-            summary = get_summary(topic)
-            embeded = textEmbed(summary)
-            data_list.append(
-                {"_id": idx, "Topic": topic, "Summary": summary, "Embeded": embeded}
-            )
-            time.sleep(1)
-
-        # Save data to CSV
-        data = pd.DataFrame(data_list)
-        data.dropna(subset=["Summary", "Embeded"], inplace=True)
-        data.to_csv(csv_file, index=False)
-        print(f"CSV file saved to {csv_file}")
-
-    # Step 2: Check if embeddings are already in the CSV
-    data = pd.read_csv(csv_file)
-    if "Embeded" in data.columns and not data["Embeded"].isnull().all():
-        print("Embeddings found in CSV. Processing directly from CSV.")
-
-        # Convert string embeddings back to NumPy arrays (if needed)
-        data["Embeded"] = data["Embeded"].apply(
-            lambda x: np.fromstring(x.strip("[]"), sep=",") if isinstance(x, str) else x
-        )
-
-        # Initialize FAISS index
-        dimension = 1536  # Size of embeddings
-        index = faiss.IndexFlatL2(dimension)
-
-        count = 0
-        for _, row in data.iterrows():
-            embedding = np.array(row["Embeded"], dtype="float32")
-            if embedding.shape == (dimension,):
-                index.add(embedding.reshape(1, -1))
-                count += 1
-            else:
-                print(f"Skipping row {_}: Incorrect embedding shape {embedding.shape}.")
-
-        # Save FAISS index
-        if count > 0:
-            faiss.write_index(index, "wiki_faiss.index")
-            print(f"FAISS index created with {index.ntotal} entries.")
+    # Step 1: Check if the columnar corpus exists
+    if not corpus_exists():
+        if os.path.isfile(csv_file):
+            # One-shot conversion of the legacy CSV with stringified vectors
+            written = convert_csv(csv_file)
+            print(f"Converted {csv_file} to {META_PATH} and {VECTORS_PATH} ({written} rows)")
         else:
-            print("No valid embeddings found. FAISS index not created.")
-    else:
-        print("Embeddings not found in CSV. Fetching from MongoDB.")
+            # Fetch and combine lists of topics, unless a checkpoint already pinned them
+            all_topics, _ = read_checkpoint(CHECKPOINT_PATH)
+            if all_topics is None:
+                Mental_Disorder = get_list("List_of_mental_disorders")
+                Neuro_Disorder = get_list("List of neurological conditions and disorders")
+                all_topics = remove_duplicates(Mental_Disorder, Neuro_Disorder)
+
+            # Fetch and embed concurrently; a rerun resumes from the checkpoint
+            data_list, _ = ingest(all_topics, get_summary, embedSummaries)
 
-        # Step 3: Insert data into MongoDB (if needed)
-        mongoDB(csv_file, "RetrivalDB", "wiki_data", "27017")
+            # Save metadata to Parquet and vectors to .npy
+            written = write_corpus(data_list)
+            print(f"Corpus saved to {META_PATH} and {VECTORS_PATH} ({written} rows)")
 
-        # Step 4: Set up MongoDB connection
+    # Step 2: Bulk build the FAISS index from the memory-mapped vectors and upsert the documents
+    vectors = load_vectors()
+    if len(vectors):
+        print("Embeddings found in corpus. Processing directly from vector file.")
+
+        client = MongoClient("mongodb://localhost:27017/")
+        stats = faiss_index.build(client["RetrivalDB"]["wiki_data"])
+        print(
+            f"Indexed {stats['rows']} rows at {stats['index_rows_per_second']:,.0f} rows/sec, "
+            f"upserted at {stats['mongo_rows_per_second']:,.0f} rows/sec"
+        )
+    else:
+        print("Embeddings not found in corpus. Fetching from MongoDB.")
+
+        # Step 3: Set up MongoDB connection
         client = MongoClient("mongodb://localhost:27017/")
         db = client["RetrivalDB"]
         collection = db["wiki_data"]
 
-        # Step 5: Initialize FAISS index
+        # Step 4: Collect the embeddings keyed by document _id
         dimension = 1536  # Size of embeddings
-        index = faiss.IndexFlatL2(dimension)
-        count = 0
+        ids = []
+        embeddings = []
 
         # Fetch and process embeddings from MongoDB
         for doc in collection.find({}, {"_id": 1, "Embeded": 1}):
@@ -167,14 +153,23 @@ def main():
                     )
                     continue
 
-                index.add(embedding.reshape(1, -1))
-                count += 1
+                ids.append(int(doc["_id"]))
+                embeddings.append(embedding)
             except Exception as e:
                 print(f"Error processing document {doc['_id']}: {e}")
+        count = len(ids)
 
-        # Step 6: Save the FAISS index if valid entries were added
+        # Step 5: Save the FAISS index if valid entries were added
         if count > 0:
-            faiss.write_index(index, "wiki_faiss.index")
+            # One bulk build rather than an add (and id scan) per document
+            vectors = np.stack(embeddings)
+            index = faiss_index.build_index(
+                vectors,
+                faiss_index.validate_embeddings(vectors),
+                np.array(ids, dtype=np.int64),
+                index_type=faiss_index.INDEX_TYPE,
+            )
+            index.save("wiki_faiss.index")
             print(f"FAISS index created with {index.ntotal} entries.")
         else:
             print("No valid embeddings found. FAISS index not created.")
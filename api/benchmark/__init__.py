@@ -0,0 +1,4 @@
+"""Offline benchmarks for the retrieval and generation pipeline.
+
+Run from the `api` directory, e.g. `python -m benchmark.faiss_retrieval`.
+"""
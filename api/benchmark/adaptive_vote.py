@@ -0,0 +1,102 @@
+"""Latency, judge calls and winners of vote_for_results: fixed vs adaptive voting.
+
+    python -m benchmark.adaptive_vote --votes 10 [--json]
+
+Runs vote_for_results against the stub completion server, with judges of
+different speeds, under three strategies:
+
+- fixed     both rounds whenever something is shortlisted (ADAPTIVE_VOTING=0)
+- margin    skip the second round when the first is decided by VOTE_MARGIN
+- quorum    margin, plus end a round once VOTE_QUORUM judges agree
+
+and two electorates: judges that agree on the top diagnosis (the usual
+case, as in the old ranktable.csv logs) and judges that split. Reports mean latency,
+judge requests per vote and whether the winner matches the fixed strategy.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import openai
+
+import Generation
+import llm_cache
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+STRATEGIES = {
+    "fixed": dict(ADAPTIVE_VOTING=False),
+    "margin": dict(ADAPTIVE_VOTING=True, VOTE_QUORUM=0),
+    "quorum": dict(ADAPTIVE_VOTING=True, VOTE_QUORUM=2),
+}
+JUDGE_LATENCY = {"gpt-4o": 0.3, "gpt-3.5-turbo": 0.15, "gpt-4": 0.8}
+
+
+def winner(df):
+    return df["Votes"].idxmax() if len(df) else None
+
+
+def run_strategy(server, settings, votes):
+    for name, value in settings.items():
+        setattr(Generation, name, value)
+    latencies, winners = [], set()
+    before = server.requests
+    for _ in range(votes):
+        # Cold LLM cache, so every vote asks the judges again
+        llm_cache._cache = llm_cache.LLMCache(path="")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = Generation.vote_for_results(CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+        latencies.append(time.perf_counter() - start)
+        winners.add(winner(df))
+    return {
+        "mean_s": statistics.fmean(latencies),
+        "judge_requests_per_vote": (server.requests - before) / votes,
+        "winners": sorted(w for w in winners if w),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--votes", type=int, default=10)
+    parser.add_argument("--margin", type=float, default=Generation.VOTE_MARGIN)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    Generation.VOTE_MARGIN = args.margin
+    # vote_for_results writes its vote log (vote_log/) under the working directory
+    os.chdir(tempfile.mkdtemp(prefix="adaptive_vote_"))
+    results = {}
+    for electorate, split in (("agreeing", False), ("split", True)):
+        with StubOpenAIServer(model_latency=JUDGE_LATENCY, split_judges=split) as server:
+            openai.api_base = server.api_base
+            openai.api_key = "stub"
+            rows = {
+                name: run_strategy(server, settings, args.votes)
+                for name, settings in STRATEGIES.items()
+            }
+        for row in rows.values():
+            row["same_winner"] = row["winners"] == rows["fixed"]["winners"]
+        results[electorate] = rows
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{args.votes} votes per strategy, margin {args.margin}, judge latency {JUDGE_LATENCY}")
+    for electorate, rows in results.items():
+        print(f"\n{electorate} judges")
+        for name, row in rows.items():
+            print(
+                f"  {name:<8} {row['mean_s']:6.2f}s  {row['judge_requests_per_vote']:4.1f} calls  "
+                f"winner {', '.join(row['winners'])}{'' if row['same_winner'] else '  (differs)'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
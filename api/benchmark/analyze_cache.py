@@ -0,0 +1,66 @@
+"""Latency of repeated /api/analyze work with the LLM response cache.
+
+    python -m benchmark.analyze_cache --latency 0.5 --repeats 3 [--persist]
+
+Runs the analyze path (vote_for_results, select_agent, final_agent) against
+the local stub completion server, first cold and then with identical
+inputs, and prints the cache counters. On a repeat the judges' ballots and
+the final answer (cached through CACHE_FINAL) come from the cache, so it
+makes no completion request unless select_agent breaks a tie differently.
+--persist also backs the cache with a temporary SQLite file and repeats
+once more from a fresh in-memory tier, as a new worker process would see it.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import openai
+
+import Generation
+import llm_cache
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+
+def analyze():
+    start = time.perf_counter()
+    votes = Generation.vote_for_results(CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+    agent, diagnosis = Generation.select_agent(votes)
+    Generation.final_agent(agent, diagnosis, CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--persist", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="analyze_cache_bench_")
+    # vote_for_results writes its vote log (vote_log/) under the working directory
+    os.chdir(workdir)
+    path = os.path.join(workdir, "llm_cache.sqlite") if args.persist else ""
+    llm_cache._cache = llm_cache.LLMCache(path=path)
+
+    with StubOpenAIServer(latency=args.latency) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+
+        timings = [("cold", analyze())]
+        timings += [(f"repeat {i}", analyze()) for i in range(1, args.repeats + 1)]
+        if args.persist:
+            llm_cache._cache = llm_cache.LLMCache(path=path)
+            timings.append(("new process", analyze()))
+        requests = server.requests
+
+    for name, seconds in timings:
+        print(f"{name:<12} {seconds * 1000:9.1f} ms")
+    print(f"stub requests: {requests}")
+    print(llm_cache.get_llm_cache().counters())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Recall@k, query latency and memory of each index type against flat search.
+
+    python -m benchmark.ann_index --sizes 10000,100000 --types flat,ivf_flat,ivf_pq,hnsw
+    python -m benchmark.ann_index --param ivf_flat.nprobe=32 --param hnsw.ef_search=128
+
+Vectors are synthetic but clustered and unit-normalized like ada
+embeddings; queries are perturbed corpus points. Recall is measured
+against exact flat search, latency with single-query searches (the
+/api/generate pattern), and memory as the serialized index size.
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from faiss_index import build_index
+
+DIMENSION = 1536
+
+
+def synthetic_corpus(n, n_queries, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIMENSION), dtype="float32")
+    vectors = np.empty((n, DIMENSION), dtype="float32")
+    for start in range(0, n, 50_000):
+        rows = min(50_000, n - start)
+        assign = rng.integers(0, clusters, rows)
+        vectors[start : start + rows] = centers[assign] + 0.6 * rng.standard_normal(
+            (rows, DIMENSION), dtype="float32"
+        )
+    faiss.normalize_L2(vectors)
+    picks = rng.integers(0, n, n_queries)
+    queries = vectors[picks] + 0.02 * rng.standard_normal((n_queries, DIMENSION), dtype="float32")
+    faiss.normalize_L2(queries)
+    return vectors, queries
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q))
+
+
+def evaluate(index, queries, truth, k):
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "recall": float(recall),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "memory_mib": len(faiss.serialize_index(index.index)) / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--types", default="flat,ivf_flat,ivf_pq,hnsw")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--param", action="append", default=[], metavar="TYPE.KEY=VALUE")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per result")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.param:
+        key, value = item.split("=", 1)
+        index_type, name = key.split(".", 1)
+        overrides.setdefault(index_type, {})[name] = int(value)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors, queries = synthetic_corpus(size, args.queries)
+        ids = np.arange(size, dtype=np.int64)
+        valid = np.ones(size, dtype=bool)
+
+        exact = faiss.IndexFlatL2(DIMENSION)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+
+        if not args.json:
+            print(f"\n{size:,} vectors, k={args.k}")
+            print(f"  {'type':<9} {'build s':>8} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'MiB':>8}")
+        for index_type in args.types.split(","):
+            start = time.perf_counter()
+            index = build_index(
+                vectors, valid, ids, index_type=index_type, params=overrides.get(index_type)
+            )
+            build_seconds = time.perf_counter() - start
+            result = evaluate(index, queries, truth, args.k)
+            result.update(
+                size=size, type=index_type, params=index.params, build_seconds=build_seconds
+            )
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"  {index_type:<9} {result['build_seconds']:8.1f} {result['recall']:7.3f}"
+                    f" {result['p50_ms']:8.3f} {result['p95_ms']:8.3f} {result['p99_ms']:8.3f}"
+                    f" {result['memory_mib']:8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Throughput of /api/generate/batch against one /api/generate per statement.
+
+    python -m benchmark.batch_generate --size 20000 --queries 256 [--followups] [--json]
+
+Both paths go through the Flask test client against the suite's synthetic
+corpus, in-memory Mongo and stub OpenAI server, with cold caches:
+
+- per-request  one /api/generate (or Query.generate_candidate without
+               --followups) per statement: one embedding request, one
+               single-row FAISS search and one BM25 scoring each
+- batch        /api/generate/batch in --batch sized requests: multi-input
+               embedding requests, matrix FAISS search, BM25 scored per chunk
+
+Reports queries/sec and the number of requests the stub OpenAI server saw.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import openai
+
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.suite import API_DIR, install_backends, prepare_corpus
+from benchmark.synthetic_corpus import CorpusGenerator
+
+
+def reset_caches():
+    import embedding_cache
+    import llm_cache
+
+    embedding_cache._cache = embedding_cache.EmbeddingCache(path="")
+    llm_cache._cache = llm_cache.LLMCache(path="")
+
+
+def per_request(client, queries, followups):
+    from Input_pip import Query
+
+    for query in queries:
+        if followups:
+            response = client.post("/api/generate", json={"query": query})
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/generate returned {response.status_code}")
+        else:
+            Query.generate_candidate(query, 5)
+
+
+def batched(client, queries, followups, batch):
+    for start in range(0, len(queries), batch):
+        response = client.post(
+            "/api/generate/batch",
+            json={"queries": queries[start : start + batch], "followups": followups},
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/generate/batch returned {response.status_code}")
+
+
+def measure(server, fn, n):
+    reset_caches()
+    before = server.requests
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {
+        "queries_per_s": n / seconds,
+        "seconds": seconds,
+        "openai_requests": server.requests - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="reuse a corpus across runs")
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=256, help="statements per batch request")
+    parser.add_argument("--followups", action="store_true", help="also generate follow-ups")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="stub seconds")
+    parser.add_argument("--chat-latency", type=float, default=0.2, help="stub seconds")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="batch_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, API_DIR)
+    os.chdir(workdir)
+    os.environ["WARM_ON_IMPORT"] = "0"
+
+    prepare_corpus(workdir, args.size, args.seed, "flat")
+    install_backends(workdir, SimpleNamespace(mongo_latency=0.0005, doc_store="mongo"))
+    generator = CorpusGenerator(args.seed)
+    # Distinct statements, so the embedding cache doesn't collapse repeats
+    queries = [
+        f"{query} ({i})" for i, query in enumerate(generator.queries(args.queries, seed=args.seed + 1))
+    ]
+
+    results = {"size": args.size, "queries": args.queries, "followups": args.followups}
+    with StubOpenAIServer(
+        latency=args.chat_latency, model_latency={"text-embedding-ada-002": args.embed_latency}
+    ) as server:
+        openai.api_base = server.api_base
+        with contextlib.redirect_stdout(io.StringIO()):
+            import index
+
+            # Importing the pipeline sets openai.api_key from the environment
+            openai.api_key = "stub"
+            client = index.app.test_client()
+            # Loads the indexes so neither path pays for it
+            batched(client, queries[:2], False, 2)
+            results["per_request"] = measure(
+                server, lambda: per_request(client, queries, args.followups), len(queries)
+            )
+            results["batch"] = measure(
+                server,
+                lambda: batched(client, queries, args.followups, args.batch),
+                len(queries),
+            )
+    results["speedup"] = results["batch"]["queries_per_s"] / results["per_request"]["queries_per_s"]
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(
+        f"{args.size:,} topics, {args.queries} statements"
+        f"{' with follow-ups' if args.followups else ''}"
+    )
+    for path in ("per_request", "batch"):
+        r = results[path]
+        print(
+            f"  {path:<12} {r['queries_per_s']:8.1f} queries/s  "
+            f"{r['seconds']:7.2f}s  {r['openai_requests']:5d} OpenAI requests"
+        )
+    print(f"  speedup      {results['speedup']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Concurrent load generator for request coalescing (singleflight).
+
+    python -m benchmark.coalescing --clients 32 --distinct 4 --bursts 5 [--json]
+
+Each burst releases --clients threads at once, each POSTing one of
+--distinct statements (popular openers, double clicks) to /api/generate
+and then the matching legacy payload to /api/analyze, through the Flask
+test client against the suite's synthetic corpus, in-memory Mongo and stub
+OpenAI server. Caches are cleared before every burst so only coalescing
+can save work. Runs with SINGLEFLIGHT off and on and reports requests to
+the stub server, latency and the per-group singleflight counters.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import openai
+
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.suite import API_DIR, install_backends, prepare_corpus
+from benchmark.synthetic_corpus import CorpusGenerator
+from benchmark.vote_fanout import FOLLOWUP_A, FOLLOWUP_Q
+
+
+def reset_caches():
+    import embedding_cache
+    import llm_cache
+
+    embedding_cache._cache = embedding_cache.EmbeddingCache(path="")
+    llm_cache._cache = llm_cache.LLMCache(path="")
+
+
+def burst(app, path, bodies):
+    """POST bodies[i] from thread i, all released together; returns (latencies, statuses)."""
+    barrier = threading.Barrier(len(bodies))
+    latencies, statuses = [0.0] * len(bodies), [0] * len(bodies)
+
+    def client(i):
+        test_client = app.test_client()
+        barrier.wait()
+        start = time.perf_counter()
+        response = test_client.post(path, json=bodies[i])
+        latencies[i] = time.perf_counter() - start
+        statuses[i] = response.status_code
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(bodies))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def run_mode(app, server, queries, candidates, args):
+    import singleflight
+
+    counters_before = singleflight.counters()
+    before = server.requests
+    latencies = {"/api/generate": [], "/api/analyze": []}
+    errors = 0
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    for _ in range(args.bursts):
+        reset_caches()
+        picks = rng.integers(0, len(queries), args.clients)
+        generate = [{"query": queries[i]} for i in picks]
+        analyze = [
+            {
+                "initialQuery": queries[i],
+                "candidates": candidates[i],
+                "followUpQuestions": FOLLOWUP_Q,
+                "userFollowupResponse": FOLLOWUP_A,
+            }
+            for i in picks
+        ]
+        for path, bodies in (("/api/generate", generate), ("/api/analyze", analyze)):
+            seconds, statuses = burst(app, path, bodies)
+            latencies[path].extend(seconds)
+            errors += sum(status != 200 for status in statuses)
+    wall = time.perf_counter() - start
+
+    result = {
+        "openai_requests": server.requests - before,
+        "requests_per_s": 2 * args.bursts * args.clients / wall,
+        "errors": errors,
+        "singleflight": {
+            name: value - counters_before.get(name, 0)
+            for name, value in singleflight.counters().items()
+            if not name.endswith("in_flight")
+        },
+    }
+    for path, values in latencies.items():
+        result[f"{path} p50_ms"] = float(np.percentile(values, 50) * 1000)
+        result[f"{path} p95_ms"] = float(np.percentile(values, 95) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="reuse a corpus across runs")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent requests per burst")
+    parser.add_argument("--distinct", type=int, default=4, help="distinct statements")
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds to first token")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="coalescing_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, API_DIR)
+    os.chdir(workdir)
+    os.environ["WARM_ON_IMPORT"] = "0"
+
+    prepare_corpus(workdir, args.size, args.seed, "flat")
+    meta = install_backends(workdir, SimpleNamespace(mongo_latency=0.0005, doc_store="mongo"))
+    queries = CorpusGenerator(args.seed).queries(args.distinct, seed=args.seed + 1)
+    rows = meta.iloc[: 10 * args.distinct]
+    candidates = [
+        dict(zip(rows["Topic"][i::args.distinct], rows["Summary"][i::args.distinct]))
+        for i in range(args.distinct)
+    ]
+
+    results = {"clients": args.clients, "distinct": args.distinct, "bursts": args.bursts}
+    with StubOpenAIServer(latency=args.latency) as server:
+        openai.api_base = server.api_base
+        with contextlib.redirect_stdout(io.StringIO()):
+            import index
+            import singleflight
+
+            # Importing the pipeline sets openai.api_key from the environment
+            openai.api_key = "stub"
+            index.app.test_client().post("/api/generate", json={"query": queries[0]})
+            for mode, enabled in (("off", False), ("on", True)):
+                singleflight.ENABLED = enabled
+                results[mode] = run_mode(index.app, server, queries, candidates, args)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(
+        f"{args.bursts} bursts of {args.clients} concurrent clients over "
+        f"{args.distinct} distinct statements"
+    )
+    for mode in ("off", "on"):
+        r = results[mode]
+        print(
+            f"  singleflight {mode:<3}  {r['openai_requests']:5d} OpenAI requests  "
+            f"{r['requests_per_s']:6.1f} req/s  "
+            f"generate p50 {r['/api/generate p50_ms']:7.1f} ms  "
+            f"analyze p50 {r['/api/analyze p50_ms']:7.1f} ms  errors {r['errors']}"
+        )
+    for name, value in sorted(results["on"]["singleflight"].items()):
+        if name.endswith(("leaders", "coalesced")):
+            print(f"    {name:<32} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Load time and peak RSS: wiki_raw.csv parsing vs the columnar corpus.
+
+    python -m benchmark.corpus_load --rows 20000
+
+Writes a synthetic CSV in the legacy format (stringified vectors), converts
+it with corpus_store.convert_csv, then loads the vectors in fresh
+subprocesses so each path's peak RSS is measured in isolation:
+
+- csv-fromstring   pd.read_csv + np.fromstring per row (RetrievalDB.main)
+- csv-eval         pd.read_csv + eval per row (old faiss_index.py)
+- npy-mmap         np.load(mmap_mode="r") + one pass over the matrix
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from corpus_store import DIMENSION, convert_csv, load_metadata, load_vectors
+
+
+def write_synthetic_csv(path, rows, chunk=5_000):
+    rng = np.random.default_rng(0)
+    with open(path, "w") as f:
+        f.write("_id,Topic,Summary,Embeded\n")
+        for start in range(0, rows, chunk):
+            block = rng.standard_normal((min(chunk, rows - start), DIMENSION)).astype("float32")
+            for offset, vector in enumerate(block):
+                idx = start + offset
+                cells = ", ".join(repr(float(x)) for x in vector)
+                f.write(f'{idx},Topic {idx},"Summary of topic {idx}.","[{cells}]"\n')
+
+
+def peak_rss_kib():
+    # ru_maxrss can carry over the parent's peak across fork/exec on Linux;
+    # VmHWM belongs to this process image only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load(method, workdir):
+    baseline_kib = peak_rss_kib()
+    start = time.perf_counter()
+    if method == "npy-mmap":
+        meta = load_metadata(os.path.join(workdir, "meta.parquet"))
+        vectors = load_vectors(os.path.join(workdir, "vectors.npy"))
+        checksum = float(vectors.sum(dtype="float64"))  # touch every page
+        rows = len(meta)
+    else:
+        data = pd.read_csv(os.path.join(workdir, "corpus.csv"))
+        if method == "csv-eval":
+            parsed = data["Embeded"].apply(eval)
+        else:
+            parsed = data["Embeded"].apply(lambda x: np.fromstring(x.strip("[]"), sep=","))
+        vectors = np.stack([np.asarray(v, dtype="float32") for v in parsed])
+        checksum = float(vectors.sum(dtype="float64"))
+        rows = len(data)
+    seconds = time.perf_counter() - start
+    peak_kib = peak_rss_kib()
+    print(json.dumps({
+        "rows": rows,
+        "seconds": seconds,
+        "peak_rss_mib": peak_kib / 1024,
+        "load_rss_mib": (peak_kib - baseline_kib) / 1024,
+        "checksum": checksum,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        load(args.child, args.workdir)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="corpus_bench_")
+    csv_path = os.path.join(workdir, "corpus.csv")
+    write_synthetic_csv(csv_path, args.rows)
+
+    start = time.perf_counter()
+    convert_csv(
+        csv_path,
+        meta_path=os.path.join(workdir, "meta.parquet"),
+        vectors_path=os.path.join(workdir, "vectors.npy"),
+    )
+    print(f"{args.rows:,} rows, CSV {os.path.getsize(csv_path) / 2**20:,.0f} MiB, "
+          f"converted in {time.perf_counter() - start:.1f}s")
+
+    for method in ("csv-fromstring", "csv-eval", "npy-mmap"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmark.corpus_load", "--child", method, "--workdir", workdir],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(
+            f"  {method:<15} {result['seconds']:8.2f}s   peak RSS {result['peak_rss_mib']:8.0f} MiB"
+            f"   (+{result['load_rss_mib']:.0f} MiB over imports)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Per-request FAISS retrieval latency: read_index per request vs resident index.
+
+    python -m benchmark.faiss_retrieval --sizes 1000,100000,1000000
+
+The 1M case needs ~6 GB of RAM and disk for the synthetic index.
+Pass --mongo-uri to also time a fresh MongoClient per request against the
+pooled client (a single find_one is issued in both cases).
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from pymongo import MongoClient
+
+from retrieval_context import RetrievalContext
+
+DIMENSION = 1536
+
+
+def build_synthetic_index(path, n_vectors, chunk=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    index = faiss.IndexFlatL2(DIMENSION)
+    for start in range(0, n_vectors, chunk):
+        rows = min(chunk, n_vectors - start)
+        index.add(rng.standard_normal((rows, DIMENSION), dtype="float32"))
+    faiss.write_index(index, path)
+
+
+def time_requests(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"  {label:<10} mean {statistics.mean(timings):10.2f} ms"
+        f"   p50 {statistics.median(timings):10.2f} ms   p95 {p95:10.2f} ms"
+    )
+
+
+def run(size, n_requests, k, mongo_uri, workdir):
+    path = os.path.join(workdir, f"synthetic_{size}.index")
+    print(f"\n{size:,} vectors ({size * DIMENSION * 4 / 2**20:,.0f} MiB)")
+    build_synthetic_index(path, size)
+    queries = np.random.default_rng(1).standard_normal(
+        (n_requests, 1, DIMENSION), dtype="float32"
+    )
+
+    def before(query):
+        index = faiss.read_index(path)
+        index.search(query, k)
+        if mongo_uri:
+            client = MongoClient(mongo_uri)
+            client["RetrivalDB"]["wiki_data"].find_one({"_id": 0})
+            client.close()
+
+    context = RetrievalContext(index_path=path, mongo_uri=mongo_uri)
+    context.index()  # warm-up load, paid once per process
+    if mongo_uri:
+        context.collection.find_one({"_id": 0})
+
+    def after(query):
+        context.index().search(query, k)
+        if mongo_uri:
+            context.collection.find_one({"_id": 0})
+
+    summarize("before", time_requests(before, queries))
+    summarize("after", time_requests(after, queries))
+    context.close()
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="faiss_bench_")
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.requests, args.k, args.mongo_uri, workdir)
+
+
+if __name__ == "__main__":
+    main()
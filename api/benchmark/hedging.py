@@ -0,0 +1,153 @@
+"""Tail latency of final_agent and followup_agent with and without hedging.
+
+    python -m benchmark.hedging --calls 300 --clients 8 --latency 0.05 --tail-alpha 1.5 [--json]
+
+The stub server scales every request's delay by a Pareto(--tail-alpha)
+draw, so most answers come quickly and a few take an order of magnitude
+longer. Each agent is called --calls times from --clients threads, with a
+distinct statement per call so the LLM cache never answers. Modes:
+
+- off        one request per call
+- duplicate  a second request to the same model past the p95 deadline
+- fallback   the second request goes to another model (gpt-4 -> gpt-4o,
+             gpt-4o -> gpt-3.5-turbo)
+
+--warmup unhedged calls per agent first fill the latency windows the
+deadlines come from. openai_client's rate budgets are lifted so only the
+stub's latency is measured. Reports p50/p95/p99 per agent and the extra
+requests hedging sent.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+
+import numpy as np
+import openai
+
+import Generation
+import hedge
+import openai_client
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+FINAL_MODEL = "gpt-4"
+FALLBACKS = {"gpt-4": "gpt-4o", "gpt-4o": "gpt-3.5-turbo"}
+
+
+def final_call(i):
+    Generation.final_agent(
+        FINAL_MODEL,
+        "Major depressive disorder",
+        CANDIDATES,
+        f"{QUERY} ({i})",
+        FOLLOWUP_Q,
+        FOLLOWUP_A,
+    )
+
+
+def followup_call(i):
+    Generation.followup_agent(f"{QUERY} ({i})", CANDIDATES)
+
+
+AGENTS = {"final_agent": final_call, "followup_agent": followup_call}
+
+
+def load(fn, calls, clients, offset):
+    """Call fn(offset + i) for i < calls from `clients` threads; returns latencies."""
+    latencies = [0.0] * calls
+    counter = iter(range(calls))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            fn(offset + i)
+            latencies[i] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def run_mode(mode, server, args, offset):
+    hedge.ENABLED = mode != "off"
+    hedge.FALLBACKS = FALLBACKS if mode == "fallback" else {}
+    result = {}
+    for agent, fn in AGENTS.items():
+        before = server.requests
+        latencies = load(fn, args.calls, args.clients, offset)
+        result[agent] = {
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "max_ms": float(max(latencies) * 1000),
+            "extra_requests": server.requests - before - args.calls,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300, help="calls per agent and mode")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub minimum seconds")
+    parser.add_argument("--tail-alpha", type=float, default=1.5)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    hedge.PERCENTILE = args.percentile
+    results = {}
+    with StubOpenAIServer(latency=args.latency, tail_alpha=args.tail_alpha) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+        # Measure the stub's latency, not the default per-model budgets
+        openai_client.DEFAULT_RPM = openai_client.DEFAULT_TPM = 1e9
+        openai_client._limiters.clear()
+        offset = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            hedge.ENABLED = False
+            for fn in AGENTS.values():
+                load(fn, args.warmup, args.clients, offset)
+            offset += args.warmup
+            for mode in ("off", "duplicate", "fallback"):
+                results[mode] = run_mode(mode, server, args, offset)
+                offset += args.calls
+        results["deadlines_ms"] = {
+            f"{agent}/{model}": window.percentile(args.percentile) * 1000
+            for (agent, model), window in hedge._windows.items()
+            if window.percentile(args.percentile) is not None
+        }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(
+        f"{args.calls} calls per agent, {args.clients} concurrent, stub delay "
+        f"{args.latency * 1000:.0f} ms x Pareto({args.tail_alpha}), hedge at p{args.percentile:g}"
+    )
+    for agent in AGENTS:
+        print(f"  {agent}")
+        for mode in ("off", "duplicate", "fallback"):
+            r = results[mode][agent]
+            print(
+                f"    {mode:<9}  p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  "
+                f"p99 {r['p99_ms']:7.1f}  max {r['max_ms']:7.1f} ms  "
+                f"extra requests {r['extra_requests']:4d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Offline ingestion throughput with stubbed Wikipedia and embedding backends.
+
+    python -m benchmark.ingest_throughput --topics 2000 --crash-after 500
+
+Fetches sleep --fetch-latency seconds and embedding batches sleep
+--embed-latency seconds. With --crash-after the first run aborts after that
+many fetches, having fetched at most one window of topics more, and a
+second run resumes from the checkpoint.
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmark.stub_openai import stub_embedding
+from ingest import ingest
+
+
+class SimulatedCrash(BaseException):
+    """Escapes ingest()'s per-topic error handling, like a killed process would."""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--fetch-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.2)
+    parser.add_argument("--rate", type=float, default=200.0, help="fetches per second")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--crash-after", type=int, default=None)
+    args = parser.parse_args()
+
+    topics = [f"Topic {i}" for i in range(args.topics)]
+    checkpoint = os.path.join(tempfile.mkdtemp(prefix="ingest_bench_"), "checkpoint.jsonl")
+    fetched = 0
+    lock = threading.Lock()
+
+    def fetch_summary(topic):
+        nonlocal fetched
+        time.sleep(args.fetch_latency)
+        with lock:
+            fetched += 1
+            if args.crash_after is not None and fetched == args.crash_after:
+                raise SimulatedCrash(topic)
+        return f"{topic} is a condition described in a stub summary."
+
+    def embed_batch(summaries):
+        time.sleep(args.embed_latency)
+        return [stub_embedding(summary, dimension=8) for summary in summaries]
+
+    def run():
+        return ingest(
+            topics,
+            fetch_summary,
+            embed_batch,
+            checkpoint_path=checkpoint,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            fetches_per_second=args.rate,
+        )
+
+    serial_estimate = args.topics * (args.fetch_latency + args.embed_latency + 1.0)
+    print(f"Old loop (fetch + embed + sleep(1) per topic): ~{serial_estimate:,.0f}s")
+
+    try:
+        records, stats = run()
+    except SimulatedCrash:
+        # Fetches already running or queued in the window finish; the rest are cancelled
+        print(
+            f"Simulated crash after {args.crash_after} fetches; the run stopped after "
+            f"{fetched} of {args.topics}. Rerunning"
+        )
+        records, stats = run()
+    print(f"{len(records)} of {args.topics} topics in the corpus")
+
+
+if __name__ == "__main__":
+    main()
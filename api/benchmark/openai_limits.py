@@ -0,0 +1,130 @@
+"""Goodput under provider rate limits: bare openai calls vs openai_client.
+
+    python -m benchmark.openai_limits --requests 400 --clients 32 --limit 40 [--json]
+
+The stub server admits --limit requests per model per second and answers
+429 beyond that, like the real API's per-minute limits scaled down so the
+run takes seconds. Each request runs on a fresh thread, as under Flask's
+threaded server, at most --clients at a time, spread over the three judge
+models:
+
+- bare     openai.ChatCompletion.create with openai's default per-thread
+           sessions and no limits or retries; a 429 is a failed request
+- client   openai_client.chat_completion with a shared connection pool,
+           per-model budgets at 90% of the provider limit and retries
+
+Reports completed and failed requests, 429s answered by the server,
+goodput, latency and TCP connections opened.
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+import openai
+
+import openai_client
+from benchmark.stub_openai import StubOpenAIServer
+
+MODELS = ["gpt-4o", "gpt-3.5-turbo", "gpt-4"]
+MESSAGES = [
+    {"role": "system", "content": "You are a DSM-5 diagnostic assistant."},
+    {"role": "user", "content": "I cannot focus even when I have enough sleep."},
+]
+
+
+def load(create, requests, clients):
+    """Run `requests` calls, each on a new thread, `clients` at a time."""
+    slots = threading.BoundedSemaphore(clients)
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def one(i):
+        try:
+            start = time.perf_counter()
+            try:
+                create(model=MODELS[i % len(MODELS)], messages=MESSAGES, max_tokens=300)
+            except Exception as e:
+                with lock:
+                    failures.append(type(e).__name__)
+                return
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        finally:
+            slots.release()
+
+    threads = []
+    start = time.perf_counter()
+    for i in range(requests):
+        slots.acquire()
+        thread = threading.Thread(target=one, args=(i,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return latencies, failures, time.perf_counter() - start
+
+
+def run(mode, args):
+    limit = {model: args.limit for model in MODELS}
+    with StubOpenAIServer(latency=args.latency, rpm_limit=limit, rate_window=1.0) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+        if mode == "bare":
+            openai.requestssession = None
+            create = openai.ChatCompletion.create
+        else:
+            openai.requestssession = openai_client.session_factory()
+            # Per-second provider limit -> per-minute budget, a little under it;
+            # the stub limits requests only, so tokens are left unbounded
+            openai_client.MODEL_LIMITS = {
+                model: {"rpm": 0.9 * args.limit * 60, "tpm": 1e9, "concurrency": args.clients}
+                for model in MODELS
+            }
+            openai_client.LIMIT_BURST_SECONDS = 0.1
+            openai_client._limiters.clear()
+            create = openai_client.chat_completion
+        latencies, failures, wall = load(create, args.requests, args.clients)
+        result = {
+            "completed": len(latencies),
+            "failed": len(failures),
+            "server_429s": server.rejected,
+            "goodput_per_s": len(latencies) / wall,
+            "connections": server.connections,
+        }
+    if latencies:
+        result["p50_ms"] = float(np.percentile(latencies, 50) * 1000)
+        result["p95_ms"] = float(np.percentile(latencies, 95) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=40, help="requests/s per model")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds per request")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {mode: run(mode, args) for mode in ("bare", "client")}
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(
+        f"{args.requests} requests, {args.clients} concurrent, "
+        f"provider limit {args.limit}/s per model"
+    )
+    for mode, r in results.items():
+        print(
+            f"  {mode:<7} completed {r['completed']:4d}  failed {r['failed']:4d}  "
+            f"429s {r['server_429s']:4d}  goodput {r['goodput_per_s']:6.1f}/s  "
+            f"p95 {r.get('p95_ms', 0):7.1f} ms  connections {r['connections']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Prompt tokens and latency of vote_for_results with and without compaction.
+
+    python -m benchmark.prompt_budget --candidates 10 --budget 1500
+
+Builds candidates shaped like Wikipedia summaries (long, with boilerplate
+sentences shared between related topics), runs both voting rounds against
+the local stub completion server and sums the prompt tokens the stub
+reports, once with the budget disabled and once with --budget. Also times
+the metrics spans to check their overhead against a request.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import openai
+
+import Generation
+import llm_cache
+import metrics
+from benchmark.stub_openai import DIAGNOSES, StubOpenAIServer
+from benchmark.vote_fanout import FOLLOWUP_A, FOLLOWUP_Q, QUERY
+from token_budget import count_tokens
+
+SHARED = [
+    "It is classified in the Diagnostic and Statistical Manual of Mental Disorders.",
+    "Treatment typically involves psychotherapy, medication, or a combination of both.",
+    "The condition can affect sleep, concentration, appetite and daily functioning.",
+    "Symptoms often begin in adolescence or early adulthood.",
+]
+WORDS = (
+    "patients mood sleep attention anxiety memory energy focus stress worry "
+    "clinical episode chronic symptoms cognitive behavioral onset prevalence"
+).split()
+
+
+def synthetic_candidates(n, sentences=30, seed=0):
+    rng = random.Random(seed)
+    topics = (DIAGNOSES * (n // len(DIAGNOSES) + 1))[:n]
+    candidates = {}
+    for i, topic in enumerate(topics):
+        body = [f"{topic.capitalize()} is a mental health condition."]
+        for _ in range(sentences):
+            words = rng.sample(WORDS, 10)
+            body.append(" ".join(words).capitalize() + ".")
+        body[5:5] = SHARED
+        candidates[f"{topic.title()} {i}"] = " ".join(body)
+    return candidates
+
+
+def run(candidates, budget):
+    Generation.DOCUMENT_TOKEN_BUDGET = budget
+    llm_cache._cache = llm_cache.LLMCache(path="")
+    before = metrics.registry._counters.copy()
+    start = time.perf_counter()
+    Generation.vote_for_results(candidates, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+    seconds = time.perf_counter() - start
+    prompt = sum(
+        value - before.get(key, 0)
+        for key, value in metrics.registry._counters.items()
+        if key[0] == "llm_tokens_total" and ("type", "prompt") in key[1]
+    )
+    return prompt, seconds
+
+
+def span_overhead(n=100_000):
+    start = time.perf_counter()
+    for _ in range(n):
+        with metrics.span("overhead", model="stub"):
+            pass
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    candidates = synthetic_candidates(args.candidates)
+    document_tokens = sum(count_tokens(s) for s in candidates.values())
+    # vote_for_results writes its vote log (vote_log/) under the working directory
+    os.chdir(tempfile.mkdtemp(prefix="prompt_budget_bench_"))
+
+    with StubOpenAIServer(latency=args.latency) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+        full_tokens, full_seconds = run(candidates, 10**9)
+        compact_tokens, compact_seconds = run(candidates, args.budget)
+
+    print(f"{args.candidates} candidates, {document_tokens} summary tokens")
+    print(f"  {'':<10} {'prompt tokens':>14} {'seconds':>8}")
+    print(f"  {'full':<10} {full_tokens:14d} {full_seconds:8.2f}")
+    print(f"  {'compacted':<10} {compact_tokens:14d} {compact_seconds:8.2f}")
+    print(f"  saved {1 - compact_tokens / full_tokens:.0%} of prompt tokens")
+
+    per_span = span_overhead()
+    # One analyze request records about a dozen spans
+    print(
+        f"span overhead {per_span * 1e6:.1f} us; 12 spans are "
+        f"{12 * per_span / compact_seconds:.4%} of the compacted voting time"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Memory and throughput of N API workers: per-worker indexes vs a retrieval server.
+
+    python -m benchmark.retrieval_server --size 20000 --workers 1 4 16 --seconds 5 [--json]
+
+Each worker is a separate process, like a gunicorn worker, running
+--threads threads that each call Query.retrieveFAISS and
+Query.retrieveBM25 (the retrieval half of generate_candidate) in a loop
+for --seconds, with query vectors drawn up front so no embedding requests
+are made. Modes:
+
+- local   every worker loads the FAISS index, BM25 arrays and mmap doc store
+- server  workers set RETRIEVAL_SOCKET and one retrieval_server.py process
+          answers them all, batching concurrent queries
+
+Memory is summed over all processes (the server included) as RSS and as
+PSS, which splits shared pages, such as the memory-mapped BM25 arrays and
+doc store, between the processes mapping them. Throughput is retrievals
+(one FAISS + one BM25 query) per second across all workers.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark.suite import API_DIR, prepare_corpus
+from benchmark.synthetic_corpus import CorpusGenerator
+
+
+def memory_mib(pid):
+    """Return (RSS, PSS) of process `pid` in MiB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Rss:", "Pss:")):
+                key, kib = line.split()[:2]
+                values[key] = int(kib) / 1024
+    return values.get("Rss:", 0.0), values.get("Pss:", 0.0)
+
+
+def environment(workdir, socket_path=None):
+    env = {
+        "DOC_STORE_BACKEND": "mmap",
+        "FAISS_INDEX_PATH": os.path.join(workdir, "wiki_faiss.index"),
+        "BM25_INDEX_PATH": os.path.join(workdir, "wiki_bm25"),
+        "DOC_STORE_PATH": os.path.join(workdir, "wiki_docs"),
+        "CORPUS_META_PATH": os.path.join(workdir, "wiki_meta.parquet"),
+        "RETRIEVAL_SOCKET": socket_path or "",
+    }
+    return env
+
+
+def worker(env, queries, vectors, threads, seconds, ready, go, results):
+    os.environ.update(env)
+    sys.path.insert(0, API_DIR)
+    import threading
+
+    import retrieval_server
+    from Input_pip import Query
+    from retrieval_context import get_context
+
+    if retrieval_server.SOCKET:
+        retrieval_server.get_client().wait_until_ready()
+    else:
+        context = get_context()
+        context.index()
+        context.bm25()
+        context.doc_store()
+    # One untimed query so lazily mapped pages are touched before measuring
+    Query.retrieveFAISS(vectors[:1], 5)
+    Query.retrieveBM25(queries[0], 5)
+    ready.release()
+    go.wait()
+
+    counts = [0] * threads
+
+    def loop(t):
+        i = t
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            Query.retrieveFAISS(vectors[i % len(vectors)][None], 5)
+            Query.retrieveBM25(queries[i % len(queries)], 5)
+            counts[t] += 1
+            i += threads
+
+    pool = [threading.Thread(target=loop, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((sum(counts), memory_mib(os.getpid())))
+
+
+def start_server(workdir, socket_path):
+    env = dict(os.environ, PYTHONPATH=API_DIR, **environment(workdir, socket_path))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(API_DIR, "retrieval_server.py"), "--socket", socket_path],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while not os.path.exists(socket_path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("retrieval server did not start")
+        time.sleep(0.1)
+    return server
+
+
+def run(mode, n_workers, workdir, queries, vectors, args):
+    socket_path = os.path.join(workdir, "retrieval.sock") if mode == "server" else None
+    server = start_server(workdir, socket_path) if socket_path else None
+    spawn = multiprocessing.get_context("spawn")
+    ready, go, results = spawn.Semaphore(0), spawn.Event(), spawn.Queue()
+    env = environment(workdir, socket_path)
+    processes = [
+        spawn.Process(
+            target=worker,
+            args=(env, queries, vectors, args.threads, args.seconds, ready, go, results),
+        )
+        for _ in range(n_workers)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.acquire()
+        go.set()
+        outcomes = [results.get() for _ in processes]
+        server_memory = memory_mib(server.pid) if server else (0.0, 0.0)
+        if server:
+            from retrieval_server import RetrievalClient
+
+            stats = RetrievalClient(socket_path).counters()
+    finally:
+        for process in processes:
+            process.join()
+        if server:
+            server.terminate()
+            server.wait()
+
+    result = {
+        "retrievals_per_s": sum(count for count, _ in outcomes) / args.seconds,
+        "rss_mib": sum(rss for _, (rss, _) in outcomes) + server_memory[0],
+        "pss_mib": sum(pss for _, (_, pss) in outcomes) + server_memory[1],
+        "server_rss_mib": server_memory[0],
+    }
+    if server:
+        result["faiss_queries_per_batch"] = stats["faiss_queries"] / max(1, stats["faiss_batches"])
+        result["bm25_queries_per_batch"] = stats["bm25_queries"] / max(1, stats["bm25_batches"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="reuse a corpus across runs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--threads", type=int, default=4, help="request threads per worker")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="retrieval_server_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, API_DIR)
+    prepare_corpus(workdir, args.size, args.seed, "flat")
+    queries = CorpusGenerator(args.seed).queries(200, seed=args.seed + 1)
+    vectors = np.random.default_rng(args.seed).standard_normal((200, 1536)).astype("float32")
+
+    results = {
+        mode: {n: run(mode, n, workdir, queries, vectors, args) for n in args.workers}
+        for mode in ("local", "server")
+    }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{args.size} topics, {args.threads} threads per worker, {args.seconds:g}s per run")
+    for n in args.workers:
+        for mode in ("local", "server"):
+            r = results[mode][n]
+            batching = ""
+            if mode == "server":
+                batching = (
+                    f"  batch faiss {r['faiss_queries_per_batch']:4.1f} "
+                    f"bm25 {r['bm25_queries_per_batch']:4.1f}"
+                )
+            print(
+                f"  {n:2d} workers {mode:<6}  {r['retrievals_per_s']:7.1f} retrievals/s  "
+                f"RSS {r['rss_mib']:7.0f} MiB  PSS {r['pss_mib']:7.0f} MiB{batching}"
+            )
+
+
+if __name__ == "__main__":
+    main()
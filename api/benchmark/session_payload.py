@@ -0,0 +1,124 @@
+"""Request/response bytes and handler latency of /api/analyze, legacy vs session.
+
+    python -m benchmark.session_payload --size 20000 --requests 30 [--json]
+
+Runs the same conversations twice through the Flask test client, against
+the suite's synthetic corpus, in-memory Mongo and stub OpenAI server:
+
+- legacy   /api/generate with "includeCandidates": true, then the whole
+           query, candidate dict and follow-up questions POSTed back
+- session  /api/generate, then only {"sessionId", "userFollowupResponse"}
+
+Bytes are the JSON bodies on the wire; latency is the /api/analyze
+handler as seen by the test client. --latency defaults to zero so the
+model round-trips do not hide the handler's own cost.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import openai
+
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.suite import API_DIR, install_backends, prepare_corpus
+from benchmark.synthetic_corpus import CorpusGenerator
+from benchmark.vote_fanout import FOLLOWUP_A
+
+
+def analyze_body(mode, generated):
+    if mode == "session":
+        return {"sessionId": generated["sessionId"], "userFollowupResponse": FOLLOWUP_A}
+    return {
+        "initialQuery": generated["initialQuery"],
+        "candidates": generated["candidates"],
+        "followUpQuestions": generated["followupQuestions"],
+        "userFollowupResponse": FOLLOWUP_A,
+    }
+
+
+def conversation(client, query, mode):
+    """Return (generate response bytes, analyze request bytes, analyze response bytes, analyze ms)."""
+    generate = {"query": query}
+    if mode == "legacy":
+        generate["includeCandidates"] = True
+    response = client.post("/api/generate", json=generate)
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/generate returned {response.status_code}")
+    generated_bytes = len(response.data)
+
+    body = json.dumps(analyze_body(mode, response.get_json()))
+    start = time.perf_counter()
+    response = client.post("/api/analyze", data=body, content_type="application/json")
+    seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/analyze returned {response.status_code}")
+    return generated_bytes, len(body.encode()), len(response.data), seconds * 1000
+
+
+def run_mode(client, queries, mode):
+    rows = [conversation(client, query, mode) for query in queries]
+    generate, request, response, ms = (list(column) for column in zip(*rows))
+    return {
+        "generate_response_bytes": statistics.fmean(generate),
+        "analyze_request_bytes": statistics.fmean(request),
+        "analyze_response_bytes": statistics.fmean(response),
+        "analyze_p50_ms": float(np.percentile(ms, 50)),
+        "analyze_p95_ms": float(np.percentile(ms, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="reuse a corpus across runs")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub seconds to first token")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="session_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, API_DIR)
+    os.chdir(workdir)
+    os.environ["WARM_ON_IMPORT"] = "0"
+
+    prepare_corpus(workdir, args.size, args.seed, "flat")
+    install_backends(workdir, SimpleNamespace(mongo_latency=0.0, doc_store="mongo"))
+    queries = CorpusGenerator(args.seed).queries(args.requests, seed=args.seed + 1)
+
+    results = {"size": args.size, "requests": args.requests}
+    with StubOpenAIServer(latency=args.latency) as server:
+        openai.api_base = server.api_base
+        with contextlib.redirect_stdout(io.StringIO()):
+            import index
+
+            # Importing the pipeline sets openai.api_key from the environment
+            openai.api_key = "stub"
+            client = index.app.test_client()
+            conversation(client, queries[0], "session")
+            for mode in ("legacy", "session"):
+                results[mode] = run_mode(client, queries, mode)
+        results["sessions"] = index.get_session_store().counters()
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    legacy, session = results["legacy"], results["session"]
+    print(f"{args.size:,} topics, {args.requests} conversations")
+    print(f"  {'':<24} {'legacy':>10} {'session':>10}")
+    for key in legacy:
+        print(f"  {key:<24} {legacy[key]:10.1f} {session[key]:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Import time and boot-to-ready time of the Flask API.
+
+    python -m benchmark.startup --size 20000 --runs 5 [--json]
+
+Builds a synthetic corpus with its FAISS, BM25 and mmap doc-store artifacts
+in a temporary directory, then measures in fresh subprocesses:
+
+- import         `import index` with the warm-up disabled, and its slowest modules
+- live / ready   `python index.py` until /healthz and /readyz answer 200
+- legacy import  `import RetrievalDB`, which index.py used to import at boot
+
+Readiness runs against DOC_STORE_BACKEND=mmap so no MongoDB is needed.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmark.synthetic_corpus import build_indexes, write_corpus
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def environment(workdir, **extra):
+    env = dict(os.environ, PYTHONPATH=API_DIR, DOC_STORE_BACKEND="mmap", **extra)
+    env["FAISS_INDEX_PATH"] = os.path.join(workdir, "wiki_faiss.index")
+    return env
+
+
+def timed_import(module, workdir, env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {module}"], cwd=workdir, env=env, capture_output=True
+    )
+    seconds = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(result.stderr.decode().strip().splitlines()[-1])
+    return seconds
+
+
+def slowest_imports(workdir, env, top=8):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import index"],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nesting is shown by indentation; keep modules imported by index.py itself
+        name = name.rstrip()[1:]
+        if name.startswith("  ") and not name.startswith("   "):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def boot(workdir, env, timeout=60):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(API_DIR, "index.py")],
+        cwd=workdir,
+        env=dict(env, PORT=str(port)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        live = wait_for(f"http://127.0.0.1:{port}/healthz", deadline)
+        live_seconds = time.perf_counter() - start
+        ready = live and wait_for(f"http://127.0.0.1:{port}/readyz", deadline)
+        ready_seconds = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    if not ready:
+        raise RuntimeError(f"server not ready within {timeout}s")
+    return live_seconds, ready_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup_bench_")
+    write_corpus(workdir, args.size)
+    build_indexes(workdir)
+    env = environment(workdir)
+
+    results = {"size": args.size}
+    results["import_s"] = statistics.median(
+        timed_import("index", workdir, dict(env, WARM_ON_IMPORT="0")) for _ in range(args.runs)
+    )
+    boots = [boot(workdir, env) for _ in range(args.runs)]
+    results["live_s"] = statistics.median(b[0] for b in boots)
+    results["ready_s"] = statistics.median(b[1] for b in boots)
+    try:
+        results["legacy_import_s"] = statistics.median(
+            timed_import("RetrievalDB", workdir, env) for _ in range(args.runs)
+        )
+    except RuntimeError as e:
+        results["legacy_import_error"] = str(e)
+    results["slowest_imports_ms"] = dict(
+        (name, ms) for ms, name in slowest_imports(workdir, dict(env, WARM_ON_IMPORT="0"))
+    )
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{args.size:,} topics, median of {args.runs} runs")
+    print(f"  import index        {results['import_s']:6.2f}s")
+    print(f"  /healthz 200 after  {results['live_s']:6.2f}s")
+    print(f"  /readyz 200 after   {results['ready_s']:6.2f}s")
+    if "legacy_import_s" in results:
+        print(f"  import RetrievalDB  {results['legacy_import_s']:6.2f}s (no longer on the boot path)")
+    else:
+        print(f"  import RetrievalDB  failed: {results['legacy_import_error']}")
+    print("  slowest imports:")
+    for name, ms in results["slowest_imports_ms"].items():
+        print(f"    {name:<20} {ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
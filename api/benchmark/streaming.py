@@ -0,0 +1,87 @@
+"""Time-to-first-byte and total latency of blocking vs streamed agents.
+
+    python -m benchmark.streaming --latency 0.4 --token-latency 0.03 --runs 5
+
+Runs followup_agent / final_agent and their *_stream variants against the
+local stub completion server, which streams one word per --token-latency.
+For the blocking agents the first byte is the whole answer; for the
+streamed ones it is the first token, and for follow-ups also the first
+complete question (what the chat page shows first).
+"""
+
+import argparse
+import statistics
+import time
+
+import openai
+
+import Generation
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+
+def timed_blocking(call, questions=False):
+    start = time.perf_counter()
+    call()
+    total = time.perf_counter() - start
+    timings = {"first_byte": total, "total": total}
+    if questions:
+        timings["first_question"] = total
+    return timings
+
+
+def timed_stream(events):
+    start = time.perf_counter()
+    timings = {}
+    for event in events:
+        now = time.perf_counter() - start
+        timings.setdefault("first_byte", now)
+        if isinstance(event, tuple) and event[0] == "question":
+            timings.setdefault("first_question", now)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def report(name, runs):
+    columns = ["first_byte", "first_question", "total"]
+    medians = [
+        statistics.median(run[c] for run in runs) if all(c in run for run in runs) else None
+        for c in columns
+    ]
+    cells = " ".join(f"{m * 1000:10.0f}" if m is not None else f"{'-':>10}" for m in medians)
+    print(f"  {name:<24} {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.4, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.03, help="seconds per streamed word")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubOpenAIServer(latency=args.latency, token_latency=args.token_latency) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+        followup_q = " ".join(FOLLOWUP_Q)
+        followup_a = ". ".join(FOLLOWUP_A)
+        final_args = ("gpt-4o", "insomnia", CANDIDATES, QUERY, followup_q, followup_a)
+
+        cases = {
+            "followup_agent": lambda: timed_blocking(
+                lambda: Generation.followup_agent(QUERY, CANDIDATES), questions=True
+            ),
+            "followup_agent_stream": lambda: timed_stream(
+                Generation.followup_agent_stream(QUERY, CANDIDATES)
+            ),
+            "final_agent": lambda: timed_blocking(lambda: Generation.final_agent(*final_args)),
+            "final_agent_stream": lambda: timed_stream(Generation.final_agent_stream(*final_args)),
+        }
+
+        print(f"median of {args.runs} runs, ms")
+        print(f"  {'':<24} {'first byte':>10} {'first q':>10} {'total':>10}")
+        for name, case in cases.items():
+            report(name, [case() for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""In-process stand-in for the parts of pymongo the pipeline uses.
+
+Covers MongoClient[db][collection] with find/find_one (by _id, `$in` or
+everything, with inclusive projections), insert_many, bulk_write of
+UpdateOne upserts, delete_many and count_documents. `latency` adds a fixed
+delay per call to model the network round trip to a real server.
+
+    client = MemoryClient(latency=0.0005)
+    context._client = client        # RetrievalContext then uses it for Mongo
+"""
+
+import copy
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _matches(doc_id, filter):
+    if not filter:
+        return True
+    wanted = filter["_id"]
+    if isinstance(wanted, dict):
+        return doc_id in wanted["$in"]
+    return doc_id == wanted
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = {k for k, v in projection.items() if v}
+    return {k: copy.deepcopy(v) for k, v in doc.items() if k == "_id" or k in fields}
+
+
+class MemoryCollection:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _select(self, filter):
+        if filter and "_id" in filter and isinstance(filter["_id"], dict):
+            ids = filter["_id"]["$in"]
+            return [self._docs[i] for i in dict.fromkeys(ids) if i in self._docs]
+        if filter and "_id" in filter:
+            doc = self._docs.get(filter["_id"])
+            return [doc] if doc is not None else []
+        return list(self._docs.values())
+
+    def find(self, filter=None, projection=None):
+        self._wait()
+        with self._lock:
+            selected = self._select(filter)
+        return iter([_project(doc, projection) for doc in selected])
+
+    def find_one(self, filter=None, projection=None):
+        return next(self.find(filter, projection), None)
+
+    def insert_many(self, documents):
+        self._wait()
+        with self._lock:
+            for doc in documents:
+                self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in documents])
+
+    def bulk_write(self, operations, ordered=True):
+        """Apply UpdateOne({"_id": ...}, {"$set": ...}, upsert=...) operations."""
+        self._wait()
+        matched = upserted = 0
+        with self._lock:
+            for op in operations:
+                doc_id = op._filter["_id"]
+                fields = copy.deepcopy(op._doc["$set"])
+                if doc_id in self._docs:
+                    self._docs[doc_id].update(fields)
+                    matched += 1
+                elif op._upsert:
+                    self._docs[doc_id] = dict(_id=doc_id, **fields)
+                    upserted += 1
+        return SimpleNamespace(matched_count=matched, upserted_count=upserted)
+
+    def delete_many(self, filter):
+        self._wait()
+        with self._lock:
+            doomed = [doc_id for doc_id in self._docs if _matches(doc_id, filter)]
+            for doc_id in doomed:
+                del self._docs[doc_id]
+        return SimpleNamespace(deleted_count=len(doomed))
+
+    def count_documents(self, filter):
+        self._wait()
+        with self._lock:
+            return len(self._select(filter))
+
+
+class MemoryDatabase:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self.latency)
+        return self._collections[name]
+
+
+class MemoryClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self.latency)
+        return self._databases[name]
+
+    def close(self):
+        pass
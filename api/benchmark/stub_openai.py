@@ -0,0 +1,294 @@
+"""Local stand-in for the OpenAI HTTP API with configurable latency.
+
+Point the openai client at it with `openai.api_base = server.api_base`.
+Chat replies are shaped after the calling agent's system prompt so the
+existing parsers in Generation.py work unchanged:
+
+- follow-up prompts get five questions,
+- diagnostic prompts get a "Diagnoses: ... / Likelihoods: ..." block,
+- anything else gets a short markdown answer.
+
+Embedding replies are deterministic pseudo-random 1536-d vectors.
+Chat requests with "stream": true are answered as Server-Sent Events,
+one word per chunk, `token_latency` seconds apart.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIAGNOSES = [
+    "major depressive disorder",
+    "insomnia",
+    "generalized anxiety disorder",
+    "attention deficit hyperactivity disorder",
+    "obsessive-compulsive disorder",
+    "bipolar ii disorder",
+    "adjustment disorder",
+]
+
+QUESTIONS = [
+    "How long have you been feeling this way?",
+    "Do you find it hard to fall asleep or stay asleep?",
+    "Have you lost interest in things you used to enjoy?",
+    "Do these feelings affect your work or relationships?",
+    "Have you noticed any changes in appetite or energy?",
+]
+
+
+def stub_embedding(text, dimension=1536):
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dimension)]
+
+
+def chat_reply(model, messages, split_judges=False):
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    if "follow-up questions" in system:
+        return " ".join(QUESTIONS)
+    if "top 5 possible diagnoses" in system:
+        # Judges mostly agree but each model shuffles the tail a little;
+        # split judges each put a different diagnosis first
+        rng = random.Random(model)
+        tail = DIAGNOSES[1:]
+        rng.shuffle(tail)
+        if split_judges:
+            diagnoses = tail[:1] + [DIAGNOSES[0]] + tail[1:4]
+        else:
+            diagnoses = [DIAGNOSES[0]] + tail[:4]
+        return f"Diagnoses: {', '.join(diagnoses)}\nLikelihoods: 5, 4, 3, 2, 1"
+    return (
+        "### Why this diagnosis\n"
+        "Your description lines up with the usual signs.\n\n"
+        "### What you can try\n"
+        "- Keep a regular sleep schedule\n"
+        "- Take short walks outside\n"
+    )
+
+
+def stream_chunks(content):
+    """Split a reply into word-sized pieces, roughly one model token each."""
+    return re.findall(r"\s*\S+", content)
+
+
+def stub_usage(messages, content):
+    """Token usage estimated at four characters per token."""
+    prompt = sum(len(m.get("content", "")) for m in messages) // 4
+    completion = len(content) // 4
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent judges overflow the default backlog of 5
+    request_queue_size = 128
+
+
+class StubOpenAIServer:
+    """Threaded HTTP server answering /v1/chat/completions and /v1/embeddings.
+
+    `latency` is the default delay in seconds before the first byte;
+    `model_latency` overrides it per model; `fail_models` answer with HTTP
+    500. `token_latency` is the delay per generated word, applied between
+    streamed chunks and in total before a non-streamed reply. `prompt_rate`
+    (prompt tokens per second, 0 = free) adds prefill time before the first
+    byte, so longer prompts answer later. With `split_judges` the
+    diagnostic judges disagree on the top diagnosis. `rpm_limit` maps a
+    model to the requests it accepts per sliding `rate_window` seconds (a
+    minute by default); beyond that it answers 429 with Retry-After, like
+    the real API. With `tail_alpha` > 0 each request's delay is scaled by a
+    Pareto(tail_alpha) draw (minimum 1), a heavy tail: alpha 1.5 puts p99
+    at about 14x the median delay.
+
+    Connections are HTTP/1.1 keep-alive (streams close theirs);
+    `connections` counts the TCP connections accepted and `rejected` the
+    429 answers.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        model_latency=None,
+        fail_models=(),
+        port=0,
+        token_latency=0.0,
+        prompt_rate=0.0,
+        split_judges=False,
+        rpm_limit=None,
+        rate_window=60.0,
+        tail_alpha=0.0,
+    ):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prompt_rate = prompt_rate
+        self.split_judges = split_judges
+        self.model_latency = dict(model_latency or {})
+        self.fail_models = set(fail_models)
+        self.rpm_limit = dict(rpm_limit or {})
+        self.rate_window = rate_window
+        self.tail_alpha = tail_alpha
+        self.requests = 0
+        self.connections = 0
+        self.rejected = 0
+        self._recent = {}
+        self._lock = threading.Lock()
+        self._httpd = _Server(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def api_base(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/v1"
+
+    def delay_for(self, model):
+        delay = self.model_latency.get(model, self.latency)
+        if self.tail_alpha:
+            delay *= random.paretovariate(self.tail_alpha)
+        return delay
+
+    def retry_after(self, model):
+        """Seconds until `model` may be called again, or 0 if this request is admitted."""
+        limit = self.rpm_limit.get(model)
+        if not limit:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            recent = self._recent.setdefault(model, deque())
+            while recent and recent[0] <= now - self.rate_window:
+                recent.popleft()
+            if len(recent) >= limit:
+                self.rejected += 1
+                return recent[0] + self.rate_window - now
+            recent.append(now)
+        return 0.0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; on a kept-alive connection
+            # Nagle + delayed ACK would add ~40 ms to every response
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=()):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, model, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                # No Content-Length, so the end of the stream is the end of the connection
+                self.send_header("Connection", "close")
+                self.close_connection = True
+                self.end_headers()
+                for i, piece in enumerate(stream_chunks(content)):
+                    if i:
+                        time.sleep(server.token_latency)
+                    self._event({"delta": {"content": piece}, "finish_reason": None}, model)
+                self._event({"delta": {}, "finish_reason": "stop"}, model)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _event(self, choice, model):
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [dict(index=0, **choice)],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                model = request.get("model", "")
+                with server._lock:
+                    server.requests += 1
+                wait = server.retry_after(model)
+                if wait:
+                    self._send(
+                        429,
+                        {"error": {"message": "Rate limit reached", "type": "requests"}},
+                        headers=[("Retry-After", f"{wait:.3f}")],
+                    )
+                    return
+                time.sleep(server.delay_for(model))
+                if server.prompt_rate and "messages" in request:
+                    prompt_tokens = stub_usage(request["messages"], "")["prompt_tokens"]
+                    time.sleep(prompt_tokens / server.prompt_rate)
+
+                if model in server.fail_models:
+                    self._send(500, {"error": {"message": "stub failure", "type": "server_error"}})
+                elif self.path.endswith("/chat/completions") and request.get("stream"):
+                    content = chat_reply(model, request.get("messages", []), server.split_judges)
+                    self._stream(model, content)
+                elif self.path.endswith("/chat/completions"):
+                    content = chat_reply(model, request.get("messages", []), server.split_judges)
+                    time.sleep(server.token_latency * len(stream_chunks(content)))
+                    self._send(200, {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion",
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": stub_usage(request.get("messages", []), content),
+                    })
+                elif self.path.endswith("/embeddings"):
+                    inputs = request.get("input", [])
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._send(200, {
+                        "object": "list",
+                        "model": model,
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": stub_embedding(text)}
+                            for i, text in enumerate(inputs)
+                        ],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    })
+                else:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,330 @@
+"""Offline end-to-end benchmark suite with machine-readable results.
+
+    python -m benchmark.suite run --size 20000 --requests 50 --out before.json
+    python -m benchmark.suite run --size 20000 --requests 50 --out after.json
+    python -m benchmark.suite compare before.json after.json
+
+Everything runs locally: OpenAI is the stub server (stub_openai) with
+configurable first-token latency, generation and prefill token rates;
+MongoDB is the in-process MemoryClient (stub_mongo); the corpus comes from
+synthetic_corpus and is cached in --workdir between runs. Scenarios:
+
+    generate_candidate   Query.generate_candidate(query, 5)
+    vote_for_results     both voting rounds over 10 candidates
+    api_generate         POST /api/generate through the Flask test client
+    api_analyze          POST /api/analyze through the Flask test client
+
+Each scenario reports latency percentiles, throughput at --concurrency and
+the process RSS, as JSON that `compare` diffs between commits. A scenario
+that fails to import or run is recorded with its error instead of
+stopping the suite.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import openai
+
+from benchmark.stub_mongo import MemoryClient
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.synthetic_corpus import CorpusGenerator, build_indexes, write_corpus
+from benchmark.vote_fanout import FOLLOWUP_A, FOLLOWUP_Q
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["generate_candidate", "vote_for_results", "api_generate", "api_analyze"]
+# Metrics where a lower value is better; compare marks the rest the other way
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms", "mean_ms", "rss_mib", "peak_rss_mib", "errors"}
+
+
+def memory_mib():
+    """Return (current RSS, peak RSS) of this process in MiB."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, kib = line.split()[:2]
+                values[key] = int(kib) / 1024
+    return values.get("VmRSS:", 0.0), values.get("VmHWM:", 0.0)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=API_DIR,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def prepare_corpus(workdir, size, seed, index_type):
+    """Generate and index the corpus unless `workdir` already holds this one."""
+    marker = os.path.join(workdir, "suite.json")
+    wanted = {"size": size, "seed": seed, "index_type": index_type}
+    try:
+        with open(marker) as f:
+            if json.load(f) == wanted:
+                return {}
+    except (FileNotFoundError, ValueError):
+        pass
+    start = time.perf_counter()
+    write_corpus(workdir, size, seed)
+    seconds = {"corpus": time.perf_counter() - start}
+    seconds.update(build_indexes(workdir, index_type=index_type))
+    with open(marker, "w") as f:
+        json.dump(wanted, f)
+    return seconds
+
+
+def install_backends(workdir, args):
+    """Point the retrieval context at the suite's corpus and the in-memory Mongo."""
+    import faiss_index
+    import retrieval_context
+    from corpus_store import load_metadata, load_vectors
+
+    client = MemoryClient(latency=args.mongo_latency)
+    collection = client["RetrivalDB"]["wiki_data"]
+    meta = load_metadata(os.path.join(workdir, "wiki_meta.parquet"))
+    vectors = load_vectors(os.path.join(workdir, "wiki_vectors.npy"))
+    faiss_index.bulk_upsert(collection, meta, vectors, np.ones(len(meta), dtype=bool))
+
+    context = retrieval_context.RetrievalContext(
+        index_path=os.path.join(workdir, "wiki_faiss.index"),
+        bm25_path=os.path.join(workdir, "wiki_bm25"),
+        doc_store_backend=args.doc_store,
+    )
+    context._client = client
+    retrieval_context._context = context
+    return meta
+
+
+def scenario_call(name):
+    """Return call(query, candidates) for scenario `name`; imports happen here."""
+    if name == "generate_candidate":
+        from Input_pip import Query
+
+        return lambda query, candidates: Query.generate_candidate(query, 5)
+    if name == "vote_for_results":
+        from Generation import vote_for_results
+
+        return lambda query, candidates: vote_for_results(
+            candidates, query, FOLLOWUP_Q, FOLLOWUP_A
+        )
+
+    import index
+
+    client = index.app.test_client()
+
+    def post(path, body):
+        response = client.post(path, json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        return response
+
+    if name == "api_generate":
+        return lambda query, candidates: post("/api/generate", {"query": query})
+    if name == "api_analyze":
+        return lambda query, candidates: post(
+            "/api/analyze",
+            {
+                "initialQuery": query,
+                "candidates": candidates,
+                "followUpQuestions": FOLLOWUP_Q,
+                "userFollowupResponse": FOLLOWUP_A,
+            },
+        )
+    raise ValueError(f"Unknown scenario {name!r}; choose from {SCENARIOS}.")
+
+
+def run_scenario(call, queries, candidate_sets, concurrency):
+    latencies = []
+    errors = []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            call(queries[i], candidate_sets[i])
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # One untimed call loads indexes and opens connections
+    call(queries[0], candidate_sets[0])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(len(queries))))
+    wall = time.perf_counter() - start
+
+    rss, peak = memory_mib()
+    result = {
+        "requests": len(queries),
+        "errors": len(errors),
+        "throughput_per_s": len(latencies) / wall if wall else 0.0,
+        "rss_mib": rss,
+        "peak_rss_mib": peak,
+    }
+    if latencies:
+        result.update(
+            p50_ms=float(np.percentile(latencies, 50)),
+            p95_ms=float(np.percentile(latencies, 95)),
+            p99_ms=float(np.percentile(latencies, 99)),
+            mean_ms=statistics.fmean(latencies),
+        )
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="benchmark_suite_")
+    os.makedirs(workdir, exist_ok=True)
+    workdir = os.path.abspath(workdir)
+    out = os.path.abspath(args.out) if args.out else None
+    # Scenario modules are imported after the chdir below
+    sys.path.insert(0, API_DIR)
+    # Relative default paths (wiki_docs, vote_log, ...) resolve inside workdir
+    os.chdir(workdir)
+
+    setup_seconds = prepare_corpus(workdir, args.size, args.seed, args.index_type)
+    meta = install_backends(workdir, args)
+
+    generator = CorpusGenerator(args.seed)
+    queries = generator.queries(args.requests, seed=args.seed + 1)
+    rng = np.random.default_rng(args.seed)
+    candidate_sets = []
+    for _ in queries:
+        rows = meta.iloc[rng.choice(len(meta), size=min(10, len(meta)), replace=False)]
+        candidate_sets.append(dict(zip(rows["Topic"], rows["Summary"])))
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "args": {k: v for k, v in vars(args).items() if k != "func"},
+        },
+        "setup_seconds": setup_seconds,
+        "scenarios": {},
+    }
+
+    with StubOpenAIServer(
+        latency=args.latency,
+        token_latency=1.0 / args.token_rate if args.token_rate else 0.0,
+        prompt_rate=args.prompt_rate,
+    ) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+        for name in args.scenarios.split(","):
+            import embedding_cache
+            import llm_cache
+
+            # Cold caches per scenario, so no scenario benefits from an earlier one
+            embedding_cache._cache = embedding_cache.EmbeddingCache(path="")
+            llm_cache._cache = llm_cache.LLMCache(path="")
+            before = server.requests
+            log = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(log if not args.verbose else sys.stdout):
+                    call = scenario_call(name)
+                    # Importing the pipeline sets openai.api_key from the environment
+                    openai.api_key = "stub"
+                    result = run_scenario(call, queries, candidate_sets, args.concurrency)
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {e}"}
+            result["openai_requests"] = server.requests - before
+            results["scenarios"][name] = result
+            print(f"{name:<20} {summary_line(result)}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if out:
+        with open(out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def summary_line(result):
+    if "error" in result:
+        return f"failed: {result['error']}"
+    if "p50_ms" not in result:
+        return f"all {result['errors']} requests failed: {result.get('first_error')}"
+    return (
+        f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+        f"{result['throughput_per_s']:7.1f}/s  rss {result['rss_mib']:7.1f} MiB"
+    )
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(
+        f"{before['meta'].get('commit') or args.before} -> "
+        f"{after['meta'].get('commit') or args.after}"
+    )
+    for name in after["scenarios"]:
+        old = before["scenarios"].get(name, {})
+        new = after["scenarios"][name]
+        print(f"\n{name}")
+        if "error" in old or "error" in new:
+            print(f"  before: {old.get('error', 'ok')}\n  after:  {new.get('error', 'ok')}")
+            continue
+        for metric, value in new.items():
+            if not isinstance(value, (int, float)) or metric not in old:
+                continue
+            change = (value - old[metric]) / old[metric] if old[metric] else 0.0
+            better = change < 0 if metric in LOWER_IS_BETTER else change > 0
+            flag = "" if abs(change) < args.threshold else ("  better" if better else "  WORSE")
+            print(f"  {metric:<18} {old[metric]:12.2f} {value:12.2f} {change:+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the scenarios and write JSON results")
+    run_parser.add_argument("--size", type=int, default=20_000, help="synthetic topics")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--workdir", default=None, help="reuse a corpus across runs")
+    run_parser.add_argument("--index-type", default="flat")
+    run_parser.add_argument("--doc-store", default="mongo", choices=["mongo", "mmap"])
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    run_parser.add_argument("--requests", type=int, default=30, help="requests per scenario")
+    run_parser.add_argument("--concurrency", type=int, default=1)
+    run_parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    run_parser.add_argument("--token-rate", type=float, default=200.0, help="generated tokens/s")
+    run_parser.add_argument("--prompt-rate", type=float, default=20_000.0, help="prompt tokens/s")
+    run_parser.add_argument("--mongo-latency", type=float, default=0.0005, help="seconds per call")
+    run_parser.add_argument("--out", default=None, help="JSON file (default: stdout)")
+    run_parser.add_argument("--verbose", action="store_true", help="keep the pipeline's prints")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="diff two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=0.05)
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
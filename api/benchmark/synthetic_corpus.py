@@ -0,0 +1,173 @@
+"""Synthetic wiki corpus in the columnar format, scalable to millions of topics.
+
+    python -m benchmark.synthetic_corpus --size 1000000 --out /tmp/corpus [--indexes]
+
+Writes wiki_meta.parquet and wiki_vectors.npy (see corpus_store) in chunks,
+so memory stays flat as --size grows; 1M topics take ~6 GB of disk for the
+vectors. Topics fall into clusters that share both a region of embedding
+space and a set of characteristic words, so FAISS and BM25 both have
+structure to find. --indexes also builds the FAISS index, BM25 index and
+mmap doc store next to the corpus.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from corpus_store import DIMENSION, versioned_schema
+
+SYLLABLES = "ka lo mi su re ta ne vi po da shi ru mo fe la zu ki no be ga".split()
+CLUSTERS = 256
+CLUSTER_WORDS = 12
+VOCABULARY = 5_000
+
+
+def make_vocabulary(n=VOCABULARY, seed=0):
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))))
+    return sorted(words)
+
+
+class CorpusGenerator:
+    """Deterministic topics, summaries and vectors for row ranges of the corpus."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.vocabulary = np.array(make_vocabulary(seed=seed))
+        self.centers = rng.standard_normal((CLUSTERS, DIMENSION), dtype="float32")
+        self.cluster_words = rng.integers(0, len(self.vocabulary), (CLUSTERS, CLUSTER_WORDS))
+        # Zipf-like background word frequencies, like real prose
+        weights = 1.0 / np.arange(1, len(self.vocabulary) + 1)
+        self.word_p = weights / weights.sum()
+
+    def cluster_of(self, ids):
+        return (np.asarray(ids) * 2654435761 % 2**32) % CLUSTERS
+
+    def chunk(self, start, rows):
+        """Return (ids, topics, summaries, vectors) for rows [start, start + rows)."""
+        rng = np.random.default_rng((self.seed, start))
+        ids = np.arange(start, start + rows, dtype=np.int64)
+        clusters = self.cluster_of(ids)
+
+        topics, summaries = [], []
+        lengths = rng.integers(40, 120, rows)
+        background = rng.choice(len(self.vocabulary), size=int(lengths.sum()), p=self.word_p)
+        offset = 0
+        for i in range(rows):
+            own = self.vocabulary[self.cluster_words[clusters[i]]]
+            words = self.vocabulary[background[offset : offset + lengths[i]]].tolist()
+            offset += lengths[i]
+            # Roughly one word in five is characteristic of the cluster
+            for position in range(0, len(words), 5):
+                words[position] = own[rng.integers(0, CLUSTER_WORDS)]
+            topic = f"{own[0].capitalize()} {own[1]} disorder {ids[i]}"
+            topics.append(topic)
+            summaries.append(f"{topic} is a condition. " + " ".join(words) + ".")
+
+        vectors = self.centers[clusters] + 0.6 * rng.standard_normal(
+            (rows, DIMENSION), dtype="float32"
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return ids, topics, summaries, vectors
+
+    def queries(self, n, seed=1):
+        """User-style queries built from cluster words, one cluster per query."""
+        rng = np.random.default_rng(seed)
+        queries = []
+        for cluster in rng.integers(0, CLUSTERS, n):
+            words = self.vocabulary[rng.choice(self.cluster_words[cluster], 4, replace=False)]
+            queries.append(f"I keep feeling {words[0]} and {words[1]}, also {words[2]} {words[3]}")
+        return queries
+
+
+def write_corpus(out, size, seed=0, chunk=50_000):
+    """Write `size` topics to `out`; returns the generator used."""
+    os.makedirs(out, exist_ok=True)
+    generator = CorpusGenerator(seed)
+    vectors = np.lib.format.open_memmap(
+        os.path.join(out, "wiki_vectors.npy"), mode="w+", dtype="float32", shape=(size, DIMENSION)
+    )
+    schema = versioned_schema(
+        pa.schema([("_id", pa.int64()), ("Topic", pa.string()), ("Summary", pa.string())])
+    )
+    with pq.ParquetWriter(os.path.join(out, "wiki_meta.parquet"), schema) as writer:
+        for start in range(0, size, chunk):
+            ids, topics, summaries, block = generator.chunk(start, min(chunk, size - start))
+            vectors[start : start + len(ids)] = block
+            writer.write_table(
+                pa.table({"_id": ids, "Topic": topics, "Summary": summaries}, schema=schema)
+            )
+    vectors.flush()
+    del vectors
+    return generator
+
+
+def build_indexes(out, collection=None, index_type="flat", params=None):
+    """Build the FAISS index, BM25 index and mmap doc store for the corpus in `out`.
+
+    Documents are upserted into `collection` too when one is given.
+    Returns seconds per step.
+    """
+    import bm25_index
+    import faiss_index
+    from corpus_store import corpus_version, load_metadata, load_vectors
+    from doc_store import MmapDocStore
+
+    meta_path = os.path.join(out, "wiki_meta.parquet")
+    vectors_path = os.path.join(out, "wiki_vectors.npy")
+    seconds = {}
+
+    start = time.perf_counter()
+    meta = load_metadata(meta_path)
+    vectors = load_vectors(vectors_path)
+    ids = meta["_id"].to_numpy()
+    valid = faiss_index.validate_embeddings(vectors)
+    index = faiss_index.build_index(vectors, valid, ids, index_type=index_type, params=params)
+    index.corpus_version = corpus_version(meta_path)
+    index.save(os.path.join(out, faiss_index.INDEX_PATH))
+    seconds["faiss"] = time.perf_counter() - start
+
+    if collection is not None:
+        start = time.perf_counter()
+        faiss_index.bulk_upsert(collection, meta, vectors, valid)
+        seconds["mongo"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    documents = zip(ids.tolist(), meta["Summary"].tolist())
+    bm25_index.BM25Index.build(documents).save(os.path.join(out, bm25_index.INDEX_PATH))
+    seconds["bm25"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    MmapDocStore.build(
+        zip(ids.tolist(), meta["Topic"].tolist(), meta["Summary"].tolist()),
+        os.path.join(out, "wiki_docs"),
+    )
+    seconds["doc_store"] = time.perf_counter() - start
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--indexes", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_corpus(args.out, args.size, args.seed)
+    print(f"Wrote {args.size:,} topics to {args.out} in {time.perf_counter() - start:.1f}s")
+    if args.indexes:
+        for step, seconds in build_indexes(args.out).items():
+            print(f"  {step:<10} {seconds:8.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Wall-clock time of vote_for_results: serial judges vs concurrent fan-out.
+
+    python -m benchmark.vote_fanout --latency 0.5 --slow-judge gpt-4 --slow-latency 5
+
+Runs against the local stub completion server, so no OpenAI key is used.
+With --slow-judge the named model is delayed past --timeout and should
+abstain without stretching the round beyond the timeout.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import openai
+
+import Generation
+from benchmark.stub_openai import StubOpenAIServer
+
+JUDGES = ["gpt-4o", "gpt-3.5-turbo", "gpt-4"]
+
+CANDIDATES = {
+    "Major depressive disorder": "Major depressive disorder is a mood disorder ...",
+    "Insomnia": "Insomnia is a sleep disorder ...",
+    "Attention deficit hyperactivity disorder": "ADHD is a neurodevelopmental disorder ...",
+}
+QUERY = "I cannot focus even when I have enough sleep."
+FOLLOWUP_Q = ["How long have you felt this way?"]
+FOLLOWUP_A = ["About two months."]
+
+
+def serial_round(formatted_documents, formatted_followup):
+    start = time.perf_counter()
+    for model in JUDGES:
+        Generation.diagnostic_agent(formatted_documents, QUERY, formatted_followup, model)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--slow-judge", default=None)
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model_latency = {args.slow_judge: args.slow_latency} if args.slow_judge else {}
+    with StubOpenAIServer(latency=args.latency, model_latency=model_latency) as server:
+        openai.api_base = server.api_base
+        openai.api_key = "stub"
+        Generation.JUDGE_TIMEOUT = args.timeout
+        # vote_for_results writes its vote log (vote_log/) under the working directory
+        os.chdir(tempfile.mkdtemp(prefix="vote_bench_"))
+
+        formatted_documents = "\n".join(f"- {t}: {s}" for t, s in CANDIDATES.items())
+        formatted_followup = f"Q: {FOLLOWUP_Q[0]}\nA: {FOLLOWUP_A[0]}"
+        if not args.slow_judge:
+            serial = serial_round(formatted_documents, formatted_followup)
+            print(f"serial round:      {serial:6.2f}s")
+
+        df = Generation.vote_for_results(CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+        for i, seconds in enumerate(df.attrs["round_seconds"], start=1):
+            print(f"concurrent round {i}: {seconds:6.2f}s")
+        print(df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Request-path cost of logging a vote: ranktable.csv vs the vote log.
+
+    python -m benchmark.vote_log --calls 2000 --votes 200 --clients 8 [--json]
+
+1. Per call, on the request thread: writing a second-round table with
+   DataFrame.to_csv (what vote_for_results used to do) vs
+   get_vote_log().record() of the same vote, --calls times each.
+2. --votes calls of vote_for_results from --clients threads against the
+   stub server with split judges, so every vote reaches a second round,
+   then a flush and `vote_log.py summarize` over the result. Checks that
+   every vote produced exactly one well-formed record.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import openai
+import pandas as pd
+
+from benchmark.stub_openai import StubOpenAIServer
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+JUDGES = ["gpt-4o", "gpt-3.5-turbo", "gpt-4"]
+DIAGNOSES = ["insomnia", "major depressive disorder", "generalized anxiety disorder"]
+
+
+def percentiles(seconds):
+    return {
+        "p50_us": float(np.percentile(seconds, 50) * 1e6),
+        "p99_us": float(np.percentile(seconds, 99) * 1e6),
+        "max_us": float(max(seconds) * 1e6),
+    }
+
+
+def request_path(calls, workdir):
+    import Generation
+    from vote_log import VoteLog
+
+    table = pd.DataFrame({model: {d: 5 - i for i, d in enumerate(DIAGNOSES)} for model in JUDGES})
+    table["Votes"] = table.sum(axis=1)
+    scores = {d: 5 - i for i, d in enumerate(DIAGNOSES)}
+    rounds = [
+        Generation.vote_round(n, {m: scores for m in JUDGES}, 1.2, [], {m: 1.1 for m in JUDGES})
+        for n in (1, 2)
+    ]
+
+    csv_seconds = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        table.to_csv(os.path.join(workdir, "ranktable.csv"))
+        csv_seconds.append(time.perf_counter() - start)
+
+    log = VoteLog(directory=os.path.join(workdir, "request_path"))
+    record_seconds = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        log.record(
+            query_hash="0" * 16,
+            judges=JUDGES,
+            rounds=rounds,
+            votes={d: int(v) for d, v in table["Votes"].items()},
+            winner=DIAGNOSES[0],
+            margin=None,
+            decided_by="second_round",
+            seconds=2.4,
+        )
+        record_seconds.append(time.perf_counter() - start)
+    log.flush()
+    return {"to_csv": percentiles(csv_seconds), "record": percentiles(record_seconds)}
+
+
+def end_to_end(votes, clients, workdir):
+    import Generation
+    import vote_log
+
+    directory = os.path.join(workdir, "end_to_end")
+    Generation.ADAPTIVE_VOTING = 0
+    vote_log._log = vote_log.VoteLog(directory=directory)
+    counter = iter(range(votes))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            Generation.vote_for_results(CANDIDATES, f"{QUERY} ({i})", FOLLOWUP_Q, FOLLOWUP_A)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    flushed = vote_log._log.flush()
+
+    records = list(vote_log.read_records(directory))
+    lines = 0
+    for path in os.listdir(directory):
+        with open(os.path.join(directory, path)) as f:
+            lines += sum(1 for _ in f)
+    return {
+        "votes": votes,
+        "flushed": flushed,
+        "lines": lines,
+        "records": len(records),
+        "second_rounds": sum(len(r["rounds"]) == 2 for r in records),
+        "writer": vote_log._log.counters(),
+        "summary": vote_log.summarize(records),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--votes", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub seconds per judge")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vote_log_bench_")
+    with StubOpenAIServer(latency=args.latency, split_judges=True) as server:
+        openai.api_base = server.api_base
+        with contextlib.redirect_stdout(io.StringIO()):
+            import openai_client
+            import vote_log
+
+            openai.api_key = "stub"
+            openai_client.DEFAULT_RPM = openai_client.DEFAULT_TPM = 1e9
+            openai_client._limiters.clear()
+            results = {
+                "request_path": request_path(args.calls, workdir),
+                "end_to_end": end_to_end(args.votes, args.clients, workdir),
+            }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"Request-path cost per vote, {args.calls} calls")
+    for name, r in results["request_path"].items():
+        print(
+            f"  {name:<7} p50 {r['p50_us']:8.1f} us  p99 {r['p99_us']:8.1f} us  "
+            f"max {r['max_us']:8.1f} us"
+        )
+    e = results["end_to_end"]
+    print(
+        f"{e['votes']} votes from {args.clients} threads: {e['records']} records "
+        f"({e['second_rounds']} with two rounds) in {e['lines']} lines, "
+        f"{e['writer']['batches']} appends, {e['writer']['dropped']} dropped"
+    )
+    vote_log.print_summary(e["summary"])
+
+
+if __name__ == "__main__":
+    main()
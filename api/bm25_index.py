@@ -0,0 +1,520 @@
+"""Persistent BM25 inverted index with the same scoring as rank_bm25.BM25Okapi.
+
+On-disk layout (one directory, one subdirectory per saved generation):
+
+    wiki_bm25/
+        CURRENT                 name of the live generation, swapped atomically
+        gen-000001/
+            meta.json           k1, b, epsilon, vocabulary
+            doc_ids.npy         Mongo _id of every document row
+            doc_len.npy         token count of every document row
+            post_offsets.npy    CSR offsets into the postings, one per term
+            post_rows.npy       document row of every posting
+            post_tfs.npy        term frequency of every posting
+            fwd_offsets.npy     CSR offsets into the forward index, one per row
+            fwd_terms.npy       term ids of every row (used to remove documents)
+            fwd_tfs.npy
+
+All arrays are loaded with mmap_mode="r". Added documents live in an
+in-memory delta segment and removed ones are masked out until `save()`
+compacts everything into a new generation.
+
+    python bm25_index.py build     build from MongoDB and save
+    python bm25_index.py verify    compare top-n against BM25Okapi on MongoDB
+"""
+
+import copy
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+INDEX_PATH = os.getenv("BM25_INDEX_PATH", "wiki_bm25")
+
+_ARRAYS = (
+    "doc_ids",
+    "doc_len",
+    "post_offsets",
+    "post_rows",
+    "post_tfs",
+    "fwd_offsets",
+    "fwd_terms",
+    "fwd_tfs",
+)
+
+
+def tokenize(text):
+    return text.split()
+
+
+def valid_documents(documents):
+    """Yield (_id, Summary) for documents retrieveBM25 has always accepted."""
+    for doc in documents:
+        summary = doc.get("Summary")
+        if isinstance(summary, str) and summary.strip() and "Topic" in doc:
+            yield doc["_id"], summary
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.terms = []
+        self.term_ids = {}
+        self.df = np.zeros(0, dtype=np.int64)
+
+        # Base segment (memory-mapped after load)
+        self._base_rows = 0
+        self._post_offsets = np.zeros(1, dtype=np.int64)
+        self._post_rows = np.zeros(0, dtype=np.int32)
+        self._post_tfs = np.zeros(0, dtype=np.int32)
+        self._fwd_offsets = np.zeros(1, dtype=np.int64)
+        self._fwd_terms = np.zeros(0, dtype=np.int32)
+        self._fwd_tfs = np.zeros(0, dtype=np.int32)
+
+        # Per-row state shared by base and delta rows
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.row_of_id = {}
+
+        # Delta segment: term id -> ([rows], [tfs]); row -> {term id: tf}
+        self._delta_postings = {}
+        self._delta_forward = {}
+
+        self.n_docs = 0
+        self.total_len = 0
+        self._idf = None
+
+    # ---------------------------------------------------------------- build
+
+    @classmethod
+    def build(cls, documents, **params):
+        """Build from an iterable of (_id, text) pairs."""
+        index = cls(**params)
+        index.add_documents(documents)
+        return index
+
+    @classmethod
+    def build_from_mongo(cls, collection, **params):
+        documents = collection.find({}, {"Topic": 1, "Summary": 1})
+        return cls.build(valid_documents(documents), **params)
+
+    # ------------------------------------------------------------- updates
+
+    def copy(self):
+        """Return an index that can be updated while this one keeps serving searches.
+
+        The memory-mapped base segment is shared; everything add_documents
+        and remove_documents change is copied.
+        """
+        index = copy.copy(self)
+        index.terms = list(self.terms)
+        index.term_ids = dict(self.term_ids)
+        index.df = self.df.copy()
+        index.doc_ids = self.doc_ids.copy()
+        index.doc_len = self.doc_len.copy()
+        index.deleted = self.deleted.copy()
+        index.row_of_id = dict(self.row_of_id)
+        index._delta_postings = {
+            tid: (list(rows), list(tfs)) for tid, (rows, tfs) in self._delta_postings.items()
+        }
+        index._delta_forward = {row: dict(freqs) for row, freqs in self._delta_forward.items()}
+        return index
+
+    def _term_id(self, term):
+        tid = self.term_ids.get(term)
+        if tid is None:
+            tid = len(self.terms)
+            self.terms.append(term)
+            self.term_ids[term] = tid
+        return tid
+
+    def add_documents(self, documents):
+        """Add (_id, text) pairs; an existing _id is replaced.
+
+        Updates happen in place and aren't safe alongside searches of the
+        same instance; update a copy() and save() it instead.
+        """
+        documents = {int(doc_id): text for doc_id, text in documents}
+        self.remove_documents([d for d in documents if d in self.row_of_id])
+
+        new_ids, new_lens = [], []
+        first_row = len(self.doc_ids)
+        for doc_id, text in documents.items():
+            row = first_row + len(new_ids)
+            tokens = tokenize(text)
+            freqs = {}
+            for token in tokens:
+                tid = self._term_id(token)
+                freqs[tid] = freqs.get(tid, 0) + 1
+            for tid, tf in freqs.items():
+                rows, tfs = self._delta_postings.setdefault(tid, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+            self._delta_forward[row] = freqs
+            self.row_of_id[doc_id] = row
+            new_ids.append(doc_id)
+            new_lens.append(len(tokens))
+            self.total_len += len(tokens)
+
+        if not new_ids:
+            return
+        self.df = np.concatenate(
+            [self.df, np.zeros(len(self.terms) - len(self.df), dtype=np.int64)]
+        )
+        for freqs in (self._delta_forward[first_row + i] for i in range(len(new_ids))):
+            self.df[list(freqs)] += 1
+        self.doc_ids = np.concatenate([self.doc_ids, np.array(new_ids, dtype=np.int64)])
+        self.doc_len = np.concatenate([self.doc_len, np.array(new_lens, dtype=np.int32)])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(new_ids), dtype=bool)])
+        self.n_docs += len(new_ids)
+        self._idf = None
+
+    def remove_documents(self, doc_ids):
+        for doc_id in doc_ids:
+            row = self.row_of_id.pop(int(doc_id), None)
+            if row is None:
+                continue
+            if row < self._base_rows:
+                start, end = self._fwd_offsets[row], self._fwd_offsets[row + 1]
+                self.df[self._fwd_terms[start:end]] -= 1
+            else:
+                freqs = self._delta_forward.pop(row)
+                self.df[list(freqs)] -= 1
+                for tid in freqs:
+                    rows, tfs = self._delta_postings[tid]
+                    i = rows.index(row)
+                    del rows[i], tfs[i]
+            self.deleted[row] = True
+            self.n_docs -= 1
+            self.total_len -= int(self.doc_len[row])
+        self._idf = None
+
+    def update_document(self, doc_id, text):
+        self.add_documents([(doc_id, text)])
+
+    # ------------------------------------------------------------- scoring
+
+    def idf(self):
+        """IDF per term id, including BM25Okapi's epsilon floor."""
+        if self._idf is None:
+            present = self.df > 0
+            df = self.df[present].astype(np.float64)
+            raw = np.log(self.n_docs - df + 0.5) - np.log(df + 0.5)
+            idf = np.zeros(len(self.df), dtype=np.float64)
+            if len(raw):
+                average_idf = raw.sum() / len(raw)
+                raw[raw < 0] = self.epsilon * average_idf
+                idf[present] = raw
+            self._idf = idf
+        return self._idf
+
+    def _postings(self, tid):
+        if tid < len(self._post_offsets) - 1:
+            start, end = self._post_offsets[tid], self._post_offsets[tid + 1]
+            rows, tfs = self._post_rows[start:end], self._post_tfs[start:end]
+        else:
+            rows = tfs = np.zeros(0, dtype=np.int32)
+        delta = self._delta_postings.get(tid)
+        if delta and delta[0]:
+            rows = np.concatenate([rows, np.array(delta[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.array(delta[1], dtype=np.int32)])
+        return rows, tfs
+
+    def score(self, query_tokens):
+        """Return (rows, scores) for live rows with a non-zero term match."""
+        if self.n_docs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        idf = self.idf()
+        avgdl = self.total_len / self.n_docs
+        all_rows, all_scores = [], []
+        for token in query_tokens:
+            tid = self.term_ids.get(token)
+            if tid is None or self.df[tid] == 0:
+                continue
+            rows, tfs = self._postings(tid)
+            live = ~self.deleted[rows]
+            rows, tfs = rows[live], tfs[live].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / avgdl)
+            all_rows.append(rows)
+            all_scores.append(idf[tid] * tfs * (self.k1 + 1) / (tfs + norm))
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        return rows, np.bincount(inverse, weights=np.concatenate(all_scores))
+
+    def top_n(self, query_tokens, n):
+        """Return [(_id, score)] ordered like BM25Okapi.get_top_n.
+
+        Ties are broken by later document first, which is what a stable
+        ascending sort reversed (as get_top_n does) produces.
+        """
+        rows, scores = self.score(query_tokens)
+        order = np.lexsort((-rows, -scores))
+        positive = order[scores[order] > 0][:n]
+        hits = [(int(self.doc_ids[rows[i]]), float(scores[i])) for i in positive]
+        if len(hits) < n:
+            # get_top_n ranks every live document, unmatched ones at 0.0, so
+            # zero scores come before negative ones (terms whose idf is < 0)
+            nonzero = set(rows[scores != 0].tolist())
+            for row in range(len(self.doc_ids) - 1, -1, -1):
+                if len(hits) >= n:
+                    break
+                if not self.deleted[row] and row not in nonzero:
+                    hits.append((int(self.doc_ids[row]), 0.0))
+            for i in order[scores[order] < 0][: n - len(hits)]:
+                hits.append((int(self.doc_ids[rows[i]]), float(scores[i])))
+        return hits
+
+    def score_many(self, queries_tokens):
+        """Score a batch of queries in one pass over the postings of their terms.
+
+        Returns (query, rows, scores) arrays holding every non-zero
+        (query, row) score, with the same values score() gives each query.
+        Each distinct term's postings are read and weighted once per batch.
+        """
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        if self.n_docs == 0:
+            return empty
+
+        # (query, term id) pairs; a repeated query token counts again, as in score()
+        pair_queries, pair_terms = [], []
+        for q, tokens in enumerate(queries_tokens):
+            for token in tokens:
+                tid = self.term_ids.get(token)
+                if tid is not None and self.df[tid] > 0:
+                    pair_queries.append(q)
+                    pair_terms.append(tid)
+        if not pair_terms:
+            return empty
+        terms, pair_slot = np.unique(np.array(pair_terms), return_inverse=True)
+
+        # Weighted postings of every distinct term, laid out term after term
+        idf = self.idf()
+        avgdl = self.total_len / self.n_docs
+        term_rows, term_weights, lengths = [], [], []
+        for tid in terms.tolist():
+            rows, tfs = self._postings(tid)
+            live = ~self.deleted[rows]
+            rows, tfs = rows[live], tfs[live].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / avgdl)
+            term_rows.append(rows)
+            term_weights.append(idf[tid] * tfs * (self.k1 + 1) / (tfs + norm))
+            lengths.append(len(rows))
+        rows = np.concatenate(term_rows).astype(np.int64)
+        weights = np.concatenate(term_weights)
+        lengths = np.array(lengths, dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+        # Expand each pair to its term's postings and sum per (query, row)
+        pair_lengths = lengths[pair_slot]
+        pair_offsets = np.cumsum(pair_lengths) - pair_lengths
+        positions = np.arange(pair_lengths.sum()) + np.repeat(
+            starts[pair_slot] - pair_offsets, pair_lengths
+        )
+        n_rows = len(self.doc_ids)
+        pair_queries = np.array(pair_queries, dtype=np.int64)
+        keys = np.repeat(pair_queries, pair_lengths) * n_rows + rows[positions]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights[positions])
+        return keys // n_rows, keys % n_rows, scores
+
+    def top_n_many(self, queries_tokens, n):
+        """Return top_n(tokens, n) for every query in the batch, scored together."""
+        queries, rows, scores = self.score_many(queries_tokens)
+        order = np.lexsort((-rows, -scores, queries))
+        bounds = np.searchsorted(queries[order], np.arange(len(queries_tokens) + 1))
+        results = []
+        for q in range(len(queries_tokens)):
+            top = order[bounds[q] : bounds[q + 1]][:n]
+            hits = [(int(self.doc_ids[rows[i]]), float(scores[i])) for i in top]
+            if len(hits) < n or hits[-1][1] <= 0:
+                # Rare; zero-scoring documents rank among these, exactly as in top_n
+                hits = self.top_n(queries_tokens[q], n)
+            results.append(hits)
+        return results
+
+    # --------------------------------------------------------- persistence
+
+    def _compacted(self):
+        """Return CSR arrays for all live rows with unused terms dropped."""
+        live_rows = np.flatnonzero(~self.deleted)
+        new_row = np.full(len(self.deleted), -1, dtype=np.int64)
+        new_row[live_rows] = np.arange(len(live_rows))
+
+        keep_terms = np.flatnonzero(self.df > 0)
+        new_tid = np.full(len(self.terms), -1, dtype=np.int64)
+        new_tid[keep_terms] = np.arange(len(keep_terms))
+
+        offsets = np.zeros(len(keep_terms) + 1, dtype=np.int64)
+        post_rows, post_tfs = [], []
+        for i, tid in enumerate(keep_terms):
+            rows, tfs = self._postings(tid)
+            live = ~self.deleted[rows]
+            post_rows.append(new_row[rows[live]].astype(np.int32))
+            post_tfs.append(tfs[live].astype(np.int32))
+            offsets[i + 1] = offsets[i] + live.sum()
+
+        fwd_offsets = np.zeros(len(live_rows) + 1, dtype=np.int64)
+        fwd_terms, fwd_tfs = [], []
+        for i, row in enumerate(live_rows):
+            if row < self._base_rows:
+                start, end = self._fwd_offsets[row], self._fwd_offsets[row + 1]
+                terms, tfs = self._fwd_terms[start:end], self._fwd_tfs[start:end]
+            else:
+                freqs = self._delta_forward[row]
+                terms = np.fromiter(freqs.keys(), dtype=np.int64, count=len(freqs))
+                tfs = np.fromiter(freqs.values(), dtype=np.int32, count=len(freqs))
+            fwd_terms.append(new_tid[terms].astype(np.int32))
+            fwd_tfs.append(np.asarray(tfs, dtype=np.int32))
+            fwd_offsets[i + 1] = fwd_offsets[i] + len(terms)
+
+        def cat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+
+        arrays = {
+            "doc_ids": self.doc_ids[live_rows],
+            "doc_len": self.doc_len[live_rows],
+            "post_offsets": offsets,
+            "post_rows": cat(post_rows, np.int32),
+            "post_tfs": cat(post_tfs, np.int32),
+            "fwd_offsets": fwd_offsets,
+            "fwd_terms": cat(fwd_terms, np.int32),
+            "fwd_tfs": cat(fwd_tfs, np.int32),
+        }
+        return [self.terms[t] for t in keep_terms], arrays
+
+    def save(self, path=INDEX_PATH):
+        """Compact into a new generation and atomically make it current."""
+        os.makedirs(path, exist_ok=True)
+        current = _read_current(path)
+        generation = int(current.split("-")[1]) + 1 if current else 1
+        name = f"gen-{generation:06d}"
+        gen_dir = os.path.join(path, name)
+        os.makedirs(gen_dir, exist_ok=True)
+
+        terms, arrays = self._compacted()
+        for key, array in arrays.items():
+            np.save(os.path.join(gen_dir, f"{key}.npy"), array)
+        meta = {"k1": self.k1, "b": self.b, "epsilon": self.epsilon, "terms": terms}
+        with open(os.path.join(gen_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        tmp = os.path.join(path, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(path, "CURRENT"))
+
+        # Readers that still map an older generation keep their open files
+        for entry in os.listdir(path):
+            if entry.startswith("gen-") and entry != name:
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+        return gen_dir
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        current = _read_current(path)
+        if current is None:
+            raise FileNotFoundError(f"No BM25 index found at {path}")
+        gen_dir = os.path.join(path, current)
+        with open(os.path.join(gen_dir, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            key: np.load(os.path.join(gen_dir, f"{key}.npy"), mmap_mode="r")
+            for key in _ARRAYS
+        }
+
+        index = cls(k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"])
+        index.terms = meta["terms"]
+        index.term_ids = {term: i for i, term in enumerate(index.terms)}
+        offsets = arrays["post_offsets"]
+        index.df = np.diff(offsets).astype(np.int64)
+        index._post_offsets = offsets
+        index._post_rows = arrays["post_rows"]
+        index._post_tfs = arrays["post_tfs"]
+        index._fwd_offsets = arrays["fwd_offsets"]
+        index._fwd_terms = arrays["fwd_terms"]
+        index._fwd_tfs = arrays["fwd_tfs"]
+        # Small per-row arrays are copied so they can be extended in place
+        index.doc_ids = np.array(arrays["doc_ids"])
+        index.doc_len = np.array(arrays["doc_len"])
+        index._base_rows = len(index.doc_ids)
+        index.deleted = np.zeros(index._base_rows, dtype=bool)
+        index.row_of_id = {int(d): row for row, d in enumerate(index.doc_ids)}
+        index.n_docs = index._base_rows
+        index.total_len = int(index.doc_len.sum())
+        return index
+
+
+def _read_current(path):
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def current_generation(path=INDEX_PATH):
+    return _read_current(path)
+
+
+def verify(collection, index, queries, n=5):
+    """Compare top-n against BM25Okapi on the same corpus; return mismatching queries.
+
+    Scores must agree at every rank. Ids must agree wherever the score at
+    that rank is not tied, since BM25Okapi's tie order depends on NumPy's
+    sort implementation.
+    """
+    from rank_bm25 import BM25Okapi
+
+    docs = list(valid_documents(collection.find({}, {"Topic": 1, "Summary": 1})))
+    ids = [doc_id for doc_id, _ in docs]
+    bm25 = BM25Okapi([tokenize(text) for _, text in docs])
+
+    mismatches = []
+    for query in queries:
+        scores = bm25.get_scores(tokenize(query))
+        expected = np.argsort(scores, kind="stable")[::-1][:n]
+        got = index.top_n(tokenize(query), n)
+        expected_scores = scores[expected]
+        got_scores = np.array([score for _, score in got])
+        if len(got) != len(expected) or not np.allclose(expected_scores, got_scores):
+            mismatches.append(query)
+            continue
+        for row, (doc_id, score) in zip(expected, got):
+            tied = np.isclose(scores, score).sum() > 1
+            if not tied and ids[row] != doc_id:
+                mismatches.append(query)
+                break
+    return mismatches
+
+
+def main():
+    from retrieval_context import get_context
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    collection = get_context().collection
+    if command == "build":
+        index = BM25Index.build_from_mongo(collection)
+        gen_dir = index.save()
+        print(f"BM25 index with {index.n_docs} documents saved to {gen_dir}")
+    elif command == "verify":
+        index = BM25Index.load()
+        queries = [
+            "I cannot focus even when I have enough sleep.",
+            "I feel sad and tired all the time",
+            "I keep checking whether the door is locked",
+        ]
+        mismatches = verify(collection, index, queries)
+        print("All queries match BM25Okapi." if not mismatches else f"Mismatches: {mismatches}")
+    else:
+        print(f"Unknown command: {command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Columnar corpus format replacing the stringified vectors in wiki_raw.csv.
+
+    wiki_meta.parquet   _id, Topic, Summary; row i describes vector i
+    wiki_vectors.npy    contiguous float32 matrix of shape (rows, 1536)
+
+The vectors load with mmap_mode="r", so index builds read them without
+parsing or copying. Every write stamps a new corpus_version into the
+Parquet schema metadata; indexes record the version they were built from
+so a stale index is caught at startup.
+
+    python corpus_store.py convert [wiki_raw.csv]    one-shot CSV conversion
+"""
+
+import os
+import sys
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DIMENSION = 1536
+META_PATH = os.getenv("CORPUS_META_PATH", "wiki_meta.parquet")
+VECTORS_PATH = os.getenv("CORPUS_VECTORS_PATH", "wiki_vectors.npy")
+VERSION_KEY = b"corpus_version"
+
+
+def corpus_exists(meta_path=META_PATH, vectors_path=VECTORS_PATH):
+    return os.path.isfile(meta_path) and os.path.isfile(vectors_path)
+
+
+def versioned_schema(schema):
+    """Return `schema` stamped with a fresh corpus version."""
+    metadata = dict(schema.metadata or {})
+    metadata[VERSION_KEY] = uuid.uuid4().hex.encode()
+    return schema.with_metadata(metadata)
+
+
+def corpus_version(meta_path=META_PATH):
+    """Return the version stamped on the corpus, or None for unversioned corpora.
+
+    Only the Parquet footer is read.
+    """
+    metadata = pq.read_schema(meta_path).metadata or {}
+    version = metadata.get(VERSION_KEY)
+    return version.decode() if version else None
+
+
+def load_vectors(vectors_path=VECTORS_PATH):
+    """Memory-map the vector matrix; pages are read only when touched."""
+    return np.load(vectors_path, mmap_mode="r")
+
+
+def load_metadata(meta_path=META_PATH, columns=None):
+    return pd.read_parquet(meta_path, columns=columns)
+
+
+def write_corpus(records, meta_path=META_PATH, vectors_path=VECTORS_PATH):
+    """Write records with "_id", "Topic", "Summary" and "Embeded" keys.
+
+    Records whose embedding is missing or not DIMENSION long are skipped.
+    Returns the number of rows written.
+    """
+    valid = [
+        record
+        for record in records
+        if record.get("Embeded") is not None and len(record["Embeded"]) == DIMENSION
+    ]
+    vectors = np.array([record["Embeded"] for record in valid], dtype="float32")
+    meta = pd.DataFrame(
+        {
+            "_id": [int(record["_id"]) for record in valid],
+            "Topic": [record["Topic"] for record in valid],
+            "Summary": [record["Summary"] for record in valid],
+        }
+    )
+    _save_vectors(vectors.reshape(-1, DIMENSION), vectors_path)
+    _save_metadata(meta, meta_path)
+    return len(valid)
+
+
+def update_corpus(
+    upserts=(), deletes=(), meta_path=META_PATH, vectors_path=VECTORS_PATH, chunk_size=65536
+):
+    """Replace or append `upserts` records and drop the `deletes` ids in place.
+
+    Records take the same keys as write_corpus. Both files are rewritten,
+    the vectors streamed through a memory map in chunks, and the corpus
+    gets a new version. Returns that version.
+    """
+    records = [
+        record
+        for record in upserts
+        if record.get("Embeded") is not None and len(record["Embeded"]) == DIMENSION
+    ]
+    meta = load_metadata(meta_path)
+    vectors = load_vectors(vectors_path)
+    drop = {int(record["_id"]) for record in records} | {int(i) for i in deletes}
+    rows = np.flatnonzero(~meta["_id"].isin(drop).to_numpy())
+
+    tmp_vectors = f"{vectors_path}.tmp.npy"
+    out = np.lib.format.open_memmap(
+        tmp_vectors, mode="w+", dtype="float32", shape=(len(rows) + len(records), DIMENSION)
+    )
+    for start in range(0, len(rows), chunk_size):
+        block = rows[start : start + chunk_size]
+        out[start : start + len(block)] = vectors[block]
+    if records:
+        out[len(rows) :] = np.array([record["Embeded"] for record in records], dtype="float32")
+    out.flush()
+    del out
+
+    meta = pd.concat(
+        [
+            meta.iloc[rows],
+            pd.DataFrame(
+                {
+                    "_id": pd.Series([int(r["_id"]) for r in records], dtype="int64"),
+                    "Topic": pd.Series([r["Topic"] for r in records], dtype=object),
+                    "Summary": pd.Series([r["Summary"] for r in records], dtype=object),
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    os.replace(tmp_vectors, vectors_path)
+    return _save_metadata(meta, meta_path)
+
+
+def _save_metadata(meta, meta_path):
+    """Write `meta` with a fresh corpus version; returns the version."""
+    table = pa.Table.from_pandas(meta, preserve_index=False)
+    schema = versioned_schema(table.schema)
+    tmp = f"{meta_path}.tmp"
+    pq.write_table(table.replace_schema_metadata(schema.metadata), tmp)
+    os.replace(tmp, meta_path)
+    return schema.metadata[VERSION_KEY].decode()
+
+
+def _save_vectors(vectors, vectors_path):
+    tmp = f"{vectors_path}.tmp.npy"
+    np.save(tmp, np.ascontiguousarray(vectors, dtype="float32"))
+    os.replace(tmp, vectors_path)
+
+
+def parse_vector(text):
+    """Parse a "[0.1, 0.2, ...]" cell without eval."""
+    if not isinstance(text, str):
+        return None
+    return np.fromstring(text.strip("[]"), sep=",", dtype="float32")
+
+
+def convert_csv(
+    csv_path="wiki_raw.csv",
+    meta_path=META_PATH,
+    vectors_path=VECTORS_PATH,
+    chunksize=10_000,
+):
+    """Stream wiki_raw.csv into the columnar format; returns rows written.
+
+    The CSV is read twice in chunks: once to size the vector file, once to
+    fill it, so peak memory stays around one chunk of parsed vectors.
+    """
+    total = sum(
+        len(chunk) for chunk in pd.read_csv(csv_path, usecols=["_id"], chunksize=chunksize)
+    )
+    tmp_vectors = f"{vectors_path}.tmp.npy"
+    tmp_meta = f"{meta_path}.tmp"
+    vectors = np.lib.format.open_memmap(
+        tmp_vectors, mode="w+", dtype="float32", shape=(total, DIMENSION)
+    )
+    schema = versioned_schema(
+        pa.schema([("_id", pa.int64()), ("Topic", pa.string()), ("Summary", pa.string())])
+    )
+
+    written = 0
+    with pq.ParquetWriter(tmp_meta, schema) as writer:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            keep = []
+            for i, cell in enumerate(chunk["Embeded"]):
+                vector = parse_vector(cell)
+                if vector is None or vector.shape != (DIMENSION,):
+                    print(f"Skipping _id {chunk['_id'].iloc[i]}: unusable embedding.")
+                    continue
+                vectors[written] = vector
+                written += 1
+                keep.append(i)
+            rows = chunk.iloc[keep]
+            writer.write_table(
+                pa.table(
+                    {
+                        "_id": rows["_id"].astype("int64"),
+                        "Topic": rows["Topic"].astype(str),
+                        "Summary": rows["Summary"].astype(str),
+                    },
+                    schema=schema,
+                )
+            )
+    vectors.flush()
+
+    if written < total:
+        # Drop the unused tail rows reserved by the first pass
+        _save_vectors(vectors[:written], vectors_path)
+        del vectors
+        os.remove(tmp_vectors)
+    else:
+        del vectors
+        os.replace(tmp_vectors, vectors_path)
+    os.replace(tmp_meta, meta_path)
+    return written
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "convert"
+    if command == "convert":
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else "wiki_raw.csv"
+        written = convert_csv(csv_path)
+        print(f"Converted {written} rows to {META_PATH} and {VECTORS_PATH}")
+    else:
+        print(f"Unknown command: {command}")
+
+
+if __name__ == "__main__":
+    main()
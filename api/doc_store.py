@@ -0,0 +1,211 @@
+"""Topic/summary lookup by document id for retrieval hits.
+
+Two backends share the same `get_many(ids)` and `get_by_id(ids)` calls:
+
+- MongoDocStore issues a single `$in` query against the wiki collection.
+- MmapDocStore reads local files with no database involved, one
+  subdirectory per saved generation:
+
+    wiki_docs/
+        CURRENT             name of the live generation, swapped atomically
+        gen-000001/
+            ids.npy         sorted document ids
+            offsets.npy     byte offset of each record in records.bin, plus the end
+            records.bin     UTF-8 "<topic>\\0<summary>" records
+
+  A store written before generations (the three files directly in
+  wiki_docs/) is still read, and replaced by the next build.
+
+    python doc_store.py build      export the MongoDB collection to wiki_docs/
+"""
+
+import mmap
+import os
+import shutil
+import sys
+
+import numpy as np
+
+STORE_PATH = os.getenv("DOC_STORE_PATH", "wiki_docs")
+
+
+def _as_result(doc):
+    return {
+        "Topic": doc.get("Topic", "No topic available"),
+        "Summary": doc.get("Summary", "No summary available"),
+    }
+
+
+class MongoDocStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_by_id(self, ids):
+        """Return {id: document} for the ids that have one, in a single query."""
+        documents = self.collection.find(
+            {"_id": {"$in": list({int(i) for i in ids})}}, {"Topic": 1, "Summary": 1}
+        )
+        return {doc["_id"]: _as_result(doc) for doc in documents}
+
+    def get_many(self, ids):
+        """Return the documents for `ids` in the same order, skipping missing ids."""
+        ids = [int(i) for i in ids]
+        docs_by_id = self.get_by_id(ids)
+        return [docs_by_id[i] for i in ids if i in docs_by_id]
+
+    def existing_ids(self, ids, batch_size=10_000):
+        """Return the subset of `ids` that has a document."""
+        ids = [int(i) for i in ids]
+        found = set()
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            found.update(
+                doc["_id"] for doc in self.collection.find({"_id": {"$in": batch}}, {"_id": 1})
+            )
+        return found
+
+
+LEGACY_FILES = ("ids.npy", "offsets.npy", "records.bin")
+
+
+def current_generation(path=STORE_PATH):
+    """Name of the live generation, "" for a store without generations, or None."""
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "" if os.path.isfile(os.path.join(path, "ids.npy")) else None
+
+
+class MmapDocStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.generation = current_generation(path)
+        if self.generation is None:
+            raise FileNotFoundError(f"No doc store found at {path}")
+        files = os.path.join(path, self.generation)
+        self.ids = np.load(os.path.join(files, "ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(files, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(files, "records.bin"), "rb") as f:
+            # mmap refuses empty files
+            size = os.fstat(f.fileno()).st_size
+            self._records = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids) or not len(ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+        positions = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return positions, self.ids[positions] == ids
+
+    def existing_ids(self, ids):
+        """Return the subset of `ids` that has a document."""
+        positions, found = self._positions(ids)
+        return {int(i) for i in np.asarray(self.ids)[positions[found]]}
+
+    def _record(self, position):
+        start, end = self.offsets[position], self.offsets[position + 1]
+        topic, summary = bytes(self._records[start:end]).decode("utf-8").split("\0", 1)
+        return {"Topic": topic, "Summary": summary}
+
+    def get_many(self, ids):
+        """Return the documents for `ids` in the same order, skipping missing ids."""
+        positions, found = self._positions(ids)
+        return [self._record(position) for position, hit in zip(positions, found) if hit]
+
+    def get_by_id(self, ids):
+        """Return {id: document} for the ids that have one."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        positions, found = self._positions(ids)
+        return {
+            int(doc_id): self._record(position)
+            for doc_id, position in zip(ids[found], positions[found])
+        }
+
+    @staticmethod
+    def build(documents, path=STORE_PATH):
+        """Write (_id, topic, summary) triples as a new generation and make it current.
+
+        Readers that still map an older generation keep their open files.
+        """
+        documents = sorted(
+            ((int(doc_id), topic, summary) for doc_id, topic, summary in documents),
+            key=lambda doc: doc[0],
+        )
+        os.makedirs(path, exist_ok=True)
+        current = current_generation(path)
+        generation = int(current.split("-")[1]) + 1 if current else 1
+        name = f"gen-{generation:06d}"
+        gen_dir = os.path.join(path, name)
+        os.makedirs(gen_dir, exist_ok=True)
+
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        with open(os.path.join(gen_dir, "records.bin"), "wb") as f:
+            for i, (_, topic, summary) in enumerate(documents):
+                record = f"{topic}\0{summary}".encode("utf-8")
+                f.write(record)
+                offsets[i + 1] = offsets[i] + len(record)
+        ids = np.array([doc[0] for doc in documents], dtype=np.int64)
+        np.save(os.path.join(gen_dir, "ids.npy"), ids)
+        np.save(os.path.join(gen_dir, "offsets.npy"), offsets)
+
+        tmp = os.path.join(path, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(path, "CURRENT"))
+
+        for entry in os.listdir(path):
+            if entry.startswith("gen-") and entry != name:
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+            elif entry in LEGACY_FILES:
+                os.remove(os.path.join(path, entry))
+        return len(documents)
+
+    @staticmethod
+    def exists(path=STORE_PATH):
+        return current_generation(path) is not None
+
+    @staticmethod
+    def update(upserts=(), deletes=(), path=STORE_PATH):
+        """Rewrite the store at `path` with (_id, topic, summary) `upserts` and without `deletes`.
+
+        Returns the number of documents in the new store.
+        """
+        upserts = {int(doc_id): (topic, summary) for doc_id, topic, summary in upserts}
+        drop = set(upserts) | {int(i) for i in deletes}
+        documents = [(doc_id, topic, summary) for doc_id, (topic, summary) in upserts.items()]
+        if MmapDocStore.exists(path):
+            store = MmapDocStore(path)
+            for position, doc_id in enumerate(np.asarray(store.ids).tolist()):
+                if doc_id not in drop:
+                    record = store._record(position)
+                    documents.append((doc_id, record["Topic"], record["Summary"]))
+        return MmapDocStore.build(documents, path)
+
+    @staticmethod
+    def build_from_mongo(collection, path=STORE_PATH):
+        documents = (
+            (doc["_id"], str(doc.get("Topic", "")), str(doc.get("Summary", "")))
+            for doc in collection.find({}, {"Topic": 1, "Summary": 1})
+        )
+        return MmapDocStore.build(documents, path)
+
+
+def main():
+    from retrieval_context import get_context
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        count = MmapDocStore.build_from_mongo(get_context().collection)
+        print(f"Doc store with {count} documents saved to {STORE_PATH}")
+    else:
+        print(f"Unknown command: {command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Content-addressed embedding cache shared by Query.Understand and textEmbed.
+
+Keys are sha256(model + "\\0" + text), so switching embedding models never
+returns stale vectors. Lookups go through two tiers:
+
+- an in-process LRU bounded by the total bytes of the cached vectors,
+- a SQLite file (WAL mode) that every worker process on the host shares,
+  bounded by EMBEDDING_CACHE_MAX_ROWS: each insert drops the rows written
+  before the most recent max_rows (0 leaves the file unbounded).
+
+Vectors are stored as raw float32 bytes in both tiers.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+MEMORY_BYTES = int(os.getenv("EMBEDDING_CACHE_MEMORY_BYTES", str(64 * 2**20)))
+# About 6 KiB per ada-002 vector, so roughly 1.2 GiB on disk
+MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+# Keys per SELECT, well under SQLite's default limit of 999 parameters
+LOOKUP_CHUNK = 500
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH, max_memory_bytes=MEMORY_BYTES, max_rows=MAX_ROWS):
+        self.path = path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_rows = max_rows
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._local = threading.local()
+
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_evictions": 0}
+
+        if path:
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings "
+                    "(key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+                )
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, vector):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = vector
+            self._memory_bytes += vector.nbytes
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+
+    def get_many(self, model, texts):
+        """Return a list of float32 vectors (or None on a miss), one per text."""
+        keys = [cache_key(model, text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.append(i)
+
+        if missing and self.path:
+            wanted = list({keys[i] for i in missing})
+            conn = self._connection()
+            found = {}
+            for start in range(0, len(wanted), LOOKUP_CHUNK):
+                chunk = wanted[start : start + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                )
+                found.update((key, np.frombuffer(blob, dtype="float32")) for key, blob in rows)
+            still_missing = []
+            for i in missing:
+                vector = found.get(keys[i])
+                if vector is None:
+                    still_missing.append(i)
+                    continue
+                results[i] = vector
+                self._remember(keys[i], vector)
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+            missing = still_missing
+
+        with self._lock:
+            self.stats["misses"] += len(missing)
+        return results
+
+    def get(self, model, text):
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model, texts, vectors):
+        entries = []
+        for text, vector in zip(texts, vectors):
+            key = cache_key(model, text)
+            vector = np.asarray(vector, dtype="float32").reshape(-1)
+            self._remember(key, vector)
+            entries.append((key, model, vector.tobytes()))
+        if self.path and entries:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    entries,
+                )
+                if self.max_rows:
+                    # Rowids grow with each write (a replace gets a new one), so this
+                    # keeps at most the max_rows most recently written vectors
+                    evicted = conn.execute(
+                        "DELETE FROM embeddings WHERE rowid <= "
+                        "(SELECT MAX(rowid) FROM embeddings) - ?",
+                        (self.max_rows,),
+                    ).rowcount
+                    if evicted > 0:
+                        with self._lock:
+                            self.stats["disk_evictions"] += evicted
+
+    def put(self, model, text, vector):
+        self.put_many(model, [text], [vector])
+
+    def embed(self, model, texts, embed_fn):
+        """Return vectors for `texts`, calling embed_fn(missing_texts) only for misses."""
+        vectors = self.get_many(model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Embed each distinct missing text once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(unique, embed_fn(unique)))
+            self.put_many(model, unique, [fresh[text] for text in unique])
+            for i in missing:
+                vectors[i] = np.asarray(fresh[texts[i]], dtype="float32").reshape(-1)
+        return vectors
+
+    def counters(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide embedding cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
@@ -1,61 +1,413 @@
+"""Bulk build and incremental maintenance of the wiki FAISS index.
+
+    python faiss_index.py build [--chunk-size 65536] [--batch-size 1000]
+                                [--store-embeddings] [--no-mongo]
+    python faiss_index.py check     verify every vector id resolves to a document
+
+The index is an IndexIDMap2 keyed by the document `_id`, so search results
+are document ids rather than row positions, and topics can be added,
+updated and deleted without a rebuild. Saves replace the file atomically,
+which RetrievalContext picks up as a hot swap. upsert_topics and
+delete_topics keep MongoDB, the mmap doc store and the Parquet/npy corpus
+in step with the index.
+
+The index type (flat, ivf_flat, ivf_pq, hnsw; see index_config) is chosen
+with --type/--param or the INDEX_TYPE environment variable and persisted
+next to the index.
+"""
+
+import argparse
+import os
+import time
+
 import numpy as np
 import faiss
-from pymongo import MongoClient
-import pandas as pd
-import os
+from pymongo import MongoClient, UpdateOne
+from corpus_store import (
+    META_PATH,
+    VECTORS_PATH,
+    corpus_exists,
+    corpus_version,
+    load_metadata,
+    load_vectors,
+    update_corpus,
+)
+import bm25_index
+from doc_store import STORE_PATH as DOC_STORE_PATH, MmapDocStore
+import index_config
+
+DIMENSION = 1536  # Dimension of the embeddings
+INDEX_PATH = "wiki_faiss.index"
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+
+
+def validate_embeddings(vectors, chunk_size=65536):
+    """Return a boolean mask of rows that are finite and not all zeros."""
+    if vectors.ndim != 2 or vectors.shape[1] != DIMENSION:
+        raise ValueError(f"Expected an (n, {DIMENSION}) matrix, got {vectors.shape}.")
+    valid = np.empty(len(vectors), dtype=bool)
+    # Chunked so a memory-mapped matrix is never materialized as a whole
+    for start in range(0, len(vectors), chunk_size):
+        block = vectors[start : start + chunk_size]
+        valid[start : start + chunk_size] = np.isfinite(block).all(axis=1) & block.any(axis=1)
+    return valid
+
+
+class WikiIndex:
+    """FAISS index whose vector ids are document `_id`s."""
+
+    def __init__(self, index, index_type="flat", params=None, corpus_version=None):
+        self.index = index
+        self.index_type = index_type
+        self.params = params or {}
+        # Version of the corpus the vectors were bulk-built from (see corpus_store)
+        self.corpus_version = corpus_version
+
+    @classmethod
+    def create(cls, index_type="flat", params=None, n_train=None):
+        params = index_config.resolve_params(index_type, params, n_train)
+        return cls(index_config.create_index(index_type, params), index_type, params)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        index = index_config.read_index(path)
+        manifest = index_config.read_manifest(path)
+        if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            # Legacy positional index: row i held the document with _id i
+            vectors = index.reconstruct_n(0, index.ntotal)
+            index.reset()
+            index = faiss.IndexIDMap2(index)
+            index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+        return cls(index, manifest["type"], manifest["params"], manifest.get("corpus_version"))
+
+    @property
+    def is_trained(self):
+        return self.index.is_trained
+
+    def train(self, vectors):
+        self.index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    def ids(self):
+        return faiss.vector_to_array(self.index.id_map).astype(np.int64)
+
+    def add(self, ids, vectors):
+        """Add vectors under `ids`; ids already present are replaced."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype="float32").reshape(-1, DIMENSION)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors.")
+        self.delete(ids)
+        self.index.add_with_ids(vectors, ids)
+
+    update = add
+
+    def delete(self, ids):
+        """Remove those of `ids` that are in the index; returns how many were removed.
+
+        HNSW graphs can't drop vectors, so that type raises only when one of
+        `ids` is actually present.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids) or not self.index.ntotal:
+            return 0
+        present = ids[np.isin(ids, self.ids())]
+        if not len(present):
+            return 0
+        if self.index_type == "hnsw":
+            raise ValueError(
+                f"HNSW indexes don't support removing vectors (ids {present[:10].tolist()} "
+                "already present); rebuild instead."
+            )
+        return self.index.remove_ids(faiss.IDSelectorBatch(present))
+
+    def search(self, queries, k):
+        return self.index.search(queries, k)
+
+    def save(self, path=INDEX_PATH):
+        """Write to a temporary file and rename it over `path`.
+
+        The type config is written first, so a reader that sees the new
+        index also sees its search parameters.
+        """
+        index_config.write_config(path, self.index_type, self.params, self.corpus_version)
+        tmp = f"{path}.tmp"
+        faiss.write_index(self.index, tmp)
+        os.replace(tmp, path)
+
+
+def build_index(
+    vectors, valid, ids, chunk_size=65536, index_type="flat", params=None, train_size=100_000
+):
+    rows = np.flatnonzero(valid)
+    index = WikiIndex.create(index_type, params, n_train=len(rows))
+    if not index.is_trained:
+        if index_type == "ivf_pq" and len(rows) < 2 ** index.params["nbits"]:
+            raise ValueError(
+                f"ivf_pq needs at least {2 ** index.params['nbits']} vectors to train, "
+                f"got {len(rows)}."
+            )
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, size=min(train_size, len(rows)), replace=False))
+        index.train(vectors[sample])
 
-# print("========== Current working directory:", os.getcwd())
-
-# Load the CSV
-csv_file_path = "./api/wiki_raw.csv"
-df = pd.read_csv(csv_file_path)
-
-# Ensure embeddings are treated as lists
-df["Embeded"] = df["Embeded"].apply(eval)
-
-# Initialize FAISS index
-dimension = 1536  # Dimension of the embeddings
-index = faiss.IndexFlatL2(dimension)
-
-count = 0  # Track valid entries
-
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["RetrivalDB"]
-collection = db["wiki_data"]
-
-# Iterate over DataFrame and add embeddings to FAISS index
-for idx, row in df.iterrows():
-    try:
-        embedding = np.array(row["Embeded"], dtype="float32")
-
-        if embedding.shape != (1536,):
-            print(f"Skipping index {idx}: Incorrect shape {embedding.shape}.")
-            continue
-
-        # Add to FAISS index
-        index.add(embedding.reshape(1, -1))
-        count += 1
-
-        # Update MongoDB with the row data if not already there
-        collection.update_one(
-            {"_id": row["_id"]},
-            {
-                "$set": {
-                    "Topic": row["Topic"],
-                    "Summary": row["Summary"],
-                    "Embeded": row["Embeded"],
-                }
-            },
-            upsert=True,
+    for start in range(0, len(vectors), chunk_size):
+        block = vectors[start : start + chunk_size]
+        block_ids = ids[start : start + chunk_size]
+        mask = valid[start : start + chunk_size]
+        if not mask.all():
+            block, block_ids = block[mask], block_ids[mask]
+        if len(block):
+            index.index.add_with_ids(
+                np.ascontiguousarray(block, dtype="float32"), block_ids.astype(np.int64)
+            )
+    return index
+
+
+def upsert_topics(
+    index,
+    collection,
+    records,
+    bm25=None,
+    path=INDEX_PATH,
+    bm25_path=bm25_index.INDEX_PATH,
+    doc_store_path=DOC_STORE_PATH,
+    meta_path=META_PATH,
+    vectors_path=VECTORS_PATH,
+):
+    """Add or replace topics given as {"_id", "Topic", "Summary", "Embeded"} records.
+
+    Every store that holds documents is updated: MongoDB (unless
+    `collection` is None), the mmap doc store and the Parquet/npy corpus if
+    they exist, so the next bulk build keeps the change. The vectors are
+    added to the in-memory index before any store is written, so a failed
+    add (e.g. replacing an id in an HNSW index) leaves every store as it
+    was. Searches read the saved index, which is written only after the
+    documents, so they never return an id that doesn't resolve; the BM25
+    index, if given, is saved last. `bm25` itself is left untouched for the
+    searches still using it; an updated copy is saved as a new generation,
+    which RetrievalContext swaps in.
+    """
+    records = list(records)
+    if not records:
+        return
+    vectors = np.array([r["Embeded"] for r in records], dtype="float32").reshape(-1, DIMENSION)
+    valid = validate_embeddings(vectors)
+    if not valid.all():
+        bad = [records[row]["_id"] for row in np.flatnonzero(~valid)]
+        raise ValueError(f"Embeddings for _id {bad} are not finite or all zeros.")
+
+    index.add([r["_id"] for r in records], vectors)
+    if collection is not None:
+        collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": int(r["_id"])},
+                    {"$set": {"Topic": r["Topic"], "Summary": r["Summary"]}},
+                    upsert=True,
+                )
+                for r in records
+            ],
+            ordered=False,
+        )
+    if MmapDocStore.exists(doc_store_path):
+        MmapDocStore.update(
+            ((r["_id"], r["Topic"], r["Summary"]) for r in records), path=doc_store_path
+        )
+    _update_corpus(index, records, (), meta_path, vectors_path)
+    index.save(path)
+    if bm25 is not None:
+        # Searches may still be running on `bm25`; readers pick up the saved copy
+        bm25 = bm25.copy()
+        bm25.add_documents((r["_id"], r["Summary"]) for r in records)
+        bm25.save(bm25_path)
+
+
+def delete_topics(
+    index,
+    collection,
+    ids,
+    bm25=None,
+    path=INDEX_PATH,
+    bm25_path=bm25_index.INDEX_PATH,
+    doc_store_path=DOC_STORE_PATH,
+    meta_path=META_PATH,
+    vectors_path=VECTORS_PATH,
+):
+    """Remove topics from the indexes first, then from every document store."""
+    ids = [int(i) for i in ids]
+    index.delete(ids)
+    if bm25 is not None:
+        bm25 = bm25.copy()
+        bm25.remove_documents(ids)
+    _update_corpus(index, (), ids, meta_path, vectors_path)
+    index.save(path)
+    if bm25 is not None:
+        bm25.save(bm25_path)
+    if MmapDocStore.exists(doc_store_path):
+        MmapDocStore.update(deletes=ids, path=doc_store_path)
+    if collection is not None:
+        collection.delete_many({"_id": {"$in": ids}})
+
+
+def _update_corpus(index, upserts, deletes, meta_path, vectors_path):
+    """Apply a change to the corpus, keeping the index's version stamp if it was current."""
+    if not corpus_exists(meta_path, vectors_path):
+        return
+    current = index.corpus_version is not None and index.corpus_version == corpus_version(
+        meta_path
+    )
+    version = update_corpus(upserts, deletes, meta_path, vectors_path)
+    if current:
+        index.corpus_version = version
+
+
+def check_consistency(index, doc_store, batch_size=10_000):
+    """Return {"vectors", "missing_documents", "duplicate_ids"} for the index.
+
+    Every vector id must resolve to a document in `doc_store`.
+    """
+    ids = index.ids()
+    unique, counts = np.unique(ids, return_counts=True)
+    missing = []
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start : start + batch_size].tolist()
+        found = doc_store.existing_ids(batch)
+        missing.extend(i for i in batch if i not in found)
+    return {
+        "vectors": int(len(ids)),
+        "missing_documents": missing,
+        "duplicate_ids": unique[counts > 1].tolist(),
+    }
+
+
+def bulk_upsert(collection, meta, vectors, valid, batch_size=1000, store_embeddings=False):
+    """Upsert Topic/Summary (and optionally Embeded) with unordered bulk writes."""
+    ids = meta["_id"].to_numpy()
+    topics = meta["Topic"].to_numpy()
+    summaries = meta["Summary"].to_numpy()
+    rows = np.flatnonzero(valid)
+
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        operations = []
+        for row in rows[start : start + batch_size]:
+            fields = {"Topic": topics[row], "Summary": summaries[row]}
+            if store_embeddings:
+                fields["Embeded"] = vectors[row].tolist()
+            operations.append(UpdateOne({"_id": int(ids[row])}, {"$set": fields}, upsert=True))
+        result = collection.bulk_write(operations, ordered=False)
+        written += result.upserted_count + result.matched_count
+    return written
+
+
+def build(
+    collection=None,
+    index_path=INDEX_PATH,
+    chunk_size=65536,
+    batch_size=1000,
+    store_embeddings=False,
+    index_type=INDEX_TYPE,
+    params=None,
+):
+    """Build the index (and upsert documents when `collection` is given); returns stats."""
+    meta = load_metadata()
+    vectors = load_vectors()
+    if len(meta) != len(vectors):
+        raise ValueError(f"Corpus metadata has {len(meta)} rows but {len(vectors)} vectors.")
+
+    start = time.perf_counter()
+    valid = validate_embeddings(vectors, chunk_size)
+    for row in np.flatnonzero(~valid):
+        print(f"Skipping _id {meta['_id'].iloc[row]}: embedding is not finite or all zeros.")
+
+    ids = meta["_id"].to_numpy()
+    index = build_index(vectors, valid, ids, chunk_size, index_type, params)
+    index.corpus_version = corpus_version(META_PATH)
+    index_seconds = time.perf_counter() - start
+
+    # Save the FAISS index
+    if index.ntotal > 0:
+        index.save(index_path)
+        print(f"FAISS {index.index_type} index created with {index.ntotal} entries.")
+    else:
+        print("No valid embeddings found. FAISS index not created.")
+
+    rows = int(valid.sum())
+    stats = {
+        "rows": rows,
+        "index_seconds": index_seconds,
+        "index_rows_per_second": rows / index_seconds if index_seconds else 0.0,
+    }
+    if collection is not None:
+        start = time.perf_counter()
+        bulk_upsert(collection, meta, vectors, valid, batch_size, store_embeddings)
+        stats["mongo_seconds"] = time.perf_counter() - start
+        stats["mongo_rows_per_second"] = (
+            rows / stats["mongo_seconds"] if stats["mongo_seconds"] else 0.0
         )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or check the wiki FAISS index.")
+    parser.add_argument("command", nargs="?", default="build", choices=["build", "check"])
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--store-embeddings",
+        action="store_true",
+        help="also copy vectors into MongoDB (only needed by the Mongo fallback build)",
+    )
+    parser.add_argument("--no-mongo", action="store_true")
+    parser.add_argument("--type", default=INDEX_TYPE, choices=sorted(index_config.INDEX_TYPES))
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="index parameter such as nlist=4096, ef_search=128, pca_dim=256 or quantizer=int8",
+    )
+    args = parser.parse_args()
+    params = {
+        key: int(value) if value.isdigit() else value
+        for key, value in (p.split("=", 1) for p in args.param)
+    }
+
+    if args.command == "check":
+        from retrieval_context import get_context
+
+        report = check_consistency(WikiIndex.load(), get_context().doc_store())
+        print(f"{report['vectors']} vectors checked.")
+        if report["missing_documents"]:
+            print(f"Vector ids without a document: {report['missing_documents']}")
+        if report["duplicate_ids"]:
+            print(f"Duplicate vector ids: {report['duplicate_ids']}")
+        if not report["missing_documents"] and not report["duplicate_ids"]:
+            print("Index is consistent with the doc store.")
+        return
+
+    collection = None
+    if not args.no_mongo:
+        client = MongoClient("mongodb://localhost:27017/")
+        collection = client["RetrivalDB"]["wiki_data"]
+
+    stats = build(
+        collection,
+        INDEX_PATH,
+        args.chunk_size,
+        args.batch_size,
+        args.store_embeddings,
+        args.type,
+        params,
+    )
+    print(f"Indexed {stats['rows']} rows at {stats['index_rows_per_second']:,.0f} rows/sec")
+    if "mongo_rows_per_second" in stats:
+        print(f"Upserted {stats['rows']} documents at {stats['mongo_rows_per_second']:,.0f} rows/sec")
 
-    except Exception as e:
-        print(f"Error processing index {idx}: {e}")
 
-# Save the FAISS index
-if count > 0:
-    faiss.write_index(index, "wiki_faiss.index")
-    print(f"FAISS index created with {index.ntotal} entries.")
-else:
-    print("No valid embeddings found. FAISS index not created.")
+if __name__ == "__main__":
+    main()
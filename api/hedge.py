@@ -0,0 +1,157 @@
+"""Hedged chat completions for the agents a user waits on.
+
+create(agent, **params) is get_llm_cache().create(**params) with a backup
+request: when the primary hasn't answered within the HEDGE_PERCENTILE
+percentile of recent latencies for that agent and model, the same request
+is sent again, to the model's fallback from HEDGE_FALLBACKS if it has one
+(e.g. '{"gpt-4": "gpt-4o"}') or to the same model otherwise. The first
+successful answer wins. A primary that fails before the deadline goes to
+the backup straight away.
+
+The losing request is not sent if it hasn't been yet, even when a hedge
+worker has already picked it up; one already sent cannot be recalled, so it
+finishes in the background and its latency still feeds the percentile. Until HEDGE_MIN_SAMPLES latencies are known for an
+agent and model the deadline is HEDGE_INITIAL_DELAY. Cache hits answer
+directly and are not timed.
+
+HEDGE=1 turns hedging on; with it off latencies are still tracked, so the
+deadline is ready when it is switched on. Outcomes are exported as
+hedge_requests_total{agent,outcome} and deadlines as the
+hedge_deadline_seconds{agent,model} gauge.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+
+import numpy as np
+
+import metrics
+import openai_client
+from llm_cache import get_llm_cache
+
+ENABLED = os.getenv("HEDGE", "0") == "1"
+PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "10"))
+FALLBACKS = json.loads(os.getenv("HEDGE_FALLBACKS", "{}"))
+WORKERS = int(os.getenv("HEDGE_WORKERS", "32"))
+
+hedge_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="hedge")
+
+
+class LatencyWindow:
+    """The last `size` latencies of one agent and model."""
+
+    def __init__(self, size=WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """The q-th percentile, or None while there are fewer than MIN_SAMPLES."""
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return float(np.percentile(samples, q))
+
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+
+def window_for(agent, model):
+    """Return the process-wide latency window for (agent, model), creating it on first use."""
+    with _windows_lock:
+        if (agent, model) not in _windows:
+            _windows[(agent, model)] = LatencyWindow()
+        return _windows[(agent, model)]
+
+
+def deadline(agent, model):
+    """Seconds to wait for the primary request before sending the backup."""
+    seconds = window_for(agent, model).percentile(PERCENTILE)
+    if seconds is None:
+        seconds = INITIAL_DELAY
+    metrics.registry.set_gauge("hedge_deadline_seconds", seconds, agent=agent, model=model)
+    return seconds
+
+
+def _send(agent, key, params, settled=None):
+    """One request to the API, timed for the agent's window and stored under `key`.
+
+    Not sent at all once `settled` is set, i.e. the other request already
+    answered; a successful answer sets it.
+    """
+    if settled is not None and settled.is_set():
+        raise CancelledError("The hedged call was already answered")
+    start = time.perf_counter()
+    response = openai_client.chat_completion(**params)
+    window_for(agent, params.get("model")).add(time.perf_counter() - start)
+    if settled is not None:
+        settled.set()
+    if key is not None:
+        response = get_llm_cache().put(key, params.get("model"), response)
+    return response
+
+
+def create(agent, cache=None, **params):
+    """get_llm_cache().create(**params), hedged when enabled; returns (model, response).
+
+    `model` is the model that answered, which is the fallback when the
+    backup request won.
+    """
+    llm_cache = get_llm_cache()
+    model = params.get("model")
+    key, response = llm_cache.lookup(params, cache)
+    if response is not None:
+        return model, response
+    if not ENABLED:
+        response = _send(agent, key, params)
+        metrics.registry.inc("hedge_requests_total", agent=agent, outcome="unhedged")
+        return model, response
+
+    settled = threading.Event()
+    primary = metrics.submit(hedge_pool, _send, agent, key, params, settled)
+    done, _ = wait([primary], timeout=deadline(agent, model))
+    if done and primary.exception() is None:
+        metrics.registry.inc("hedge_requests_total", agent=agent, outcome="primary")
+        return model, primary.result()
+
+    backup_model = FALLBACKS.get(model, model)
+    backup_params = dict(params, model=backup_model)
+    backup_key = key
+    if backup_model != model:
+        backup_key, response = llm_cache.lookup(backup_params, cache)
+        if response is not None:
+            settled.set()
+            primary.cancel()
+            metrics.registry.inc("hedge_requests_total", agent=agent, outcome="backup_won")
+            return backup_model, response
+    backup = metrics.submit(hedge_pool, _send, agent, backup_key, backup_params, settled)
+
+    pending = {primary: model, backup: backup_model}
+    errors = []
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        # Prefer the primary when both finished together
+        for future in sorted(done, key=lambda f: f is not primary):
+            answered_by = pending.pop(future)
+            if future.exception() is not None:
+                errors.append(future.exception())
+                continue
+            for loser in pending:
+                loser.cancel()
+            outcome = "primary_won" if future is primary else "backup_won"
+            metrics.registry.inc("hedge_requests_total", agent=agent, outcome=outcome)
+            return answered_by, future.result()
+    metrics.registry.inc("hedge_requests_total", agent=agent, outcome="failed")
+    raise errors[0]
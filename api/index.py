@@ -1,11 +1,92 @@
-from flask import Flask, request, jsonify
+import json
+import os
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from Input_pip import Query
 from Generation import *
-import pandas as pd
-from RetrievalDB import main as retrieval_main
+import metrics
+import singleflight
+from embedding_cache import get_cache
+from llm_cache import get_llm_cache
+from startup import Startup
+from session_store import get_session_store
+from vote_log import get_vote_log
 
 app = Flask(__name__)
 
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+
+# Checks the prebuilt artifacts and loads them in the background; see /readyz
+startup = Startup()
+if os.getenv("WARM_ON_IMPORT", "1") == "1":
+    startup.start()
+
+metrics.registry.register_gauges("embedding_cache", lambda: get_cache().counters())
+metrics.registry.register_gauges("llm_cache", lambda: get_llm_cache().counters())
+metrics.registry.register_gauges("sessions", lambda: get_session_store().counters())
+metrics.registry.register_gauges("singleflight", singleflight.counters)
+metrics.registry.register_gauges("vote_log", lambda: get_vote_log().counters())
+
+
+def wants_timings():
+    """True when the client asked for the per-stage breakdown (?timings=1 or "timings": true)."""
+    body = request.get_json(silent=True) or {}
+    return request.args.get("timings") == "1" or body.get("timings") is True
+
+
+def wants_candidates():
+    """Older clients that POST the candidates back to /api/analyze ask for them with "includeCandidates": true."""
+    body = request.get_json(silent=True) or {}
+    return body.get("includeCandidates") is True
+
+
+def analyze_inputs(data):
+    """Return (query, candidates, follow-up questions, answers) for /api/analyze.
+
+    With a "sessionId" everything but the answers comes from the session
+    store; otherwise from the full payload older clients send. Returns None
+    for an unknown or expired session.
+    """
+    answers = data.get("userFollowupResponse", [])
+    if data.get("sessionId"):
+        session = get_session_store().get(data["sessionId"])
+        if session is None:
+            return None
+        return session["query"], session["candidates"], session["followupQuestions"], answers
+    return (
+        data.get("initialQuery", ""),
+        data.get("candidates", []),
+        data.get("followUpQuestions", []),
+        answers,
+    )
+
+
+def request_key(endpoint, *inputs):
+    """Canonical key for coalescing identical in-flight requests to `endpoint`."""
+    return endpoint, json.dumps(inputs, sort_keys=True, default=str)
+
+
+def unknown_session():
+    return jsonify({"error": "Unknown or expired session; start again with /api/generate"}), 404
+
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "alive"})
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: artifacts verified and loaded; 503 while starting or if they are missing."""
+    status = startup.status()
+    return jsonify(status), 200 if status["status"] == "ready" else 503
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
 
 @app.route("/")
 def home():
@@ -23,31 +104,150 @@ def generate_followup():
 
     # Get user initial question
     user_initial_query = request.json["query"]
+    include_candidates = wants_candidates()
+    include_timings = wants_timings()
 
-    # Generate candidates
-    candidates = Query.generate_candidate(user_initial_query, 5)
+    def generate():
+        with metrics.request_timer("/api/generate") as timings:
+            # Generate candidates
+            candidates, _, embedding = Query.generate_candidate_timed(user_initial_query, 5)
 
-    # Return a list of questions
-    bot_followup_questions = followup_agent(user_initial_query, candidates)
+            # Return a list of questions
+            bot_followup_questions = followup_agent(user_initial_query, candidates)
 
-    return jsonify(
-        {
+        # Candidates stay on the server; /api/analyze only needs the session id
+        session_id = get_session_store().create(
+            query=user_initial_query,
+            embedding=embedding,
+            candidates=candidates,
+            followupQuestions=bot_followup_questions,
+        )
+        body = {
+            "sessionId": session_id,
             "initialQuery": user_initial_query,
-            "candidates": candidates,
             "followupQuestions": bot_followup_questions,
         }
+        if include_candidates:
+            body["candidates"] = candidates
+        if include_timings:
+            body["timings"] = timings
+        return body
+
+    # Identical concurrent requests (double clicks, retries) share one run and one session
+    key = request_key("/api/generate", user_initial_query, include_candidates, include_timings)
+    return jsonify(singleflight.group("api_generate").do(key, generate))
+
+
+@app.route("/api/generate/batch", methods=["POST"])
+def generate_batch():
+    """Candidates (and optionally follow-up questions) for many statements at once.
+
+    Body: {"queries": [...], "followups": false}. Embeddings are requested
+    in multi-input batches and retrieval runs as matrix searches; with
+    "followups": true the follow-up questions are generated concurrently,
+    at most FOLLOWUP_CONCURRENCY at a time. No sessions are created.
+    """
+    body = request.get_json(silent=True) or {}
+    queries = body.get("queries")
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "Provide \"queries\" as a list of strings"}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch"}), 400
+
+    with metrics.request_timer("/api/generate/batch") as timings:
+        candidate_sets = Query.generate_candidates(queries, 5)
+        if body.get("followups") is True:
+            questions = followup_agent_batch(queries, candidate_sets)
+        else:
+            questions = [None] * len(queries)
+
+    results = []
+    for query, candidates, followup_questions in zip(queries, candidate_sets, questions):
+        result = {"initialQuery": query, "candidates": candidates}
+        if followup_questions is not None:
+            result["followupQuestions"] = followup_questions
+        results.append(result)
+    response = {"results": results}
+    if wants_timings():
+        response["timings"] = timings
+    return jsonify(response)
+
+
+def sse(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def event_stream(events):
+    # No buffering in proxies (nginx) so each event reaches the browser as it is sent
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.route("/api/generate/stream", methods=["POST"])
+def generate_followup_stream():
+    """Streaming /api/generate.
+
+    Events: "session" with the session id and candidate topics once
+    retrieval is done, "token" for each chunk of model output, "question" as
+    soon as a follow-up question is complete, then "done" with the same body
+    /api/generate returns (or "error").
+    """
+    if not request.json or "query" not in request.json:
+        return jsonify({"error": "No query provided"}), 400
+
+    user_initial_query = request.json["query"]
+    include_timings = wants_timings()
+    include_candidates = wants_candidates()
+
+    def events():
+        with metrics.request_timer("/api/generate/stream") as timings:
+            try:
+                candidates, _, embedding = Query.generate_candidate_timed(user_initial_query, 5)
+                store = get_session_store()
+                session_id = store.create(
+                    query=user_initial_query,
+                    embedding=embedding,
+                    candidates=candidates,
+                    followupQuestions=[],
+                )
+                yield sse("session", {"sessionId": session_id, "topics": list(candidates)})
+
+                questions = []
+                with metrics.span("followup_agent"):
+                    for kind, text in followup_agent_stream(user_initial_query, candidates):
+                        if kind == "question":
+                            questions.append(text)
+                        yield sse(kind, text)
+                store.update(session_id, followupQuestions=questions)
+
+                body = {
+                    "sessionId": session_id,
+                    "initialQuery": user_initial_query,
+                    "followupQuestions": questions,
+                }
+                if include_candidates:
+                    body["candidates"] = candidates
+                if include_timings:
+                    body["timings"] = timings
+                yield sse("done", body)
+            except Exception as e:
+                yield sse("error", f"An error occurred: {e}")
+
+    return event_stream(events())
+
+
 @app.route("/api/analyze", methods=["POST"])
 def analyze():
     # Get necessary data to be passed to the functions
-    data = request.get_json()
-    user_initial_query = data.get("initialQuery", "")
-    candidates = data.get("candidates", [])
+    inputs = analyze_inputs(request.get_json())
+    if inputs is None:
+        return unknown_session()
+    user_initial_query, candidates, bot_followup_questions, user_followup_response = inputs
     # print("==== candidate in index.py: ", candidates)
-    bot_followup_questions = data.get("followUpQuestions", [])
-    user_followup_response = data.get("userFollowupResponse", [])
 
     # Concatenate lists into a single string
     bot_followup_questions_str = " ".join(bot_followup_questions)
@@ -55,30 +255,95 @@ def analyze():
     # print("bot_followup_questions_str in function analyze", bot_followup_questions_str)
     # print("user_followup_response_str in function analyze", user_followup_response_str)
 
-    # Call predefined methods to vote
-    votes = vote_for_results(
-        candidates,
-        user_initial_query,
-        bot_followup_questions_str,
-        user_followup_response_str,
-    )
+    include_timings = wants_timings()
+    # Tags this request's vote log record; clients may pass their own id
+    request_id = request.headers.get("X-Request-ID")
 
-    # select the ideal agent
-    agent, diagnosis = select_agent(votes)
-
-    # print(f"{agent} steps in!")
-    result = final_agent(
-        agent,
-        diagnosis,
-        candidates,
-        user_initial_query,
-        bot_followup_questions_str,
-        user_followup_response_str,
-    )
+    def analyze_body():
+        with metrics.request_timer("/api/analyze", request_id) as timings:
+            # Call predefined methods to vote
+            votes = vote_for_results(
+                candidates,
+                user_initial_query,
+                bot_followup_questions_str,
+                user_followup_response_str,
+            )
+
+            # select the ideal agent
+            agent, diagnosis = select_agent(votes)
+
+            # print(f"{agent} steps in!")
+            result = final_agent(
+                agent,
+                diagnosis,
+                candidates,
+                user_initial_query,
+                bot_followup_questions_str,
+                user_followup_response_str,
+            )
+
+        body = {"result": result}
+        if include_timings:
+            body["timings"] = timings
+        return body
+
+    # Keyed on the resolved inputs, so session and full-payload requests coalesce too
+    key = request_key("/api/analyze", inputs, include_timings)
+    return jsonify(singleflight.group("api_analyze").do(key, analyze_body))
+
+
+@app.route("/api/analyze/stream", methods=["POST"])
+def analyze_stream():
+    """Streaming /api/analyze.
+
+    Events: "diagnosis" with the selected agent and diagnosis once voting
+    is done, "token" for each chunk of the answer, then "done" with the
+    same body /api/analyze returns (or "error").
+    """
+    inputs = analyze_inputs(request.get_json())
+    if inputs is None:
+        return unknown_session()
+    user_initial_query, candidates, bot_followup_questions, user_followup_response = inputs
+    bot_followup_questions_str = " ".join(bot_followup_questions)
+    user_followup_response_str = ". ".join(user_followup_response)
+    include_timings = wants_timings()
+    request_id = request.headers.get("X-Request-ID")
+
+    def events():
+        with metrics.request_timer("/api/analyze/stream", request_id) as timings:
+            try:
+                votes = vote_for_results(
+                    candidates,
+                    user_initial_query,
+                    bot_followup_questions_str,
+                    user_followup_response_str,
+                )
+                agent, diagnosis = select_agent(votes)
+                yield sse("diagnosis", {"agent": agent, "diagnosis": diagnosis})
+
+                chunks = []
+                with metrics.span("final_agent", model=agent):
+                    for text in final_agent_stream(
+                        agent,
+                        diagnosis,
+                        candidates,
+                        user_initial_query,
+                        bot_followup_questions_str,
+                        user_followup_response_str,
+                    ):
+                        chunks.append(text)
+                        yield sse("token", text)
+
+                body = {"result": "".join(chunks)}
+                if include_timings:
+                    body["timings"] = timings
+                yield sse("done", body)
+            except Exception as e:
+                yield sse("error", f"An error occurred: {e}")
 
-    return jsonify({"result": result})
+    return event_stream(events())
 
 
 if __name__ == "__main__":
-    retrieval_main()
-    app.run()
+    # Artifacts are built offline (python RetrievalDB.py), never at boot
+    app.run(port=int(os.getenv("PORT", "5000")))
@@ -0,0 +1,137 @@
+"""Configurable FAISS index types for the wiki index.
+
+Every type is wrapped in IDMap2 so vector ids stay document `_id`s. The
+type and its parameters are written next to the index as
+`<index path>.json`, and read_index() re-applies the search-time
+parameters (nprobe, efSearch) that FAISS does not serialize itself.
+
+    flat       exhaustive L2 scan
+    ivf_flat   inverted lists over full vectors      nlist, nprobe
+    ivf_pq     inverted lists over PQ codes          nlist, m, nbits, nprobe
+    hnsw       graph search (no deletes)             m, ef_construction, ef_search
+
+Any type can also be compressed:
+
+    pca_dim    learn a PCA projection to this many dimensions (0 = off)
+    quantizer  store vectors as "fp16" or "int8" scalars ("none" = float32;
+               not combinable with ivf_pq, which already stores PQ codes)
+
+The PCA matrix is part of the index (IndexPreTransform), so query vectors
+from Query.Understand are projected the same way on every search.
+"""
+
+import json
+import os
+
+import faiss
+
+DIMENSION = 1536
+
+INDEX_TYPES = {
+    "flat": {},
+    "ivf_flat": {"nlist": 1024, "nprobe": 16},
+    "ivf_pq": {"nlist": 1024, "m": 64, "nbits": 8, "nprobe": 16},
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 64},
+}
+
+COMPRESSION = {"pca_dim": 0, "quantizer": "none"}
+SCALAR_QUANTIZERS = {"none": None, "fp16": "SQfp16", "int8": "SQ8"}
+
+# FAISS suggests at least ~39 training points per IVF centroid
+MIN_POINTS_PER_LIST = 39
+
+
+def resolve_params(index_type, params=None, n_train=None):
+    """Merge `params` over the type's defaults, shrinking nlist for small corpora."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; choose from {sorted(INDEX_TYPES)}.")
+    resolved = dict(COMPRESSION, **INDEX_TYPES[index_type])
+    resolved.update(params or {})
+    if resolved["quantizer"] not in SCALAR_QUANTIZERS:
+        raise ValueError(
+            f"Unknown quantizer {resolved['quantizer']!r}; choose from {sorted(SCALAR_QUANTIZERS)}."
+        )
+    if index_type == "ivf_pq":
+        if resolved["quantizer"] != "none":
+            raise ValueError("ivf_pq already stores PQ codes; use quantizer=none.")
+        dimension = resolved["pca_dim"] or DIMENSION
+        if dimension % resolved["m"]:
+            raise ValueError(f"ivf_pq needs m to divide the dimension ({dimension}).")
+    if "nlist" in resolved and n_train is not None:
+        resolved["nlist"] = max(1, min(resolved["nlist"], n_train // MIN_POINTS_PER_LIST))
+    return resolved
+
+
+def factory_string(index_type, params):
+    params = dict(COMPRESSION, **params)
+    scalar = SCALAR_QUANTIZERS[params["quantizer"]]
+    if index_type == "flat":
+        body = scalar or "Flat"
+    elif index_type == "ivf_flat":
+        body = f"IVF{params['nlist']},{scalar or 'Flat'}"
+    elif index_type == "ivf_pq":
+        body = f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}"
+    elif index_type == "hnsw":
+        body = f"HNSW{params['m']}" + (f"_{scalar}" if scalar else "")
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}.")
+    if params["pca_dim"]:
+        body = f"PCA{params['pca_dim']},{body}"
+    return f"IDMap2,{body}"
+
+
+def base_index(index):
+    """Unwrap IDMap and PCA layers down to the index that stores the vectors."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def create_index(index_type="flat", params=None, dimension=DIMENSION):
+    index = faiss.index_factory(dimension, factory_string(index_type, params), faiss.METRIC_L2)
+    if index_type == "hnsw":
+        base_index(index).hnsw.efConstruction = params["ef_construction"]
+    apply_search_params(index, index_type, params)
+    return index
+
+
+def apply_search_params(index, index_type, params):
+    if index_type in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    elif index_type == "hnsw":
+        base_index(index).hnsw.efSearch = params["ef_search"]
+
+
+def config_path(index_path):
+    return f"{index_path}.json"
+
+
+def read_manifest(index_path):
+    """Return the whole sidecar: type, params and the corpus_version built from."""
+    try:
+        with open(config_path(index_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"type": "flat", "params": {}}
+
+
+def read_config(index_path):
+    """Return (index_type, params); indexes without a sidecar are flat."""
+    config = read_manifest(index_path)
+    return config["type"], config["params"]
+
+
+def write_config(index_path, index_type, params, corpus_version=None):
+    tmp = f"{config_path(index_path)}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"type": index_type, "params": params, "corpus_version": corpus_version}, f)
+    os.replace(tmp, config_path(index_path))
+
+
+def read_index(index_path):
+    """Read an index and apply the search parameters recorded next to it."""
+    index = faiss.read_index(index_path)
+    index_type, params = read_config(index_path)
+    apply_search_params(index, index_type, params)
+    return index
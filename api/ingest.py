@@ -0,0 +1,134 @@
+"""Concurrent, rate-limited and resumable corpus ingestion.
+
+Summaries are fetched on a thread pool behind a token bucket, at most one
+window of topics ahead, embedded in multi-input batches, and appended to a
+JSONL checkpoint after every batch.
+The first checkpoint line pins the topic order, so `_id`s stay the same when
+a rerun resumes after a crash.
+
+The fetch and embed callables are injected, which lets the pipeline run
+offline against stubs (see benchmark/ingest_throughput.py).
+"""
+
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import TokenBucket
+
+CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", "wiki_ingest.checkpoint.jsonl")
+
+
+def read_checkpoint(path):
+    """Return (topics, {topic: record}) from a checkpoint, or (None, {}) if absent."""
+    if not os.path.isfile(path):
+        return None, {}
+    topics, records = None, {}
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a torn last line; the topic is simply redone
+                continue
+            if "topics" in entry:
+                topics = entry["topics"]
+            else:
+                records[entry["Topic"]] = entry
+    return topics, records
+
+
+def ingest(
+    topics,
+    fetch_summary,
+    embed_batch,
+    checkpoint_path=CHECKPOINT_PATH,
+    batch_size=64,
+    workers=8,
+    fetches_per_second=10.0,
+):
+    """Fetch and embed every topic, resuming from `checkpoint_path`.
+
+    fetch_summary(topic) -> str and embed_batch([str]) -> [[float]].
+    Returns (records in topic order, stats). Topics whose fetch or
+    embedding failed are left out and retried on the next run.
+    """
+    pinned, done = read_checkpoint(checkpoint_path)
+    if pinned is not None:
+        topics = pinned
+    else:
+        topics = list(topics)
+        with open(checkpoint_path, "w") as f:
+            f.write(json.dumps({"topics": topics}) + "\n")
+
+    ids = {topic: idx for idx, topic in enumerate(topics)}
+    pending = [topic for topic in topics if topic not in done]
+    limiter = TokenBucket(fetches_per_second)
+    stats = {"resumed": len(done), "ingested": 0, "failed": 0}
+
+    def fetch(topic):
+        limiter.acquire()
+        try:
+            return topic, fetch_summary(topic)
+        except Exception as e:
+            print(f"Error fetching {topic}: {e}")
+            return topic, None
+
+    def flush(batch, checkpoint):
+        try:
+            vectors = embed_batch([summary for _, summary in batch])
+        except Exception as e:
+            print(f"Error embedding batch of {len(batch)}: {e}")
+            stats["failed"] += len(batch)
+            return
+        for (topic, summary), vector in zip(batch, vectors):
+            record = {"_id": ids[topic], "Topic": topic, "Summary": summary, "Embeded": list(vector)}
+            done[topic] = record
+            checkpoint.write(json.dumps(record) + "\n")
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        stats["ingested"] += len(batch)
+
+    start = time.perf_counter()
+    with open(checkpoint_path, "a") as checkpoint, ThreadPoolExecutor(workers) as pool:
+        # Only a window of fetches is queued ahead of the one being consumed,
+        # so an error stops the run within a batch rather than after every topic
+        window = max(batch_size, workers)
+        remaining = iter(pending)
+        queued = deque()
+
+        def fill():
+            for topic in itertools.islice(remaining, window - len(queued)):
+                queued.append(pool.submit(fetch, topic))
+
+        batch = []
+        try:
+            fill()
+            while queued:
+                topic, summary = queued.popleft().result()
+                fill()
+                if summary is None:
+                    stats["failed"] += 1
+                    continue
+                batch.append((topic, summary))
+                if len(batch) >= batch_size:
+                    flush(batch, checkpoint)
+                    batch = []
+            if batch:
+                flush(batch, checkpoint)
+        except BaseException:
+            for future in queued:
+                future.cancel()
+            raise
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = elapsed
+    stats["topics_per_second"] = stats["ingested"] / elapsed if elapsed else 0.0
+    print(
+        f"Ingested {stats['ingested']} topics ({stats['resumed']} resumed, "
+        f"{stats['failed']} failed) at {stats['topics_per_second']:.1f} topics/sec"
+    )
+    return [done[topic] for topic in topics if topic in done], stats
@@ -0,0 +1,260 @@
+"""Response cache for ChatCompletion calls made by the agents in Generation.py.
+
+Keys are sha256 over the canonical JSON of the model, messages and
+sampling parameters, so any change to a prompt or setting is a miss.
+Transport options (request_timeout, stream) are not part of the key, and a
+streamed call shares its entry with the blocking call it mirrors.
+
+Lookups go through two tiers:
+
+- an in-process LRU bounded by entry count, with a TTL per entry,
+- an optional SQLite file (WAL mode) shared by the worker processes,
+  enabled by setting LLM_CACHE_PATH.
+
+Calls whose temperature is above LLM_CACHE_MAX_TEMPERATURE bypass the cache
+unless the caller passes cache=True; cache=False always bypasses it. The
+default of 0.5 caches the judges' ballots (temperature 0.5) and samples the
+creative follow-up questions (0.7) afresh; final_agent opts in with
+cache=True (see CACHE_FINAL in Generation.py), so a repeated analyze with
+the same inputs is answered entirely from the cache.
+Replies served from the cache carry "cached": True, so the tokens they
+would have cost aren't counted as spent.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import openai_client
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", "3600"))
+MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.5"))
+
+# Options that change how a request is sent, not what the model answers
+TRANSPORT_KEYS = {"request_timeout", "stream", "api_key", "api_base", "timeout"}
+
+
+def request_key(params):
+    canonical = {k: v for k, v in params.items() if k not in TRANSPORT_KEYS}
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def to_plain(response):
+    """Turn an OpenAIObject into plain dicts and lists for storage."""
+    if hasattr(response, "to_dict_recursive"):
+        return response.to_dict_recursive()
+    return json.loads(json.dumps(response))
+
+
+class LLMCache:
+    def __init__(
+        self,
+        path=CACHE_PATH,
+        max_entries=MAX_ENTRIES,
+        ttl=TTL_SECONDS,
+        max_temperature=MAX_TEMPERATURE,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._local = threading.local()
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+        if path:
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS completions "
+                    "(key TEXT PRIMARY KEY, model TEXT, expires REAL, response TEXT)"
+                )
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def _remember(self, key, expires, response):
+        with self._lock:
+            self._memory[key] = (expires, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def use_cache(self, params, cache=None):
+        """Apply the per-call policy: explicit cache=True/False wins, else temperature."""
+        if cache is not None:
+            return cache
+        return params.get("temperature", 1.0) <= self.max_temperature
+
+    def get(self, key):
+        """Return the cached response for `key`, or None on a miss or expiry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, response = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return dict(response, cached=True)
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+        if self.path:
+            row = self._connection().execute(
+                "SELECT expires, response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] > now:
+                response = json.loads(row[1])
+                self._remember(key, row[0], response)
+                self._count("disk_hits")
+                return dict(response, cached=True)
+            if row is not None:
+                self._count("expired")
+
+        self._count("misses")
+        return None
+
+    def put(self, key, model, response):
+        response = to_plain(response)
+        expires = time.time() + self.ttl
+        self._remember(key, expires, response)
+        if self.path:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO completions (key, model, expires, response) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, model, expires, json.dumps(response)),
+                )
+        return response
+
+    def lookup(self, params, cache=None):
+        """Return (key, cached response) for a call; key is None when it bypasses the cache."""
+        if not self.use_cache(params, cache):
+            self._count("bypassed")
+            return None, None
+        key = request_key(params)
+        return key, self.get(key)
+
+    def create(self, cache=None, **params):
+        """openai_client.chat_completion(**params), answered from the cache when allowed."""
+        key, response = self.lookup(params, cache)
+        if key is None:
+            return openai_client.chat_completion(**params)
+        if response is None:
+            # Failed calls raise here and are never cached
+            response = self.put(key, params.get("model"), openai_client.chat_completion(**params))
+        return response
+
+    def stream(self, cache=None, **params):
+        """Streamed create: yields chunks, or the cached reply as a single chunk.
+
+        A completed stream is stored in the same shape as a blocking
+        response, so either kind of call can be answered from it.
+        """
+        params = dict(params, stream=True)
+        if not self.use_cache(params, cache):
+            self._count("bypassed")
+            yield from openai_client.chat_completion(**params)
+            return
+        key = request_key(params)
+        response = self.get(key)
+        if response is not None:
+            choice = response["choices"][0]
+            yield {
+                "cached": True,
+                "model": response.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": choice["message"]["content"]},
+                        "finish_reason": choice.get("finish_reason"),
+                    }
+                ],
+            }
+            return
+
+        parts = []
+        finish_reason = None
+        for chunk in openai_client.chat_completion(**params):
+            choice = chunk["choices"][0]
+            parts.append(choice.get("delta", {}).get("content") or "")
+            finish_reason = choice.get("finish_reason") or finish_reason
+            yield chunk
+        if finish_reason == "stop":
+            # Only complete answers are cached, not ones cut off by max_tokens
+            self.put(
+                key,
+                params.get("model"),
+                {
+                    "object": "chat.completion",
+                    "model": params.get("model"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(parts)},
+                            "finish_reason": finish_reason,
+                        }
+                    ],
+                },
+            )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM completions")
+
+    def counters(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
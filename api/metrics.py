@@ -0,0 +1,182 @@
+"""Per-stage latency spans, histograms and Prometheus text exposition.
+
+    with metrics.request_timer("/api/analyze") as timings:
+        with metrics.span("final_agent", model="gpt-4o"):
+            ...
+
+Every span is observed into the stage_duration_seconds histogram and, while
+a request_timer is active, appended to that request's timings list (the
+optional breakdown returned by the API). The list lives in a context
+variable, so work handed to a thread pool must go through metrics.submit to
+stay attributed to its request. A span costs a couple of microseconds.
+current_request() gives code running for a request its endpoint and id,
+e.g. to tag log records.
+"""
+
+import bisect
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Seconds; covers cache hits through slow second-round judges
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_timings = contextvars.ContextVar("request_timings", default=None)
+_request = contextvars.ContextVar("request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauge_values = {}
+        self._gauges = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauge_values[key] = value
+
+    def register_gauges(self, prefix, collect):
+        """Expose each numeric value of collect() as gauge `<prefix>_<key>`."""
+        self._gauges[prefix] = collect
+
+    def render(self):
+        """Return every metric in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+            gauge_values = sorted(self._gauge_values.items())
+
+        typed = set()
+        for (name, labels), counts, total, count in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for (name, labels), value in gauge_values:
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for prefix, collect in sorted(self._gauges.items()):
+            for key, value in sorted(collect().items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time the block as `stage`; labels (e.g. model, round) split the histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("stage_duration_seconds", seconds, stage=stage, **labels)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append(dict(stage=stage, seconds=seconds, **labels))
+
+
+def timed(stage):
+    """Decorator form of span() for a whole function."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def request_timer(endpoint, request_id=None):
+    """Collect the spans of one request; yields the list they are appended to.
+
+    The request is identified by `request_id` (e.g. an X-Request-ID header)
+    or a new random id; see current_request().
+    """
+    timings = []
+    token = _timings.set(timings)
+    request_token = _request.set({"endpoint": endpoint, "id": request_id or uuid.uuid4().hex})
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        registry.observe(
+            "request_duration_seconds", time.perf_counter() - start, endpoint=endpoint
+        )
+        _request.reset(request_token)
+        _timings.reset(token)
+
+
+def current_request():
+    """Return {"endpoint", "id"} of the request being served, or None outside one."""
+    return _request.get()
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit that keeps the caller's request timings attached."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
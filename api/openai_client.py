@@ -0,0 +1,281 @@
+"""Shared OpenAI client: pooled connections, per-model limits and retries.
+
+Every completion and embedding request goes through chat_completion() or
+embedding(), the drop-in equivalents of openai.ChatCompletion.create and
+openai.Embedding.create:
+
+- one keep-alive connection pool shared by all threads, instead of a new
+  one per request thread (openai.requestssession builds each thread's
+  session over it, keeping openai.proxy and the connection retries);
+- per model, a request-per-minute and a token-per-minute budget (token
+  buckets refilled continuously, bursting up to LIMIT_BURST_SECONDS worth)
+  and a cap on concurrent requests;
+- retries of rate limits, timeouts, connection and 5xx errors with jittered
+  exponential backoff, honouring Retry-After when the API sends it.
+
+Limits come from OPENAI_RPM / OPENAI_TPM / OPENAI_CONCURRENCY, overridden
+per model by OPENAI_MODEL_LIMITS, e.g.
+'{"gpt-4": {"rpm": 500, "tpm": 30000, "concurrency": 4}}'. Queue depth and
+in-flight requests per model are exported as openai_queue_depth and
+openai_in_flight gauges, time spent queued as the openai_queue_seconds
+histogram, and attempts as openai_requests_total{model,outcome}.
+
+Importing this module sets openai.api_key from OPEN_AI_API_KEY (.env).
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+import openai
+import requests
+from openai import api_requestor
+from dotenv import load_dotenv
+
+import metrics
+from rate_limit import TokenBucket
+from token_budget import count_message_tokens, count_tokens
+
+load_dotenv()
+openai.api_key = os.getenv("OPEN_AI_API_KEY")
+
+POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "32"))
+DEFAULT_RPM = float(os.getenv("OPENAI_RPM", "3000"))
+DEFAULT_TPM = float(os.getenv("OPENAI_TPM", "250000"))
+DEFAULT_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "16"))
+MODEL_LIMITS = json.loads(os.getenv("OPENAI_MODEL_LIMITS", "{}"))
+LIMIT_BURST_SECONDS = float(os.getenv("OPENAI_LIMIT_BURST_SECONDS", "5"))
+
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+
+# max_tokens assumed for completions that don't set it, when budgeting tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+RETRYABLE = (
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain,
+)
+
+
+class PooledSession(requests.Session):
+    """A thread's session over the shared connection pool.
+
+    openai keeps one session per thread, built by calling
+    openai.requestssession, and closes and replaces it every
+    MAX_SESSION_LIFETIME_SECS. Closing this session leaves the shared
+    adapter, and the connections it pools, open for the other threads.
+    """
+
+    def __init__(self, adapter):
+        super().__init__()
+        # What openai's own sessions are built with
+        proxies = api_requestor._requests_proxies_arg(openai.proxy)
+        if proxies:
+            self.proxies = proxies
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def close(self):
+        pass
+
+
+def session_factory(pool_size=POOL_SIZE):
+    """A factory for openai.requestssession whose sessions share one connection pool."""
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        max_retries=api_requestor.MAX_CONNECTION_RETRIES,
+    )
+    return lambda: PooledSession(adapter)
+
+
+openai.requestssession = session_factory()
+
+
+class ModelLimiter:
+    """Request and token budgets plus a concurrency cap for one model."""
+
+    def __init__(self, model, rpm, tpm, concurrency):
+        self.model = model
+        self.requests = TokenBucket(rpm / 60, capacity=max(1, rpm / 60 * LIMIT_BURST_SECONDS))
+        self.tokens = TokenBucket(tpm / 60, capacity=max(1, tpm / 60 * LIMIT_BURST_SECONDS))
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+
+    def _adjust(self, waiting=0, in_flight=0):
+        with self._lock:
+            self.waiting += waiting
+            self.in_flight += in_flight
+            depth, running = self.waiting, self.in_flight
+        metrics.registry.set_gauge("openai_queue_depth", depth, model=self.model)
+        metrics.registry.set_gauge("openai_in_flight", running, model=self.model)
+
+    def acquire(self, tokens, timeout=None):
+        """Wait for a slot and the budgets; call release() when the request is done.
+
+        Returns False, holding nothing, if they aren't available within
+        `timeout` seconds.
+        """
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        self._adjust(waiting=1)
+        if not self.slots.acquire(timeout=remaining()):
+            self._adjust(waiting=-1)
+            return False
+        try:
+            acquired = self.requests.acquire(timeout=remaining()) and self.tokens.acquire(
+                tokens, timeout=remaining()
+            )
+        except BaseException:
+            self.slots.release()
+            self._adjust(waiting=-1)
+            raise
+        if not acquired:
+            self.slots.release()
+            self._adjust(waiting=-1)
+            return False
+        self._adjust(waiting=-1, in_flight=1)
+        metrics.registry.observe(
+            "openai_queue_seconds", time.perf_counter() - start, model=self.model
+        )
+        return True
+
+    def release(self):
+        self._adjust(in_flight=-1)
+        self.slots.release()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(model):
+    """Return the process-wide limiter for `model`, creating it on first use."""
+    with _limiters_lock:
+        if model not in _limiters:
+            limits = MODEL_LIMITS.get(model, {})
+            _limiters[model] = ModelLimiter(
+                model,
+                rpm=limits.get("rpm", DEFAULT_RPM),
+                tpm=limits.get("tpm", DEFAULT_TPM),
+                concurrency=limits.get("concurrency", DEFAULT_CONCURRENCY),
+            )
+        return _limiters[model]
+
+
+def estimate_tokens(params):
+    """Tokens the request counts against the model's TPM budget (prompt + max completion)."""
+    model = params.get("model", "")
+    if "messages" in params:
+        prompt = count_message_tokens(params["messages"], model)
+        return prompt + (params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+    inputs = params.get("input", [])
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    return sum(count_tokens(text, model) for text in inputs)
+
+
+def backoff(attempt, error=None):
+    """Seconds before retry `attempt` (0-based): Retry-After if sent, else full-jitter exponential."""
+    headers = getattr(error, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after", ""))
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX) + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def is_retryable(error):
+    if isinstance(error, RETRYABLE):
+        # An exhausted quota also answers 429 but won't clear by waiting
+        return getattr(error, "code", None) != "insufficient_quota"
+    # 5xx responses surface as APIError with the status attached
+    return isinstance(error, openai.error.APIError) and (error.http_status or 0) >= 500
+
+
+def call(create, params, keep_slot=False):
+    """Run create(**params) within the model's limits, retrying transient errors.
+
+    With keep_slot the concurrency slot stays taken after a successful call;
+    the caller must limiter_for(model).release() it. The request's own
+    request_timeout bounds the whole call: time queued for the limits,
+    every attempt and the backoff between them.
+    """
+    model = params.get("model", "")
+    limiter = limiter_for(model)
+    tokens = estimate_tokens(params)
+    timeout = params.get("request_timeout")
+    deadline = time.monotonic() + timeout if isinstance(timeout, (int, float)) else None
+    for attempt in range(MAX_RETRIES + 1):
+        if not limiter.acquire(tokens, None if deadline is None else deadline - time.monotonic()):
+            metrics.registry.inc("openai_requests_total", model=model, outcome="queue_timeout")
+            raise openai.error.Timeout(
+                f"Request timed out after {timeout}s waiting for the {model} rate limits"
+            )
+        if deadline is not None:
+            params = dict(params, request_timeout=max(deadline - time.monotonic(), 0.001))
+        try:
+            response = create(**params)
+        except Exception as e:
+            limiter.release()
+            delay = backoff(attempt, e)
+            out_of_time = deadline is not None and time.monotonic() + delay > deadline
+            if attempt == MAX_RETRIES or out_of_time or not is_retryable(e):
+                metrics.registry.inc("openai_requests_total", model=model, outcome="failed")
+                raise
+            metrics.registry.inc("openai_requests_total", model=model, outcome=type(e).__name__)
+            print(f"OpenAI {model} {type(e).__name__}; retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        metrics.registry.inc("openai_requests_total", model=model, outcome="ok")
+        if not keep_slot:
+            limiter.release()
+        return response
+
+
+def chat_completion(**params):
+    """openai.ChatCompletion.create(**params) through the shared limits and retries.
+
+    With stream=True the request keeps its concurrency slot until the
+    stream is consumed; only opening the stream is retried.
+    """
+    if not params.get("stream"):
+        return call(openai.ChatCompletion.create, params)
+    return _stream(params)
+
+
+def _stream(params):
+    stream = call(openai.ChatCompletion.create, params, keep_slot=True)
+    try:
+        yield from stream
+    finally:
+        limiter_for(params.get("model", "")).release()
+
+
+def embedding(**params):
+    """openai.Embedding.create(**params) through the shared limits and retries."""
+    return call(openai.Embedding.create, params)
+
+
+def counters():
+    """Return {"<model>": {"queue_depth", "in_flight"}} for every model used so far."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {
+        limiter.model: {"queue_depth": limiter.waiting, "in_flight": limiter.in_flight}
+        for limiter in limiters
+    }
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+import time
+
+import bm25_index
+from doc_store import STORE_PATH, MmapDocStore, MongoDocStore
+from doc_store import current_generation as doc_store_generation
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "wiki_faiss.index")
+# "mongo" or "mmap"; mmap serves topics and summaries without a database
+DOC_STORE_BACKEND = os.getenv("DOC_STORE_BACKEND", "mongo")
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-1 of a file, read in chunks so large indexes don't load into memory."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RetrievalContext:
+    """Process-wide FAISS index and pooled MongoDB client.
+
+    The FAISS index is read from disk once and kept resident. Every `check_interval`
+    seconds the file is stat'ed; if its mtime or size changed, a background
+    thread verifies the checksum and swaps in the new index. Requests that
+    already hold a reference to the old index finish on it undisturbed.
+    """
+
+    def __init__(
+        self,
+        index_path=INDEX_PATH,
+        mongo_uri=MONGO_URI,
+        bm25_path=bm25_index.INDEX_PATH,
+        doc_store_backend=DOC_STORE_BACKEND,
+        doc_store_path=STORE_PATH,
+        check_interval=1.0,
+    ):
+        self.index_path = index_path
+        self.bm25_path = bm25_path
+        self.doc_store_backend = doc_store_backend
+        self.doc_store_path = doc_store_path
+        self.mongo_uri = mongo_uri
+        self.check_interval = check_interval
+
+        self._lock = threading.RLock()
+        self._client = None
+        self._index = None
+        self._stat = None
+        self._checksum = None
+        self._last_check = 0.0
+        self._reloading = False
+
+        self._bm25 = None
+        self._bm25_generation = None
+        self._bm25_last_check = 0.0
+        self._doc_store = None
+        self._doc_store_last_check = 0.0
+
+    # MongoClient keeps its own connection pool and is thread-safe
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Imported here so workers on the mmap doc store never load pymongo
+                    from pymongo import MongoClient
+
+                    self._client = MongoClient(self.mongo_uri)
+        return self._client
+
+    @property
+    def collection(self):
+        return self.client["RetrivalDB"]["wiki_data"]
+
+    def doc_store(self):
+        """Return the document store that resolves retrieval hits by id.
+
+        The mmap store is reopened when a rebuild makes a new generation current.
+        """
+        if self.doc_store_backend != "mmap":
+            if self._doc_store is None:
+                with self._lock:
+                    if self._doc_store is None:
+                        self._doc_store = MongoDocStore(self.collection)
+            return self._doc_store
+
+        now = time.monotonic()
+        if self._doc_store is not None and now - self._doc_store_last_check < self.check_interval:
+            return self._doc_store
+        self._doc_store_last_check = now
+
+        generation = doc_store_generation(self.doc_store_path)
+        if self._doc_store is not None and generation == self._doc_store.generation:
+            return self._doc_store
+        with self._lock:
+            if self._doc_store is None or generation != self._doc_store.generation:
+                # Arrays and records are memory-mapped, so reopening is cheap
+                self._doc_store = MmapDocStore(self.doc_store_path)
+        return self._doc_store
+
+    def index(self):
+        """Return the resident index, scheduling a reload if the file changed."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load()
+        else:
+            self._maybe_reload()
+        return self._index
+
+    def _file_stat(self):
+        st = os.stat(self.index_path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        # faiss is imported with the first index load rather than at startup
+        import index_config
+
+        stat = self._file_stat()
+        checksum = file_checksum(self.index_path)
+        index = index_config.read_index(self.index_path)
+        self._index, self._stat, self._checksum = index, stat, checksum
+        self._last_check = time.monotonic()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval or self._reloading:
+            return
+        self._last_check = now
+        try:
+            stat = self._file_stat()
+        except OSError:
+            # Index file is being replaced; keep serving the current one
+            return
+        if stat == self._stat:
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(stat,), daemon=True).start()
+
+    def _reload(self, stat):
+        try:
+            import index_config
+
+            checksum = file_checksum(self.index_path)
+            if checksum != self._checksum:
+                index = index_config.read_index(self.index_path)
+                # Single reference assignment; in-flight searches keep the old index
+                self._index, self._checksum = index, checksum
+                print(f"Reloaded FAISS index from {self.index_path}")
+            self._stat = stat
+        except Exception as e:
+            print(f"Error reloading FAISS index: {e}")
+        finally:
+            self._reloading = False
+
+    def bm25(self):
+        """Return the resident BM25 index, swapping in a newly saved generation.
+
+        A missing index raises FileNotFoundError rather than being built on
+        the request path; build it offline with `python bm25_index.py build`.
+        """
+        now = time.monotonic()
+        if self._bm25 is not None and now - self._bm25_last_check < self.check_interval:
+            return self._bm25
+        self._bm25_last_check = now
+
+        generation = bm25_index.current_generation(self.bm25_path)
+        if generation is None:
+            if self._bm25 is not None:
+                return self._bm25
+            raise FileNotFoundError(
+                f"BM25 index {self.bm25_path} not found; "
+                "build it with `python bm25_index.py build`."
+            )
+        if self._bm25 is not None and generation == self._bm25_generation:
+            return self._bm25
+        with self._lock:
+            if self._bm25 is None or generation != self._bm25_generation:
+                # Arrays are memory-mapped, so loading a new generation is cheap
+                self._bm25 = bm25_index.BM25Index.load(self.bm25_path)
+                self._bm25_generation = generation
+        return self._bm25
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def get_context():
+    """Return the process-wide retrieval context, creating it on first use."""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = RetrievalContext()
+    return _context
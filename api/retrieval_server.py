@@ -0,0 +1,360 @@
+"""Retrieval server: one process owns the indexes and doc store for every worker.
+
+Run it next to the API workers and point them at its socket:
+
+    python retrieval_server.py --socket /run/mememinds/retrieval.sock
+    RETRIEVAL_SOCKET=/run/mememinds/retrieval.sock gunicorn -w 16 index:app
+
+With RETRIEVAL_SOCKET set, Query's FAISS and BM25 retrieval (single and
+batch) is answered here instead of from indexes loaded into each worker,
+so memory no longer grows with the worker count and a rebuilt index is
+reloaded once, by this process's RetrievalContext.
+
+Requests from all workers queue per kind. A batcher thread takes whatever
+is queued (up to RETRIEVAL_MAX_BATCH queries) and answers it with one
+FAISS matrix search or one BM25 top_n_many pass, plus one doc store
+lookup. Nothing waits for a batch to fill: a lone request runs at once,
+and under load the queue fills while the previous batch runs. Each request
+is checked before it is queued, so a malformed one fails alone instead of
+failing the batch it would have joined.
+
+Messages are pickled over a unix socket (multiprocessing.connection), so
+the socket must only be reachable by the user the API runs as.
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from faiss_index import DIMENSION
+from retrieval_context import get_context
+
+SOCKET = os.getenv("RETRIEVAL_SOCKET", "")
+MAX_BATCH = int(os.getenv("RETRIEVAL_MAX_BATCH", "256"))
+TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "30"))
+
+
+def check_n(n):
+    if isinstance(n, bool) or not isinstance(n, (int, np.integer)) or n < 1:
+        raise ValueError(f"n must be a positive integer, got {n!r}")
+
+
+def check_faiss(payload):
+    """Raise ValueError unless payload is (a finite (m, DIMENSION) float matrix, n)."""
+    embeddings, n = payload
+    check_n(n)
+    if not isinstance(embeddings, np.ndarray) or embeddings.dtype.kind != "f":
+        raise ValueError("embeddings must be a float array")
+    if embeddings.ndim != 2 or embeddings.shape[1] != DIMENSION:
+        raise ValueError(f"Expected an (m, {DIMENSION}) matrix, got {embeddings.shape}.")
+    if not np.isfinite(embeddings).all():
+        raise ValueError("embeddings must be finite")
+
+
+def check_bm25(payload):
+    """Raise ValueError unless payload is (a list of strings, n)."""
+    texts, n = payload
+    check_n(n)
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ValueError("texts must be a list of strings")
+
+
+def search_faiss(context, requests):
+    """Answer [(embeddings, n)] with one matrix search: per request, a doc list per row."""
+    matrix = np.vstack([embeddings for embeddings, _ in requests]).astype("float32", copy=False)
+    _, indices = context.index().search(matrix, max(n for _, n in requests))
+    docs = context.doc_store().get_by_id(indices[indices != -1])
+
+    results, start = [], 0
+    for embeddings, n in requests:
+        rows = indices[start : start + len(embeddings), :n]
+        start += len(embeddings)
+        results.append([[docs[int(i)] for i in row if i != -1 and int(i) in docs] for row in rows])
+    return results
+
+
+def search_bm25(context, requests):
+    """Answer [(texts, n)] with one BM25 pass: per request, a doc list per text."""
+    texts = [text for texts, _ in requests for text in texts]
+    hits = context.bm25().top_n_many([text.split() for text in texts], max(n for _, n in requests))
+    docs = context.doc_store().get_by_id([doc_id for row in hits for doc_id, _ in row])
+
+    results, start = [], 0
+    for texts, n in requests:
+        rows = hits[start : start + len(texts)]
+        start += len(texts)
+        # top_n is a deterministic ordering, so a longer list cut to n is top_n(n)
+        results.append([[docs[doc_id] for doc_id, _ in row[:n] if doc_id in docs] for row in rows])
+    return results
+
+
+class Batcher:
+    """Runs the queued requests of one kind together, on a single thread."""
+
+    def __init__(self, name, run, max_batch=MAX_BATCH, check=None):
+        self.name = name
+        self.run = run
+        self.max_batch = max_batch
+        self.check = check
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "queries": 0,
+            "batches": 0,
+            "rejected": 0,
+            "busy_seconds": 0.0,
+        }
+        threading.Thread(target=self._loop, name=f"batch-{name}", daemon=True).start()
+
+    def submit(self, payload, reply):
+        """Queue payload = (queries, n); reply(result or exception) is called once.
+
+        A payload that fails `check` is answered with the error right away.
+        """
+        if self.check is not None:
+            try:
+                self.check(payload)
+            except Exception as e:
+                with self._lock:
+                    self.stats["rejected"] += 1
+                reply(e)
+                return
+        self._queue.put((payload, reply))
+
+    def _take(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0][0])
+        while size < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0][0])
+        return batch, size
+
+    def _loop(self):
+        while True:
+            batch, size = self._take()
+            start = time.perf_counter()
+            try:
+                results = self.run([payload for payload, _ in batch])
+            except Exception as e:
+                print(f"Error during {self.name} retrieval: {e}")
+                results = [e] * len(batch)
+            with self._lock:
+                self.stats["requests"] += len(batch)
+                self.stats["queries"] += size
+                self.stats["batches"] += 1
+                self.stats["busy_seconds"] += time.perf_counter() - start
+            for (_, reply), result in zip(batch, results):
+                reply(result)
+
+    def counters(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class RetrievalServer:
+    def __init__(self, address=SOCKET, context=None, max_batch=MAX_BATCH):
+        self.address = address
+        self.context = context or get_context()
+        self.batchers = {
+            "faiss": Batcher(
+                "faiss", lambda r: search_faiss(self.context, r), max_batch, check_faiss
+            ),
+            "bm25": Batcher("bm25", lambda r: search_bm25(self.context, r), max_batch, check_bm25),
+        }
+        self._listener = None
+
+    def serve_forever(self):
+        # A socket file left by a server that died would refuse the bind
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX")
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        """Read one worker's requests; replies go out in completion order, tagged by id."""
+        send_lock = threading.Lock()
+
+        def replier(request_id):
+            def reply(result):
+                ok = not isinstance(result, Exception)
+                with send_lock:
+                    try:
+                        conn.send((request_id, ok, result if ok else str(result)))
+                    except OSError:
+                        pass  # the worker went away
+
+            return reply
+
+        try:
+            while True:
+                request_id, kind, payload = conn.recv()
+                if kind in self.batchers:
+                    self.batchers[kind].submit(payload, replier(request_id))
+                elif kind == "stats":
+                    replier(request_id)(self.counters())
+                else:
+                    replier(request_id)(ValueError(f"Unknown retrieval request {kind!r}"))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+
+    def counters(self):
+        return {
+            f"{kind}_{stat}": value
+            for kind, batcher in self.batchers.items()
+            for stat, value in batcher.counters().items()
+        }
+
+
+class RetrievalClient:
+    """One worker's connection to the retrieval server, shared by its threads.
+
+    Requests from concurrent threads are pipelined on the connection and
+    matched to their replies by id. A broken connection fails the requests
+    in flight and is reopened by the next request.
+    """
+
+    def __init__(self, address=SOCKET, timeout=TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._conn = None
+        self._pending = None
+
+    def _connection(self):
+        # Called with self._lock held
+        if self._conn is None:
+            self._conn, self._pending = Client(self.address, family="AF_UNIX"), {}
+            threading.Thread(
+                target=self._read, args=(self._conn, self._pending), daemon=True
+            ).start()
+        return self._conn
+
+    def _read(self, conn, pending):
+        try:
+            while True:
+                request_id, ok, result = conn.recv()
+                with self._lock:
+                    future = pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+        except (EOFError, OSError) as e:
+            with self._lock:
+                if self._conn is conn:
+                    self._conn = None
+                failed = list(pending.values())
+                pending.clear()
+            for future in failed:
+                future.set_exception(ConnectionError(f"Retrieval server connection lost: {e}"))
+
+    def request(self, kind, payload):
+        future = Future()
+        with self._lock:
+            conn = self._connection()
+            request_id = next(self._ids)
+            pending = self._pending
+            pending[request_id] = future
+            try:
+                conn.send((request_id, kind, payload))
+            except OSError:
+                pending.pop(request_id, None)
+                self._conn = None
+                raise
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            # A timed-out request's reply may never come; don't keep its future
+            with self._lock:
+                pending.pop(request_id, None)
+
+    def faiss(self, embeddings, n):
+        """Docs for the top n hits of each row of `embeddings`, as retrieveFAISSBatch returns."""
+        return self.request("faiss", (np.asarray(embeddings, dtype="float32"), n))
+
+    def bm25(self, texts, n):
+        """Docs for the top n BM25 hits of each text, as retrieveBM25Batch returns."""
+        return self.request("bm25", (list(texts), n))
+
+    def counters(self):
+        return self.request("stats", None)
+
+    def wait_until_ready(self, timeout=60.0):
+        """Block until the server answers, e.g. while it is still loading at startup."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.counters()
+            except (OSError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide retrieval server client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RetrievalClient()
+    return _client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=SOCKET or "retrieval.sock")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    args = parser.parse_args()
+
+    # Same checks and warm-up as an API worker, before the socket accepts anyone
+    from startup import check_artifacts
+
+    context = get_context()
+    problems = check_artifacts(context)
+    for problem in problems:
+        print(f"Not ready: {problem}")
+    if problems:
+        sys.exit(1)
+    context.index()
+    context.bm25()
+    context.doc_store()
+
+    server = RetrievalServer(args.socket, context, args.max_batch)
+    print(f"Serving retrieval on {args.socket}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
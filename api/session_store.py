@@ -0,0 +1,227 @@
+"""Server-side conversation sessions between /api/generate and /api/analyze.
+
+/api/generate stores the query, its embedding, the candidates and the
+follow-up questions under an opaque session id; /api/analyze then needs
+only that id and the user's answers instead of the whole candidate dict.
+
+Sessions are bounded by SESSION_MAX_ENTRIES (least recently used first
+out) and expire SESSION_TTL seconds after their last use. By default they
+are kept in a SQLite file (SESSION_STORE_PATH, WAL mode) that every worker
+process on the host shares, so /api/analyze may land on any worker. With
+SESSION_STORE_PATH="" they live in process memory instead, which only
+works with a single worker. Workers on different hosts need a shared
+SESSION_STORE_PATH or session affinity at the load balancer; clients that
+still get a 404 can resend the full payload (see analyze_inputs in index.py).
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+STORE_PATH = os.getenv("SESSION_STORE_PATH", "sessions.sqlite")
+MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+TTL_SECONDS = float(os.getenv("SESSION_TTL", "1800"))
+
+
+class SessionStore:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+        self.stats = {"created": 0, "hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def create(self, **fields):
+        """Store `fields` under a new session id and return the id."""
+        session_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl, dict(fields))
+            self.stats["created"] += 1
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self.stats["evictions"] += 1
+        return session_id
+
+    def get(self, session_id):
+        """Return the session's fields (refreshing its TTL), or None if unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expires, fields = entry
+            if expires <= now:
+                del self._sessions[session_id]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._sessions[session_id] = (now + self.ttl, fields)
+            self._sessions.move_to_end(session_id)
+            self.stats["hits"] += 1
+            return fields
+
+    def update(self, session_id, **fields):
+        """Merge `fields` into a live session; returns False if it is gone."""
+        session = self.get(session_id)
+        if session is None:
+            return False
+        with self._lock:
+            session.update(fields)
+        return True
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def counters(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["sessions"] = len(self._sessions)
+        return stats
+
+
+class SqliteSessionStore:
+    """SessionStore over a SQLite file shared by every worker on the host.
+
+    Fields are stored as JSON, so they come back as plain lists and dicts
+    (a numpy embedding is returned as a list).
+    """
+
+    def __init__(self, path=STORE_PATH, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.stats = {"created": 0, "hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(id TEXT PRIMARY KEY, expires REAL, fields TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def create(self, **fields):
+        """Store `fields` under a new session id and return the id."""
+        session_id = secrets.token_urlsafe(16)
+        # Wall clock, since the expiry is shared between processes
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO sessions (id, expires, fields) VALUES (?, ?, ?)",
+                (session_id, now + self.ttl, _dumps(fields)),
+            )
+            conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+            # Expiry tracks the last use, so the earliest to expire is the least recently used
+            evicted = conn.execute(
+                "DELETE FROM sessions WHERE id IN "
+                "(SELECT id FROM sessions ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("created")
+        if evicted > 0:
+            self._count("evictions", evicted)
+        return session_id
+
+    def get(self, session_id):
+        """Return the session's fields (refreshing its TTL), or None if unknown or expired."""
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT expires, fields FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        expires, fields = row
+        if expires <= now:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._count("expired")
+            self._count("misses")
+            return None
+        conn.execute("UPDATE sessions SET expires = ? WHERE id = ?", (now + self.ttl, session_id))
+        self._count("hits")
+        return json.loads(fields)
+
+    def update(self, session_id, **fields):
+        """Merge `fields` into a live session; returns False if it is gone."""
+        now = time.time()
+        conn = self._connection()
+        # Read-modify-write under the write lock so concurrent updates from other workers merge
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT fields FROM sessions WHERE id = ? AND expires > ?", (session_id, now)
+            ).fetchone()
+            if row is not None:
+                session = json.loads(row[0])
+                session.update(fields)
+                conn.execute(
+                    "UPDATE sessions SET expires = ?, fields = ? WHERE id = ?",
+                    (now + self.ttl, _dumps(session), session_id),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("hits" if row is not None else "misses")
+        return row is not None
+
+    def delete(self, session_id):
+        self._connection().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def counters(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["sessions"] = self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires > ?", (time.time(),)
+        ).fetchone()[0]
+        return stats
+
+
+def _dumps(fields):
+    return json.dumps(fields, default=lambda value: value.tolist())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide session store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SqliteSessionStore() if STORE_PATH else SessionStore()
+    return _store
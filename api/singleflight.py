@@ -0,0 +1,123 @@
+"""Coalescing of identical in-flight calls.
+
+Concurrent calls with the same key share one execution: the first caller
+(the leader) runs the function and every caller that arrives while it is
+running waits for and receives the same result, or the same exception.
+Nothing is cached; once the call returns the next one runs again.
+
+    understand_flights = singleflight.group("understand")
+    vector = understand_flights.do(("ada-002", text), embed, text)
+
+or as a decorator keyed on the arguments:
+
+    @singleflight.coalesce("understand", key=lambda text: text)
+    def Understand(text): ...
+
+Results are shared by every waiting caller, so treat them as read-only.
+SINGLEFLIGHT=0 turns coalescing off. Per-group counts of leaders and
+coalesced callers are exported as singleflight_calls_total{group,role}.
+"""
+
+import functools
+import os
+import threading
+
+import metrics
+
+ENABLED = os.getenv("SINGLEFLIGHT", "1") == "1"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing it with concurrent calls for `key`."""
+        if not ENABLED:
+            return fn(*args, **kwargs)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self.stats["leaders" if leader else "coalesced"] += 1
+        metrics.registry.inc(
+            "singleflight_calls_total", group=self.name, role="leader" if leader else "coalesced"
+        )
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def counters(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def group(name):
+    """Return the process-wide group `name`, creating it on first use."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = Group(name)
+        return _groups[name]
+
+
+def coalesce(name, key):
+    """Decorate fn so concurrent calls with equal key(*args, **kwargs) share one execution."""
+
+    def decorate(fn):
+        flights = group(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return flights.do(key(*args, **kwargs), fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def counters():
+    """Return {"<group>_<stat>": value} for every group, for gauges and reports."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {
+        f"{flights.name}_{stat}": value
+        for flights in groups
+        for stat, value in flights.counters().items()
+    }
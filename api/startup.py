@@ -0,0 +1,116 @@
+"""Startup checks and warm-up for the API workers.
+
+Booting a worker builds nothing. It checks that the prebuilt artifacts
+exist and that the FAISS index was built from the current corpus version,
+then loads them on a background thread while /healthz already answers;
+/readyz turns 200 once everything is resident. Workers that use a
+retrieval server (RETRIEVAL_SOCKET) load nothing and are ready once it
+answers.
+
+Build or refresh the artifacts offline with `python RetrievalDB.py`, or
+`python faiss_index.py build` and `python bm25_index.py build`.
+"""
+
+import os
+import threading
+import time
+
+import bm25_index
+from doc_store import MmapDocStore
+
+
+def check_artifacts(context, meta_path=None):
+    """Return a list of problems with the artifacts `context` would serve from."""
+    # pyarrow and faiss come in with these; keep them off the import path of index.py
+    import corpus_store
+    import index_config
+
+    meta_path = meta_path or corpus_store.META_PATH
+    problems = []
+    if not os.path.isfile(context.index_path):
+        problems.append(
+            f"FAISS index {context.index_path} not found; build it with `python faiss_index.py build`."
+        )
+    elif os.path.isfile(meta_path):
+        built_from = index_config.read_manifest(context.index_path).get("corpus_version")
+        current = corpus_store.corpus_version(meta_path)
+        if built_from and current and built_from != current:
+            problems.append(
+                f"FAISS index {context.index_path} was built from corpus {built_from} but "
+                f"{meta_path} is {current}; rebuild it with `python faiss_index.py build`."
+            )
+    if bm25_index.current_generation(context.bm25_path) is None:
+        problems.append(
+            f"BM25 index {context.bm25_path} not found; build it with `python bm25_index.py build`."
+        )
+    if context.doc_store_backend == "mmap" and not MmapDocStore.exists(context.doc_store_path):
+        problems.append(
+            f"Doc store {context.doc_store_path} not found; build it with `python doc_store.py build`."
+        )
+    return problems
+
+
+class Startup:
+    """Runs check_artifacts and the warm-up once, and reports readiness."""
+
+    def __init__(self):
+        self.state = "starting"
+        self.problems = []
+        self.seconds = {}
+        self._started = time.monotonic()
+        self._thread = None
+
+    def start(self, context=None):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(context,), name="startup", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.state
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        fn()
+        self.seconds[name] = time.perf_counter() - start
+
+    def _run(self, context):
+        try:
+            import retrieval_server
+
+            if retrieval_server.SOCKET:
+                # The retrieval server owns the artifacts; ready once it answers
+                self._timed("retrieval_server", retrieval_server.get_client().wait_until_ready)
+            else:
+                if context is None:
+                    from retrieval_context import get_context
+
+                    context = get_context()
+                self.problems = check_artifacts(context)
+                if self.problems:
+                    for problem in self.problems:
+                        print(f"Not ready: {problem}")
+                    self.state = "failed"
+                    return
+                self._timed("faiss", context.index)
+                self._timed("bm25", context.bm25)
+                self._timed("doc_store", context.doc_store)
+            # Deferred from import time; the first vote would otherwise pay for it
+            self._timed("pandas", lambda: __import__("pandas"))
+            self.state = "ready"
+            print(f"Ready in {time.monotonic() - self._started:.2f}s")
+        except Exception as e:
+            self.problems = [f"Warm-up failed: {e}"]
+            self.state = "failed"
+            print(self.problems[0])
+
+    def status(self):
+        return {
+            "status": self.state,
+            "problems": self.problems,
+            "seconds": self.seconds,
+            "uptime_seconds": time.monotonic() - self._started,
+        }
@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+# The api modules are imported by bare name, as index.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    """Start a StubOpenAIServer(**options) and point the agents at it, without rate limits.
+
+    Each test also gets an empty in-memory LLM cache.
+    """
+    import openai
+
+    import llm_cache
+    import openai_client
+    from benchmark.stub_openai import StubOpenAIServer
+
+    servers = []
+
+    def start(**options):
+        server = StubOpenAIServer(**options).start()
+        servers.append(server)
+        monkeypatch.setattr(openai, "api_base", server.api_base)
+        monkeypatch.setattr(openai, "api_key", "stub")
+        monkeypatch.setattr(openai_client, "DEFAULT_RPM", 1e9)
+        monkeypatch.setattr(openai_client, "DEFAULT_TPM", 1e9)
+        monkeypatch.setattr(openai_client, "_limiters", {})
+        monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMCache(path=""))
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture(scope="session")
+def corpus_dir(tmp_path_factory):
+    """A small synthetic corpus with its FAISS index, BM25 index and mmap doc store."""
+    from benchmark.synthetic_corpus import build_indexes, write_corpus
+
+    out = str(tmp_path_factory.mktemp("corpus"))
+    write_corpus(out, 500)
+    build_indexes(out)
+    return out
+
+
+@pytest.fixture
+def retrieval(corpus_dir, monkeypatch):
+    """Point Query's retrieval at the synthetic corpus, with an empty in-memory embedding cache."""
+    import embedding_cache
+    import retrieval_context
+    import retrieval_server
+
+    context = retrieval_context.RetrievalContext(
+        index_path=os.path.join(corpus_dir, "wiki_faiss.index"),
+        bm25_path=os.path.join(corpus_dir, "wiki_bm25"),
+        doc_store_backend="mmap",
+        doc_store_path=os.path.join(corpus_dir, "wiki_docs"),
+    )
+    monkeypatch.setattr(retrieval_context, "_context", context)
+    monkeypatch.setattr(retrieval_server, "SOCKET", "")
+    monkeypatch.setattr(embedding_cache, "_cache", embedding_cache.EmbeddingCache(path=""))
+    return context
+
+
+@pytest.fixture
+def app(retrieval, monkeypatch):
+    """The Flask app with in-memory sessions and no vote log, without the startup warm-up."""
+    monkeypatch.setenv("WARM_ON_IMPORT", "0")
+    import index
+    import session_store
+    import vote_log
+
+    monkeypatch.setattr(session_store, "_store", session_store.SessionStore())
+    monkeypatch.setattr(vote_log, "_log", vote_log.VoteLog(directory=""))
+    return index.app
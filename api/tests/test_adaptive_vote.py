@@ -0,0 +1,54 @@
+"""Adaptive voting stops after the first round once the winner is clear."""
+
+import time
+
+import pytest
+
+import Generation
+import vote_log
+from benchmark.stub_openai import DIAGNOSES
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+
+@pytest.fixture(autouse=True)
+def no_vote_log(monkeypatch):
+    monkeypatch.setattr(vote_log, "_log", vote_log.VoteLog(directory=""))
+
+
+def vote(statement):
+    return Generation.vote_for_results(CANDIDATES, statement, FOLLOWUP_Q, FOLLOWUP_A)
+
+
+def test_clear_margin_skips_the_second_round(stub_openai):
+    server = stub_openai()
+    df = vote(f"{QUERY} (agreeing judges)")
+    assert len(df.attrs["round_seconds"]) == 1
+    assert df.attrs["margin"] >= Generation.VOTE_MARGIN
+    assert df["Votes"].idxmax() == DIAGNOSES[0]
+    assert server.requests == 3
+
+
+def test_split_judges_get_a_second_round(stub_openai):
+    server = stub_openai(split_judges=True)
+    df = vote(f"{QUERY} (split judges)")
+    assert len(df.attrs["round_seconds"]) == 2
+    assert server.requests == 6
+
+
+def test_fixed_voting_always_runs_two_rounds(stub_openai, monkeypatch):
+    server = stub_openai()
+    monkeypatch.setattr(Generation, "ADAPTIVE_VOTING", False)
+    df = vote(f"{QUERY} (fixed voting)")
+    assert len(df.attrs["round_seconds"]) == 2
+    assert server.requests == 6
+
+
+def test_quorum_ends_the_round_without_the_slow_judge(stub_openai, monkeypatch):
+    stub_openai(model_latency={"gpt-4": 5.0})
+    monkeypatch.setattr(Generation, "VOTE_QUORUM", 2)
+    start = time.perf_counter()
+    df = vote(f"{QUERY} (quorum)")
+    assert time.perf_counter() - start < 2.0
+    assert len(df.attrs["round_seconds"]) == 1
+    assert (df["gpt-4"] == 0).all()
+    assert df["Votes"].idxmax() == DIAGNOSES[0]
@@ -0,0 +1,47 @@
+"""The batch path embeds in multi-input requests and searches FAISS as one matrix."""
+
+from Input_pip import Query
+
+QUERIES = [
+    "I keep feeling tired and I cannot focus at work",
+    "I worry about everything and sleep badly",
+    "Nothing seems fun any more",
+    "I keep feeling tired and I cannot focus at work",
+]
+
+
+def test_batch_matches_single_queries(stub_openai, retrieval, monkeypatch):
+    server = stub_openai()
+    searches = []
+    retrieve_faiss_batch = Query.retrieveFAISSBatch
+
+    def spy(embeddings, n):
+        searches.append(embeddings.shape)
+        return retrieve_faiss_batch(embeddings, n)
+
+    monkeypatch.setattr(Query, "retrieveFAISSBatch", spy)
+    batched = Query.generate_candidates(QUERIES, 5, chunk_size=3)
+
+    # One embedding request for the first chunk; the second repeats a query already embedded
+    assert server.requests == 1
+    assert searches == [(3, 1536), (1, 1536)]
+    singles = [Query.generate_candidate(query, 5) for query in QUERIES]
+    assert server.requests == 1  # served from the embedding cache
+    assert batched == singles
+    assert all(batched)
+
+
+def test_batch_endpoint(stub_openai, app):
+    server = stub_openai()
+    client = app.test_client()
+
+    response = client.post("/api/generate/batch", json={"queries": QUERIES[:2], "followups": True})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["initialQuery"] for r in results] == QUERIES[:2]
+    assert [r["candidates"] for r in results] == Query.generate_candidates(QUERIES[:2], 5)
+    assert all(len(r["followupQuestions"]) == 5 for r in results)
+    # One embedding request for both queries, then one follow-up request each
+    assert server.requests == 3
+
+    assert client.post("/api/generate/batch", json={"queries": "one"}).status_code == 400
@@ -0,0 +1,60 @@
+"""BM25Index ranks like rank_bm25.BM25Okapi.get_top_n."""
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from bm25_index import BM25Index
+from retrieval_context import RetrievalContext
+
+# Most terms are in most documents, so the average idf, and with it the
+# epsilon floor given to common terms, is negative
+CORPUS = [
+    "sleep mood fatigue",
+    "sleep mood fatigue",
+    "sleep mood fatigue worry",
+    "sleep mood fatigue",
+    "sleep mood fatigue",
+    "focus",
+]
+QUERIES = [["sleep"], ["sleep", "worry"], ["worry"], ["focus", "mood"], ["absent"]]
+
+def reference_top_n(query, n):
+    bm25 = BM25Okapi([text.split() for text in CORPUS])
+    scores = bm25.get_scores(query)
+    order = np.argsort(scores, kind="stable")[::-1][:n]
+    return [(int(i), float(scores[i])) for i in order]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("n", [1, 3, 6])
+def test_top_n_matches_bm25okapi_with_negative_scores(query, n):
+    index = BM25Index.build(enumerate(CORPUS))
+    expected = reference_top_n(query, n)
+    for hits in (index.top_n(query, n), index.top_n_many([query], n)[0]):
+        assert [doc_id for doc_id, _ in hits] == [doc_id for doc_id, _ in expected]
+        np.testing.assert_allclose([s for _, s in hits], [s for _, s in expected])
+
+
+def test_updates_go_to_a_copy(tmp_path):
+    index = BM25Index.build(enumerate(CORPUS))
+    before = index.top_n(["worry"], 2)
+    updated = index.copy()
+    updated.add_documents([(10, "worry worry")])
+    updated.remove_documents([5])
+    assert index.top_n(["worry"], 2) == before
+    assert updated.top_n(["worry"], 1)[0][0] == 10
+
+
+def test_context_fails_fast_without_an_index(tmp_path):
+    context = RetrievalContext(bm25_path=str(tmp_path / "wiki_bm25"), check_interval=0)
+    with pytest.raises(FileNotFoundError):
+        context.bm25()
+
+    BM25Index.build(enumerate(CORPUS)).save(context.bm25_path)
+    first = context.bm25()
+    updated = first.copy()
+    updated.add_documents([(10, "worry worry")])
+    updated.save(context.bm25_path)
+    assert context.bm25() is not first
+    assert context.bm25().top_n(["worry"], 1)[0][0] == 10
@@ -0,0 +1,55 @@
+"""Generations of the mmap doc store and their pickup by RetrievalContext."""
+
+import os
+
+import numpy as np
+
+from doc_store import MmapDocStore, current_generation
+from retrieval_context import RetrievalContext
+
+
+def documents(n, version):
+    return [(i, f"topic {i}", f"summary {i} v{version}") for i in range(n)]
+
+
+def test_rebuild_swaps_generations(tmp_path):
+    path = str(tmp_path / "wiki_docs")
+    MmapDocStore.build(documents(10, 1), path)
+    assert current_generation(path) == "gen-000001"
+    old = MmapDocStore(path)
+
+    MmapDocStore.build(documents(12, 2), path)
+    assert current_generation(path) == "gen-000002"
+    assert sorted(os.listdir(path)) == ["CURRENT", "gen-000002"]
+    # A reader of the old generation keeps working after it is removed
+    assert old.get_many([3]) == [{"Topic": "topic 3", "Summary": "summary 3 v1"}]
+    new = MmapDocStore(path)
+    assert len(new) == 12
+    assert new.get_many([3]) == [{"Topic": "topic 3", "Summary": "summary 3 v2"}]
+
+
+def test_store_without_generations(tmp_path):
+    path = tmp_path / "wiki_docs"
+    path.mkdir()
+    record = "topic 1\0summary 1".encode("utf-8")
+    np.save(path / "ids.npy", np.array([1], dtype=np.int64))
+    np.save(path / "offsets.npy", np.array([0, len(record)], dtype=np.int64))
+    (path / "records.bin").write_bytes(record)
+
+    assert MmapDocStore(str(path)).get_many([1]) == [{"Topic": "topic 1", "Summary": "summary 1"}]
+    MmapDocStore.build(documents(2, 2), str(path))
+    assert sorted(os.listdir(path)) == ["CURRENT", "gen-000001"]
+    assert MmapDocStore(str(path)).get_many([1]) == [
+        {"Topic": "topic 1", "Summary": "summary 1 v2"}
+    ]
+
+
+def test_context_reopens_after_rebuild(tmp_path):
+    path = str(tmp_path / "wiki_docs")
+    MmapDocStore.build(documents(5, 1), path)
+    context = RetrievalContext(doc_store_backend="mmap", doc_store_path=path, check_interval=0)
+    assert context.doc_store().existing_ids(range(10)) == set(range(5))
+    assert context.doc_store() is context.doc_store()
+
+    MmapDocStore.update([(7, "topic 7", "summary 7")], deletes=[0], path=path)
+    assert context.doc_store().existing_ids(range(10)) == {1, 2, 3, 4, 7}
@@ -0,0 +1,38 @@
+"""The SQLite tier of the embedding cache: large lookups and its row bound."""
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+MODEL = "text-embedding-ada-002"
+
+
+def vector(i):
+    return np.full(4, i, dtype="float32")
+
+
+def test_lookup_of_more_keys_than_sqlite_parameters(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    texts = [f"text {i}" for i in range(1200)]
+    EmbeddingCache(path, max_rows=0).put_many(MODEL, texts, [vector(i) for i in range(1200)])
+
+    # A fresh in-memory tier, so every hit comes from SQLite
+    cache = EmbeddingCache(path, max_rows=0)
+    found = cache.get_many(MODEL, texts + ["unknown"])
+    assert found[-1] is None
+    assert all((found[i] == vector(i)).all() for i in range(1200))
+    assert cache.counters()["disk_hits"] == 1200
+
+
+def test_sqlite_tier_keeps_the_most_recent_rows(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer = EmbeddingCache(path, max_rows=3)
+    for i in range(5):
+        writer.put(MODEL, f"text {i}", vector(i))
+    # Rewriting an old text makes it recent again
+    writer.put(MODEL, "text 2", vector(2))
+    writer.put(MODEL, "text 5", vector(5))
+    assert writer.counters()["disk_evictions"] == 3
+
+    found = EmbeddingCache(path, max_rows=3).get_many(MODEL, [f"text {i}" for i in range(6)])
+    assert [v is not None for v in found] == [False, False, True, False, True, True]
@@ -0,0 +1,172 @@
+"""Incremental adds, replacements and deletes on every index type."""
+
+import numpy as np
+import pytest
+
+import index_config
+from faiss_index import DIMENSION, build_index
+
+PARAMS = {"ivf_pq": {"m": 8, "nbits": 4}}  # small codebooks train quickly
+
+
+def vectors(n, seed):
+    return np.random.default_rng(seed).standard_normal((n, DIMENSION)).astype("float32")
+
+
+@pytest.fixture(params=sorted(index_config.INDEX_TYPES))
+def index(request):
+    base = vectors(300, 0)
+    ids = np.arange(300, dtype=np.int64)
+    return build_index(
+        base,
+        np.ones(len(base), dtype=bool),
+        ids,
+        index_type=request.param,
+        params=PARAMS.get(request.param),
+    )
+
+
+def nearest(index, queries):
+    _, found = index.search(queries, 1)
+    return found[:, 0].tolist()
+
+
+def test_add_new_ids(index):
+    new = vectors(5, 1)
+    index.add(np.arange(1000, 1005), new)
+    assert index.ntotal == 305
+    assert sorted(index.ids().tolist()) == list(range(300)) + list(range(1000, 1005))
+    if index.index_type != "ivf_pq":  # PQ codes are too lossy for an exact match
+        assert nearest(index, new) == list(range(1000, 1005))
+
+
+def test_add_existing_ids(index):
+    new = vectors(2, 2)
+    if index.index_type == "hnsw":
+        with pytest.raises(ValueError):
+            index.add([3, 4], new)
+        assert index.ntotal == 300
+        return
+    index.add([3, 4], new)
+    assert index.ntotal == 300
+    assert sorted(index.ids().tolist()) == list(range(300))
+    if index.index_type != "ivf_pq":
+        assert nearest(index, new) == [3, 4]
+
+
+def test_delete(index):
+    if index.index_type == "hnsw":
+        assert index.delete([5000]) == 0
+        with pytest.raises(ValueError):
+            index.delete([5000, 7])
+        return
+    assert index.delete([7, 8, 5000]) == 2
+    assert index.ntotal == 298
+    assert index.delete([7]) == 0
+
+
+def test_upsert_and_delete_update_every_store(tmp_path):
+    from corpus_store import corpus_version, load_metadata, load_vectors, write_corpus
+    from doc_store import MmapDocStore
+    from faiss_index import WikiIndex, delete_topics, upsert_topics
+
+    paths = {
+        "path": str(tmp_path / "wiki_faiss.index"),
+        "doc_store_path": str(tmp_path / "wiki_docs"),
+        "meta_path": str(tmp_path / "wiki_meta.parquet"),
+        "vectors_path": str(tmp_path / "wiki_vectors.npy"),
+    }
+    base = vectors(20, 3)
+    records = [
+        {"_id": i, "Topic": f"topic {i}", "Summary": f"summary {i}", "Embeded": base[i]}
+        for i in range(20)
+    ]
+    write_corpus(records, paths["meta_path"], paths["vectors_path"])
+    MmapDocStore.build(
+        ((r["_id"], r["Topic"], r["Summary"]) for r in records), paths["doc_store_path"]
+    )
+    index = build_index(base, np.ones(20, dtype=bool), np.arange(20))
+    index.corpus_version = corpus_version(paths["meta_path"])
+
+    new = vectors(2, 4)
+    upsert_topics(
+        index,
+        None,
+        [
+            {"_id": 5, "Topic": "new 5", "Summary": "changed", "Embeded": new[0]},
+            {"_id": 100, "Topic": "new 100", "Summary": "added", "Embeded": new[1]},
+        ],
+        **paths,
+    )
+    delete_topics(index, None, [7], **paths)
+
+    expected = sorted(set(range(20)) - {7} | {100})
+    meta = load_metadata(paths["meta_path"])
+    corpus_vectors = load_vectors(paths["vectors_path"])
+    assert sorted(meta["_id"]) == expected
+    assert len(corpus_vectors) == len(meta)
+    row = {doc_id: i for i, doc_id in enumerate(meta["_id"])}
+    np.testing.assert_array_equal(corpus_vectors[row[100]], new[1])
+    np.testing.assert_array_equal(corpus_vectors[row[5]], new[0])
+    assert meta["Summary"][row[5]] == "changed"
+
+    store = MmapDocStore(paths["doc_store_path"])
+    assert store.existing_ids(range(200)) == set(expected)
+    assert store.get_many([5, 100]) == [
+        {"Topic": "new 5", "Summary": "changed"},
+        {"Topic": "new 100", "Summary": "added"},
+    ]
+
+    saved = WikiIndex.load(paths["path"])
+    assert sorted(saved.ids().tolist()) == expected
+    # The index still matches the corpus it now describes
+    assert saved.corpus_version == corpus_version(paths["meta_path"])
+
+
+def test_failed_upsert_leaves_stores_unchanged(tmp_path):
+    from corpus_store import corpus_version, load_metadata, write_corpus
+    from doc_store import MmapDocStore
+    from faiss_index import upsert_topics
+
+    class Collection:
+        def __init__(self):
+            self.writes = []
+
+        def bulk_write(self, requests, ordered=True):
+            self.writes.extend(requests)
+
+    paths = {
+        "path": str(tmp_path / "wiki_faiss.index"),
+        "doc_store_path": str(tmp_path / "wiki_docs"),
+        "meta_path": str(tmp_path / "wiki_meta.parquet"),
+        "vectors_path": str(tmp_path / "wiki_vectors.npy"),
+    }
+    base = vectors(20, 5)
+    records = [
+        {"_id": i, "Topic": f"topic {i}", "Summary": f"summary {i}", "Embeded": base[i]}
+        for i in range(20)
+    ]
+    write_corpus(records, paths["meta_path"], paths["vectors_path"])
+    MmapDocStore.build(
+        ((r["_id"], r["Topic"], r["Summary"]) for r in records), paths["doc_store_path"]
+    )
+    index = build_index(base, np.ones(20, dtype=bool), np.arange(20), index_type="hnsw")
+    version = corpus_version(paths["meta_path"])
+    collection = Collection()
+
+    with pytest.raises(ValueError):
+        upsert_topics(
+            index,
+            collection,
+            [{"_id": 5, "Topic": "new 5", "Summary": "changed", "Embeded": vectors(1, 6)[0]}],
+            **paths,
+        )
+
+    assert collection.writes == []
+    assert MmapDocStore(paths["doc_store_path"]).get_many([5]) == [
+        {"Topic": "topic 5", "Summary": "summary 5"}
+    ]
+    assert corpus_version(paths["meta_path"]) == version
+    assert load_metadata(paths["meta_path"])["Summary"][5] == "summary 5"
+    assert index.ntotal == 20
+    assert not (tmp_path / "wiki_faiss.index").exists()
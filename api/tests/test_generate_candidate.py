@@ -0,0 +1,38 @@
+"""generate_candidate overlaps BM25 retrieval with the embedding request."""
+
+import threading
+
+from Input_pip import Query
+
+QUERY = "I keep feeling tired and I cannot focus at work"
+
+
+def test_bm25_runs_while_the_embedding_is_in_flight(stub_openai, retrieval, monkeypatch):
+    stub_openai()
+    embedding_started, bm25_started = threading.Event(), threading.Event()
+    overlapped = []
+    embed_texts, retrieve_bm25 = Query.embedTexts, Query.retrieveBM25
+
+    # Each side waits for the other to have started, which only happens if they overlap
+    def embed(texts):
+        embedding_started.set()
+        overlapped.append(bm25_started.wait(5))
+        return embed_texts(texts)
+
+    def bm25(input_text, n):
+        bm25_started.set()
+        overlapped.append(embedding_started.wait(5))
+        return retrieve_bm25(input_text, n)
+
+    monkeypatch.setattr(Query, "embedTexts", embed)
+    monkeypatch.setattr(Query, "retrieveBM25", bm25)
+    candidates, timings, embedding = Query.generate_candidate_timed(QUERY, 5)
+
+    assert overlapped == [True, True]
+    assert {"embed", "faiss", "bm25", "total"} <= set(timings)
+    expected = {}
+    for doc in Query.retrieveFAISS(embedding, 5) + retrieve_bm25(QUERY, 5):
+        expected.setdefault(doc["Topic"], doc["Summary"])
+    assert len(expected) >= 5
+    assert candidates == expected
+    assert Query.generate_candidate(QUERY, 5) == expected
@@ -0,0 +1,49 @@
+"""Hedged requests: a slow primary is beaten by the backup, and an unsent loser is dropped."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import hedge
+import metrics
+
+MESSAGES = [{"role": "user", "content": "How do I sleep better?"}]
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(hedge, "ENABLED", True)
+    monkeypatch.setattr(hedge, "INITIAL_DELAY", 0.1)
+    monkeypatch.setattr(hedge, "_windows", {})
+
+
+def outcomes(agent):
+    return {
+        dict(labels)["outcome"]: value
+        for (name, labels), value in metrics.registry._counters.items()
+        if name == "hedge_requests_total" and dict(labels)["agent"] == agent
+    }
+
+
+def test_backup_on_the_fallback_model_wins(stub_openai, hedging, monkeypatch):
+    server = stub_openai(model_latency={"gpt-4": 2.0})
+    monkeypatch.setattr(hedge, "FALLBACKS", {"gpt-4": "gpt-4o"})
+    model, response = hedge.create(
+        "hedge_fallback", model="gpt-4", messages=MESSAGES, temperature=0
+    )
+    assert model == "gpt-4o"
+    assert response["choices"][0]["message"]["content"]
+    assert server.requests == 2
+    assert outcomes("hedge_fallback") == {"backup_won": 1}
+
+
+def test_unsent_backup_is_dropped_when_the_primary_wins(stub_openai, hedging, monkeypatch):
+    server = stub_openai(latency=0.3)
+    # A single hedge worker: the backup queues behind the primary
+    pool = ThreadPoolExecutor(1)
+    monkeypatch.setattr(hedge, "hedge_pool", pool)
+    model, _ = hedge.create("hedge_cancel", model="gpt-4o", messages=MESSAGES, temperature=0)
+    pool.shutdown(wait=True)
+    assert model == "gpt-4o"
+    assert server.requests == 1
+    assert outcomes("hedge_cancel") == {"primary_won": 1}
@@ -0,0 +1,51 @@
+"""Bounded fetch window and resume after a crash in ingest()."""
+
+import threading
+
+import pytest
+
+from ingest import ingest
+
+
+class Crash(BaseException):
+    pass
+
+
+def test_crash_stops_within_a_window_and_resumes(tmp_path):
+    topics = [f"Topic {i}" for i in range(200)]
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch_summary(topic):
+        with lock:
+            fetched.append(topic)
+            if topic == "Topic 49" and not crashed.is_set():
+                crashed.set()
+                raise Crash(topic)
+        return f"{topic} summary"
+
+    def embed_batch(summaries):
+        return [[float(len(s))] for s in summaries]
+
+    def run():
+        return ingest(
+            topics,
+            fetch_summary,
+            embed_batch,
+            checkpoint_path=checkpoint,
+            batch_size=10,
+            workers=4,
+            fetches_per_second=1e6,
+        )
+
+    crashed = threading.Event()
+    with pytest.raises(Crash):
+        run()
+    # Past the crash only the queued window and the running fetches went ahead
+    assert len(fetched) <= 50 + 10 + 4
+
+    records, stats = run()
+    assert [r["Topic"] for r in records] == topics
+    assert [r["_id"] for r in records] == list(range(200))
+    assert stats["resumed"] == 40
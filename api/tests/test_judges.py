@@ -0,0 +1,75 @@
+"""Judges that time out or fail abstain without holding up the vote."""
+
+import time
+
+import pytest
+
+import Generation
+import openai_client
+import vote_log
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+JUDGES = ["gpt-4o", "gpt-3.5-turbo", "gpt-4"]
+TIMEOUT = 0.5
+
+
+@pytest.fixture(autouse=True)
+def no_vote_log(monkeypatch):
+    monkeypatch.setattr(vote_log, "_log", vote_log.VoteLog(directory=""))
+
+
+def judge(statement, timeout=TIMEOUT):
+    return Generation.run_judges(JUDGES, str(CANDIDATES), statement, "", timeout=timeout)
+
+
+def test_slow_judge_abstains_at_the_timeout(stub_openai, capsys):
+    stub_openai(model_latency={"gpt-4": 5.0})
+    start = time.perf_counter()
+    diagnostics, seconds, skipped, judge_seconds = judge(f"{QUERY} (slow judge)")
+    assert time.perf_counter() - start < TIMEOUT + 0.5
+    assert diagnostics["gpt-4"] == {}
+    assert diagnostics["gpt-4o"] and diagnostics["gpt-3.5-turbo"]
+    assert "gpt-4" not in judge_seconds
+    assert skipped == []
+    assert f"Judge gpt-4 did not answer within {TIMEOUT}s" in capsys.readouterr().out
+
+
+def test_failing_judge_abstains(stub_openai, monkeypatch, capsys):
+    stub_openai(fail_models={"gpt-4"})
+    monkeypatch.setattr(openai_client, "MAX_RETRIES", 0)
+    diagnostics, *_ = judge(f"{QUERY} (failing judge)")
+    assert diagnostics["gpt-4"] == {}
+    assert diagnostics["gpt-4o"] and diagnostics["gpt-3.5-turbo"]
+    assert "did not answer" not in capsys.readouterr().out
+
+
+def test_judge_exception_is_reported(stub_openai, monkeypatch, capsys):
+    stub_openai()
+    timed_judge = Generation.timed_judge
+
+    def broken(voting_round, documents, inputs, followup, model, timeout):
+        if model == "gpt-4":
+            raise RuntimeError("judge crashed")
+        return timed_judge(voting_round, documents, inputs, followup, model, timeout)
+
+    monkeypatch.setattr(Generation, "timed_judge", broken)
+    diagnostics, *_ = judge(f"{QUERY} (broken judge)")
+    out = capsys.readouterr().out
+    assert diagnostics["gpt-4"] == {}
+    assert "Judge gpt-4 failed and abstains: RuntimeError('judge crashed')" in out
+    assert "did not answer" not in out
+
+
+def test_vote_stays_bounded_by_the_judge_timeout(stub_openai, monkeypatch):
+    stub_openai(model_latency={"gpt-4": 5.0}, fail_models={"gpt-3.5-turbo"})
+    monkeypatch.setattr(openai_client, "MAX_RETRIES", 0)
+    monkeypatch.setattr(Generation, "JUDGE_TIMEOUT", TIMEOUT)
+    monkeypatch.setattr(Generation, "ADAPTIVE_VOTING", False)
+    start = time.perf_counter()
+    df = Generation.vote_for_results(CANDIDATES, f"{QUERY} (bounded)", FOLLOWUP_Q, FOLLOWUP_A)
+    # At most two rounds, each cut off at the timeout
+    assert time.perf_counter() - start < 2 * TIMEOUT + 1.0
+    assert len(df.attrs["round_seconds"]) == 2
+    assert all(seconds < TIMEOUT + 0.2 for seconds in df.attrs["round_seconds"])
+    assert (df["gpt-4"] == 0).all() and (df["gpt-3.5-turbo"] == 0).all()
+    assert df["Votes"].max() == 5
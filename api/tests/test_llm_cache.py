@@ -0,0 +1,45 @@
+"""Repeated agent calls are answered from the LLM cache."""
+
+import Generation
+import llm_cache
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+
+def final(diagnosis="Depression"):
+    return Generation.final_agent("gpt-4o", diagnosis, CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+
+
+def test_hits_and_misses(stub_openai):
+    server = stub_openai()
+    cache = llm_cache.get_llm_cache()
+    params = dict(model="gpt-4o", messages=[{"role": "user", "content": "hi"}], temperature=0)
+
+    first = cache.create(**params)
+    again = cache.create(request_timeout=5, **params)
+    assert again["cached"] and not first.get("cached")
+    assert again["choices"] == first["choices"]
+    cache.create(**dict(params, temperature=0.9))
+    assert server.requests == 2
+    counters = cache.counters()
+    assert (counters["memory_hits"], counters["misses"], counters["bypassed"]) == (1, 1, 1)
+
+
+def test_repeated_final_answer_is_cached(stub_openai):
+    server = stub_openai()
+    answer = final()
+    assert final() == answer
+    stream = Generation.final_agent_stream(
+        "gpt-4o", "Depression", CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A
+    )
+    assert "".join(stream) == answer
+    assert server.requests == 1
+    final("Anxiety")
+    assert server.requests == 2
+
+
+def test_final_answer_cache_can_be_turned_off(stub_openai, monkeypatch):
+    server = stub_openai()
+    monkeypatch.setattr(Generation, "CACHE_FINAL", False)
+    final()
+    final()
+    assert server.requests == 2
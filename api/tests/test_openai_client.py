@@ -0,0 +1,65 @@
+"""Shared connection pool and request deadlines in openai_client."""
+
+import threading
+import time
+
+import openai
+import pytest
+from openai import api_requestor
+
+import openai_client
+from benchmark.stub_openai import StubOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "I cannot focus."}]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with StubOpenAIServer(latency=0.0) as server:
+        monkeypatch.setattr(openai, "api_base", server.api_base)
+        monkeypatch.setattr(openai, "api_key", "stub")
+        monkeypatch.setattr(openai, "requestssession", openai_client.session_factory())
+        monkeypatch.setattr(openai_client, "_limiters", {})
+        yield server
+
+
+def test_pool_survives_session_renewal(server, monkeypatch):
+    # openai closes and rebuilds each thread's session once it is this old
+    monkeypatch.setattr(api_requestor, "MAX_SESSION_LIFETIME_SECS", 0)
+
+    def worker():
+        for _ in range(5):
+            openai_client.chat_completion(model="gpt-4", messages=MESSAGES)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests == 20
+    assert server.connections <= 4
+
+
+def test_sessions_keep_proxy_and_connection_retries(monkeypatch):
+    monkeypatch.setattr(openai, "proxy", "http://proxy.local:3128")
+    factory = openai_client.session_factory()
+    first, second = factory(), factory()
+    assert first.proxies == {"http": "http://proxy.local:3128", "https": "http://proxy.local:3128"}
+    adapter = first.get_adapter("https://api.openai.com")
+    assert adapter is second.get_adapter("https://api.openai.com")
+    assert adapter.max_retries.total == api_requestor.MAX_CONNECTION_RETRIES
+
+
+def test_queue_time_counts_against_request_timeout(server, monkeypatch):
+    monkeypatch.setattr(openai_client, "MODEL_LIMITS", {"gpt-4": {"concurrency": 1}})
+    limiter = openai_client.limiter_for("gpt-4")
+    assert limiter.acquire(1)
+    try:
+        start = time.monotonic()
+        with pytest.raises(openai.error.Timeout):
+            openai_client.chat_completion(model="gpt-4", messages=MESSAGES, request_timeout=0.3)
+        assert time.monotonic() - start < 1.0
+    finally:
+        limiter.release()
+    assert limiter.waiting == 0 and limiter.in_flight == 0
+    assert server.requests == 0
@@ -0,0 +1,86 @@
+"""A malformed retrieval request fails alone; timed-out requests don't leak."""
+
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Listener
+
+import numpy as np
+import pytest
+
+from faiss_index import DIMENSION
+from retrieval_server import Batcher, RetrievalClient, check_bm25, check_faiss
+
+
+def submit(batcher, payload):
+    future = Future()
+    batcher.submit(
+        payload,
+        lambda result: (
+            future.set_exception(result)
+            if isinstance(result, Exception)
+            else future.set_result(result)
+        ),
+    )
+    return future
+
+
+def test_bad_requests_fail_alone():
+    release = threading.Event()
+
+    def run(requests):
+        release.wait(5)
+        matrix = np.vstack([embeddings for embeddings, _ in requests])
+        sums, start = matrix.sum(axis=1), 0
+        results = []
+        for embeddings, _ in requests:
+            results.append(sums[start : start + len(embeddings)].tolist())
+            start += len(embeddings)
+        return results
+
+    batcher = Batcher("faiss", run, check=check_faiss)
+    good = np.ones((2, DIMENSION), dtype="float32")
+    nan = good.copy()
+    nan[1, 3] = np.nan
+    futures = [
+        submit(batcher, (good, 5)),
+        submit(batcher, (np.ones((1, 7), dtype="float32"), 5)),
+        submit(batcher, (nan, 5)),
+        submit(batcher, (good.astype(object), 5)),
+        submit(batcher, (good, 0)),
+        submit(batcher, "not a payload"),
+        submit(batcher, (good[:1], 3)),
+    ]
+    release.set()
+
+    assert futures[0].result(5) == [DIMENSION, DIMENSION]
+    assert futures[-1].result(5) == [DIMENSION]
+    for future in futures[1:-1]:
+        with pytest.raises(Exception):
+            future.result(5)
+    counters = batcher.counters()
+    assert counters["requests"] == 2 and counters["rejected"] == 5
+
+
+def test_check_bm25():
+    check_bm25((["sleep", "mood"], 5))
+    for payload in [("sleep", 5), ([b"sleep"], 5), (["sleep"], -1), (["sleep"], True)]:
+        with pytest.raises(ValueError):
+            check_bm25(payload)
+
+
+def test_timed_out_request_is_forgotten(tmp_path):
+    address = str(tmp_path / "retrieval.sock")
+    listener = Listener(address, family="AF_UNIX")
+    connections = []
+    # A server that accepts requests and never answers them
+    threading.Thread(target=lambda: connections.append(listener.accept()), daemon=True).start()
+
+    client = RetrievalClient(address, timeout=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            client.bm25(["sleep"], 5)
+        assert client._pending == {}
+    finally:
+        listener.close()
+        for conn in connections:
+            conn.close()
@@ -0,0 +1,39 @@
+"""Sessions created by one worker are visible to every other worker on the host."""
+
+import numpy as np
+
+from session_store import SqliteSessionStore
+
+
+def test_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    first, second = SqliteSessionStore(path), SqliteSessionStore(path)
+
+    session_id = first.create(
+        query="q", embedding=np.ones(3, dtype="float32"), candidates={"A": "a"}
+    )
+    assert second.get(session_id) == {
+        "query": "q",
+        "embedding": [1.0, 1.0, 1.0],
+        "candidates": {"A": "a"},
+    }
+    assert second.update(session_id, followupQuestions=["why?"])
+    assert first.get(session_id)["followupQuestions"] == ["why?"]
+
+    first.delete(session_id)
+    assert second.get(session_id) is None
+    assert not second.update(session_id, followupQuestions=[])
+
+
+def test_expired_and_evicted_sessions_are_gone(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    expired = SqliteSessionStore(path, ttl=-1).create(query="old")
+    store = SqliteSessionStore(path, max_entries=2)
+    assert store.get(expired) is None
+
+    ids = [store.create(query=str(i)) for i in range(3)]
+    assert store.get(ids[0]) is None
+    assert [store.get(i)["query"] for i in ids[1:]] == ["1", "2"]
+    counters = store.counters()
+    assert counters["sessions"] == 2
+    assert counters["evictions"] >= 1
@@ -0,0 +1,70 @@
+"""Identical concurrent calls share one execution."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import singleflight
+
+
+def test_concurrent_calls_share_one_run():
+    flights = singleflight.Group("test")
+    release = threading.Event()
+    runs = []
+
+    def work(value):
+        runs.append(value)
+        release.wait(5)
+        return {"value": value}
+
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flights.do, "key", work, 1) for _ in range(5)]
+        other = pool.submit(flights.do, "other", work, 2)
+        while flights.counters()["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert runs.count(1) == 1 and other.result(5) == {"value": 2}
+    assert all(result is results[0] for result in results)
+    assert flights.counters() == {"leaders": 2, "coalesced": 4, "errors": 0, "in_flight": 0}
+    # Nothing is cached: the next call runs again
+    assert flights.do("key", work, 3) == {"value": 3}
+
+
+def test_waiters_get_the_leaders_exception():
+    flights = singleflight.Group("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flights.do, "key", fail)
+        started.wait(5)
+        waiter = pool.submit(flights.do, "key", fail)
+        while flights.counters()["coalesced"] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in (leader, waiter):
+            with pytest.raises(RuntimeError, match="boom"):
+                future.result(5)
+    assert flights.counters()["errors"] == 1
+
+
+def test_identical_generate_requests_share_one_session(stub_openai, app):
+    server = stub_openai(latency=0.3)
+    client = app.test_client()
+    body = {"query": "I keep feeling tired and I cannot focus at work"}
+
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(pool.map(lambda _: client.post("/api/generate", json=body), range(4)))
+
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.get_json()["sessionId"] for r in responses}) == 1
+    # One embedding request and one follow-up request for all four
+    assert server.requests == 2
@@ -0,0 +1,67 @@
+"""The follow-up and final agents stream their output as the model emits it."""
+
+import json
+import time
+
+import Generation
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+INPUTS = (CANDIDATES, QUERY, FOLLOWUP_Q, FOLLOWUP_A)
+
+
+def events(response):
+    """Parse a text/event-stream body into [(event, data)]."""
+    parsed = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block:
+            event, data = block.split("\n", 1)
+            parsed.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return parsed
+
+
+def test_followup_questions_arrive_before_the_stream_ends(stub_openai):
+    stub_openai(token_latency=0.01)
+    streamed = list(Generation.followup_agent_stream(QUERY, CANDIDATES))
+    kinds = [kind for kind, _ in streamed]
+
+    assert kinds.index("question") < len(kinds) - 1 - kinds[::-1].index("token")
+    questions = [text for kind, text in streamed if kind == "question"]
+    assert questions == Generation.followup_agent(QUERY, CANDIDATES)
+
+
+def test_final_answer_streams_token_by_token(stub_openai, monkeypatch):
+    stub_openai(token_latency=0.02)
+    monkeypatch.setattr(Generation, "CACHE_FINAL", False)
+    start = time.perf_counter()
+    stream = Generation.final_agent_stream("gpt-4o", "insomnia", *INPUTS)
+    first = next(stream)
+    first_seconds = time.perf_counter() - start
+    chunks = [first, *stream]
+    total_seconds = time.perf_counter() - start
+
+    assert len(chunks) > 10
+    assert first_seconds < total_seconds / 2
+    answer = Generation.final_agent("gpt-4o", "insomnia", *INPUTS)
+    # The stub streams words, so only trailing whitespace can differ
+    assert "".join(chunks) == answer.rstrip()
+
+
+def test_analyze_stream_endpoint(stub_openai, app):
+    stub_openai()
+    response = app.test_client().post(
+        "/api/analyze/stream",
+        json={
+            "initialQuery": QUERY,
+            "candidates": CANDIDATES,
+            "followUpQuestions": FOLLOWUP_Q,
+            "userFollowupResponse": FOLLOWUP_A,
+        },
+    )
+    assert response.mimetype == "text/event-stream"
+    streamed = events(response)
+    kinds = [kind for kind, _ in streamed]
+
+    assert kinds[0] == "diagnosis" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"}
+    tokens = "".join(data for kind, data in streamed if kind == "token")
+    assert streamed[-1][1] == {"result": tokens}
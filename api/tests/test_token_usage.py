@@ -0,0 +1,40 @@
+"""llm_tokens_total counts the tokens actually spent."""
+
+import Generation
+import metrics
+from benchmark.vote_fanout import CANDIDATES, FOLLOWUP_A, FOLLOWUP_Q, QUERY
+
+
+def spent(agent):
+    totals = {}
+    for (name, labels), value in metrics.registry._counters.items():
+        labels = dict(labels)
+        if name == "llm_tokens_total" and labels["agent"] == agent:
+            totals[labels["type"]] = totals.get(labels["type"], 0) + value
+    return totals
+
+
+def test_cached_replies_are_not_counted(stub_openai):
+    server = stub_openai()
+    before = spent("diagnostic_agent")
+    args = (CANDIDATES, f"{QUERY} (cached)", "", "gpt-4o")
+    first = Generation.diagnostic_agent(*args)
+    after_first = spent("diagnostic_agent")
+    assert Generation.diagnostic_agent(*args) == first
+    assert server.requests == 1
+    assert spent("diagnostic_agent") == after_first
+    assert after_first["prompt"] > before.get("prompt", 0)
+
+
+def test_streamed_replies_are_counted(stub_openai):
+    stub_openai()
+    before = spent("final_agent")
+    answer = "".join(
+        Generation.final_agent_stream(
+            "gpt-4", "Insomnia", CANDIDATES, f"{QUERY} (stream)", FOLLOWUP_Q, FOLLOWUP_A
+        )
+    )
+    after = spent("final_agent")
+    assert answer
+    assert after["prompt"] > before.get("prompt", 0)
+    assert after["completion"] > before.get("completion", 0)
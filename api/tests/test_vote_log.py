@@ -0,0 +1,33 @@
+"""Vote records reach the log file, including those still queued at exit."""
+
+import os
+import subprocess
+import sys
+
+import vote_log
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_records_are_written_in_batches(tmp_path):
+    log = vote_log.VoteLog(directory=str(tmp_path), flush_seconds=0.1)
+    for winner in ["insomnia", "adjustment disorder"]:
+        assert log.record(winner=winner)
+    assert log.flush()
+    assert [r["winner"] for r in vote_log.read_records(str(tmp_path))] == [
+        "insomnia",
+        "adjustment disorder",
+    ]
+    counters = log.counters()
+    assert (counters["written"], counters["batches"]) == (2, 1)
+
+
+def test_queued_records_are_flushed_at_exit(tmp_path):
+    # The process exits while the writer is still gathering its batch
+    code = (
+        "import vote_log\n"
+        f"log = vote_log.VoteLog(directory={str(tmp_path)!r}, flush_seconds=1.0)\n"
+        "log.record(winner='insomnia')\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=API_DIR, check=True, timeout=30)
+    assert [r["winner"] for r in vote_log.read_records(str(tmp_path))] == ["insomnia"]
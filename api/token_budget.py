@@ -0,0 +1,147 @@
+"""Token counting and prompt compaction for the voting prompts.
+
+Tokens are counted with tiktoken (pinned in requirements.txt); where it is
+missing they are estimated as one token per four characters (close for
+English prose). compact_documents
+shrinks the candidate summaries sent to the judges to a token budget:
+
+1. sentences repeated across candidates are kept only in the first one,
+2. if the summaries still don't fit, each gets an equal share of the budget
+   (short ones give their unused share to the rest) and keeps its first
+   sentence plus the sentences that share the most words with the query,
+   in their original order.
+"""
+
+import math
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens for all candidate summaries in one judge prompt
+DOCUMENT_TOKEN_BUDGET = int(os.getenv("VOTE_DOCUMENT_TOKEN_BUDGET", "1500"))
+
+_encodings = {}
+_sentence_end = re.compile(r"(?<=[.!?])\s+")
+_word = re.compile(r"[a-z0-9]+")
+
+
+def _encoding(model):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-4o"):
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def count_message_tokens(messages, model="gpt-4o"):
+    """Prompt tokens of a chat request, including the few each message adds."""
+    return sum(count_tokens(m.get("content") or "", model) + 4 for m in messages)
+
+
+def estimate_usage(model, messages, completion):
+    """A usage block for a reply the API sent none for, such as a stream."""
+    prompt = count_message_tokens(messages, model)
+    completion = count_tokens(completion, model)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+def split_sentences(text):
+    return [s for s in _sentence_end.split(text.strip()) if s]
+
+
+def _normalize(sentence):
+    return " ".join(_word.findall(sentence.lower()))
+
+
+def dedupe_sentences(documents):
+    """Drop sentences already seen in an earlier candidate; returns {topic: [sentences]}."""
+    seen = set()
+    deduped = {}
+    for topic, summary in documents.items():
+        kept = []
+        for sentence in split_sentences(summary):
+            key = _normalize(sentence)
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(sentence)
+        deduped[topic] = kept
+    return deduped
+
+
+def _fit(sentences, budget, query_words, model):
+    """Keep the first sentence, then the most query-relevant ones, within `budget`."""
+    costs = [count_tokens(s, model) for s in sentences]
+    order = sorted(
+        range(1, len(sentences)),
+        key=lambda i: -len(query_words & set(_word.findall(sentences[i].lower()))),
+    )
+    chosen, used = [], 0
+    for i in [0] + order:
+        if used + costs[i] <= budget:
+            chosen.append(i)
+            used += costs[i]
+    if not chosen and sentences:
+        # Even the first sentence is too long: cut it to the budget
+        return sentences[0][: budget * 4]
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def compact_documents(documents, budget=DOCUMENT_TOKEN_BUDGET, query="", model="gpt-4o"):
+    """Return {topic: summary} with duplicates removed and the total under `budget` tokens."""
+    deduped = dedupe_sentences(documents)
+    texts = {topic: " ".join(sentences) for topic, sentences in deduped.items()}
+    # Each "- topic: " prefix costs a few tokens too
+    overhead = sum(count_tokens(f"- {topic}: ", model) for topic in texts)
+    remaining = budget - overhead
+    sizes = {topic: count_tokens(text, model) for topic, text in texts.items()}
+    if sum(sizes.values()) <= remaining or not texts:
+        return texts
+
+    # Water-filling: small summaries keep everything, the rest split what's left
+    shares = {}
+    pending = sorted(texts, key=sizes.get)
+    while pending:
+        share = max(0, remaining) // len(pending)
+        topic = pending[0]
+        if sizes[topic] > share:
+            break
+        shares[topic] = sizes[topic]
+        remaining -= sizes[topic]
+        pending.pop(0)
+    for topic in pending:
+        shares[topic] = max(0, remaining) // len(pending)
+
+    query_words = set(_word.findall(query.lower()))
+    return {
+        topic: texts[topic]
+        if shares[topic] >= sizes[topic]
+        else _fit(deduped[topic], shares[topic], query_words, model)
+        for topic in texts
+    }
+
+
+def log_usage(agent, model, response):
+    """Print prompt/completion token usage of a ChatCompletion response."""
+    usage = response.get("usage") or {}
+    if usage:
+        print(
+            f"{agent} ({model}): {usage.get('prompt_tokens', 0)} prompt + "
+            f"{usage.get('completion_tokens', 0)} completion tokens"
+        )
+    return usage
@@ -0,0 +1,338 @@
+"""Append-only log of judge votes, written off the request path.
+
+vote_for_results hands one record per vote to record(), which only puts
+it on a bounded queue; a background thread batches whatever arrives
+within VOTE_LOG_FLUSH_SECONDS into a single append to a JSON Lines file.
+If the writer falls behind and the queue is full, records are dropped
+(and counted) rather than slowing the request down. Records still queued
+when the process exits are flushed (for up to 5 s) first.
+
+Each process writes its own file, votes-<host>-<pid>.jsonl in
+VOTE_LOG_DIR, so workers never interleave or clobber each other. A file
+larger than VOTE_LOG_MAX_BYTES is rotated to
+votes-<host>-<pid>.<time_ns>.jsonl, and only the newest VOTE_LOG_KEEP
+rotated files are kept (0 keeps all). VOTE_LOG_DIR="" turns logging off.
+
+A record holds the request's endpoint and id, per round and judge the
+scores and seconds to answer, the judges skipped, the final votes, the
+winner and what decided it. The statement itself is not stored, only a
+hash to group repeats.
+
+Summarize judge agreement and latency over the log with
+
+    python vote_log.py summarize [--dir vote_log] [--since-hours 24] [--json]
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+import metrics
+
+LOG_DIR = os.getenv("VOTE_LOG_DIR", "vote_log")
+MAX_BYTES = int(os.getenv("VOTE_LOG_MAX_BYTES", str(64 << 20)))
+KEEP = int(os.getenv("VOTE_LOG_KEEP", "20"))
+QUEUE_SIZE = int(os.getenv("VOTE_LOG_QUEUE_SIZE", "10000"))
+FLUSH_SECONDS = float(os.getenv("VOTE_LOG_FLUSH_SECONDS", "1.0"))
+
+# Most records written by one append
+MAX_BATCH = 1000
+
+ROTATED = re.compile(r"\.\d{19}\.jsonl$")
+
+
+class VoteLog:
+    def __init__(
+        self,
+        directory=LOG_DIR,
+        max_bytes=MAX_BYTES,
+        keep=KEEP,
+        queue_size=QUEUE_SIZE,
+        flush_seconds=FLUSH_SECONDS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.flush_seconds = flush_seconds
+
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.stats = {
+            "records": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "rotations": 0,
+            "errors": 0,
+        }
+
+    @property
+    def path(self):
+        # Resolved per write, so a worker forked after import gets its own file
+        return os.path.join(self.directory, f"votes-{socket.gethostname()}-{os.getpid()}.jsonl")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def _ensure_writer(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    if self._thread is None:
+                        # The writer is a daemon thread; don't lose its batch at exit
+                        atexit.register(self.flush)
+                    self._thread = threading.Thread(
+                        target=self._run, name="vote-log", daemon=True
+                    )
+                    self._thread.start()
+
+    def record(self, **fields):
+        """Queue a record for the writer thread; never blocks. Returns False if dropped."""
+        if not self.directory:
+            return False
+        request = metrics.current_request() or {}
+        fields = dict(
+            ts=time.time(), request_id=request.get("id"), endpoint=request.get("endpoint"), **fields
+        )
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("records")
+        return True
+
+    def _take(self):
+        """Block for one record, then gather what else arrives within flush_seconds."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"Error writing vote log: {e}")
+                self._count("errors", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        lines = "".join(
+            json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+            for record in batch
+        )
+        path = self.path
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            size = f.tell()
+        self._count("written", len(batch))
+        self._count("batches")
+        if size >= self.max_bytes:
+            self._rotate(path)
+
+    def _rotate(self, path):
+        os.replace(path, f"{path[: -len('.jsonl')]}.{time.time_ns()}.jsonl")
+        self._count("rotations")
+        if self.keep:
+            paths = glob.glob(os.path.join(self.directory, "votes-*.jsonl"))
+            rotated = sorted((p for p in paths if ROTATED.search(p)), key=os.path.getmtime)
+            for old in rotated[: -self.keep]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass  # another worker pruned it first
+
+    def flush(self, timeout=5.0):
+        """Wait up to `timeout` seconds for queued records to be written; True if they were."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def counters(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_vote_log():
+    """Return the process-wide vote log, creating it on first use."""
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = VoteLog()
+    return _log
+
+
+# ------------------------------------------------------------------ summarize
+
+
+def read_records(directory=LOG_DIR, since=None):
+    """Yield the records of every log file in `directory`, newer than `since` (epoch seconds)."""
+    for path in sorted(glob.glob(os.path.join(directory, "votes-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash mid-write
+                if since is None or record.get("ts", 0) >= since:
+                    yield record
+
+
+def _top(scores):
+    return max(scores, key=scores.get) if scores else None
+
+
+def _latency(values):
+    if not values:
+        return {}
+    return {
+        "p50_s": float(np.percentile(values, 50)),
+        "p95_s": float(np.percentile(values, 95)),
+        "max_s": float(max(values)),
+    }
+
+
+def summarize(records):
+    """Aggregate judge agreement and latency over vote records."""
+    votes = 0
+    decided_by = Counter()
+    vote_seconds = []
+    round_seconds = defaultdict(list)
+    judges = defaultdict(
+        lambda: {
+            "ballots": 0,
+            "answered": 0,
+            "skipped": 0,
+            "agrees_with_winner": 0,
+            "seconds": defaultdict(list),
+        }
+    )
+    pairs = defaultdict(lambda: [0, 0])  # (judge, judge) -> [same top choice, both answered]
+
+    for record in records:
+        votes += 1
+        decided_by[record.get("decided_by")] += 1
+        if record.get("seconds") is not None:
+            vote_seconds.append(record["seconds"])
+        winner = record.get("winner")
+        for voting_round in record.get("rounds", []):
+            number = voting_round.get("round")
+            round_seconds[number].append(voting_round.get("seconds", 0.0))
+            tops = {}
+            for model, ballot in voting_round.get("judges", {}).items():
+                stats = judges[model]
+                stats["ballots"] += 1
+                if model in voting_round.get("skipped", []):
+                    stats["skipped"] += 1
+                if ballot.get("scores"):
+                    stats["answered"] += 1
+                    tops[model] = _top(ballot["scores"])
+                    # Agreement with the outcome is judged on the deciding round
+                    if number == len(record["rounds"]) and tops[model] == winner:
+                        stats["agrees_with_winner"] += 1
+                if ballot.get("seconds") is not None:
+                    stats["seconds"][number].append(ballot["seconds"])
+            models = sorted(tops)
+            for i, a in enumerate(models):
+                for b in models[i + 1 :]:
+                    pairs[(a, b)][0] += tops[a] == tops[b]
+                    pairs[(a, b)][1] += 1
+
+    return {
+        "votes": votes,
+        "decided_by": dict(decided_by),
+        "vote_latency": _latency(vote_seconds),
+        "round_latency": {str(n): _latency(values) for n, values in sorted(round_seconds.items())},
+        "judges": {
+            model: {
+                "answered_rate": s["answered"] / s["ballots"] if s["ballots"] else 0.0,
+                "skipped": s["skipped"],
+                "agrees_with_winner_rate": s["agrees_with_winner"] / votes if votes else 0.0,
+                "latency": {str(n): _latency(values) for n, values in sorted(s["seconds"].items())},
+            }
+            for model, s in sorted(judges.items())
+        },
+        "pairwise_top_agreement": {
+            f"{a} / {b}": same / both for (a, b), (same, both) in sorted(pairs.items()) if both
+        },
+    }
+
+
+def print_summary(summary):
+    print(f"{summary['votes']} votes; decided by {summary['decided_by']}")
+    latencies = dict(summary["round_latency"])
+    if summary["vote_latency"]:
+        latencies["all"] = summary["vote_latency"]
+    for number, latency in latencies.items():
+        label = "vote" if number == "all" else f"round {number}"
+        print(f"  {label:<8} latency p50 {latency['p50_s']:6.2f}s  p95 {latency['p95_s']:6.2f}s")
+    print("  judge            answered  agrees w/ winner  round latency p50 / p95")
+    for model, stats in summary["judges"].items():
+        latency = "  ".join(
+            f"r{n} {l['p50_s']:.2f}/{l['p95_s']:.2f}s" for n, l in stats["latency"].items()
+        )
+        print(
+            f"  {model:<16} {stats['answered_rate']:7.0%}  "
+            f"{stats['agrees_with_winner_rate']:16.0%}  {latency}"
+        )
+    for pair, rate in summary["pairwise_top_agreement"].items():
+        print(f"  same top choice  {pair:<32} {rate:5.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    summarize_parser = commands.add_parser("summarize", help="judge agreement and latency")
+    summarize_parser.add_argument("--dir", default=LOG_DIR or "vote_log")
+    summarize_parser.add_argument("--since-hours", type=float, default=None)
+    summarize_parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours else None
+    summary = summarize(read_records(args.dir, since))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
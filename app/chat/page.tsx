@@ -12,6 +12,7 @@ import logoIconImg from '@/public/logo-icon.svg';
 import { useState, useEffect } from 'react';
 import { PlaceholdersAndVanishInput } from '@/components/ui/placeholders-and-vanish-input';
 import { v4 as uuidv4 } from 'uuid';
+import { readEventStream } from '@/lib/utils';
 
 interface Message {
     id: string;
@@ -20,8 +21,14 @@ interface Message {
 }
 
 interface finalDiagnosisPayload {
+    sessionId: string;
+    userFollowupResponse: string[];
+}
+
+// What /api/analyze needs without a session, e.g. after it expired
+interface fullDiagnosisPayload {
     initialQuery: string;
-    candidates: { [key: string]: string };
+    candidates: Record<string, string>;
     followUpQuestions: string[];
     userFollowupResponse: string[];
 }
@@ -29,7 +36,10 @@ interface finalDiagnosisPayload {
 export default function Chat() {
     const [messages, setMessages] = useState<Message[]>([]);
     const [initialQuery, setInitialQuery] = useState('');
-    const [candidates, setCandidates] = useState({});
+    // The server keeps the candidates; /api/analyze only needs this id
+    const [sessionId, setSessionId] = useState('');
+    // Kept only to resend if the server no longer has the session
+    const [candidates, setCandidates] = useState<Record<string, string>>({});
 
     const [inputValue, setInputValue] = useState('');
     const [hasSentMessage, setHasSentMessage] = useState(false);
@@ -91,9 +101,7 @@ export default function Chat() {
             setCurrentQuestionIndex((current) => current + 1);
         } else {
             const payload: finalDiagnosisPayload = {
-                initialQuery: initialQuery,
-                candidates: candidates,
-                followUpQuestions: followUpQuestions,
+                sessionId: sessionId,
                 userFollowupResponse: userFollowupResponse,
             };
             getBotFinalDiagnosis(payload);
@@ -105,13 +113,13 @@ export default function Chat() {
     // Testing userFollowupResponse for the follow up questions
     useEffect(() => {
         console.log('Updated initial query:', initialQuery);
-        console.log('Updated candidates:', candidates);
+        console.log('Updated session id:', sessionId);
         console.log('Updated follow up questions:', followUpQuestions);
         console.log(
             'Updated user responses for follow-up questions:',
             userFollowupResponse
         );
-    }, [candidates, initialQuery, followUpQuestions, userFollowupResponse]);
+    }, [sessionId, initialQuery, followUpQuestions, userFollowupResponse]);
 
     /**
      * Sends a message from the bot by updating the messages state with a new bot message.
@@ -138,7 +146,7 @@ export default function Chat() {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ query: userInput }),
+                body: JSON.stringify({ query: userInput, includeCandidates: true }),
             });
 
             if (!response.ok) {
@@ -148,7 +156,8 @@ export default function Chat() {
             const data = await response.json();
             if (data.followupQuestions && data.followupQuestions.length) {
                 setInitialQuery(data.initialQuery);
-                setCandidates(data.candidates);
+                setSessionId(data.sessionId);
+                setCandidates(data.candidates ?? {});
                 setFollowUpQuestions(data.followupQuestions);
                 setCurrentQuestionIndex(0);
                 sendBotMessage(data.followupQuestions[0]); // Send the first follow-up question
@@ -161,25 +170,57 @@ export default function Chat() {
         }
     };
 
+    /**
+     * Streams the final diagnosis from /api/analyze/stream, growing a single
+     * bot message as tokens arrive. The spinner shows until the first token.
+     * If the session is unknown to the server (expired, or created on another
+     * host), the request is resent with the full payload instead.
+     * @param payload - The session id from /api/generate and the follow-up answers.
+     */
     const getBotFinalDiagnosis = async (payload: finalDiagnosisPayload) => {
         setLoading(true);
+        const id = uuidv4();
+        let started = false;
 
-        try {
-            const response = await fetch('/api/analyze', {
+        const post = (body: finalDiagnosisPayload | fullDiagnosisPayload) =>
+            fetch('/api/analyze/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify(payload),
+                body: JSON.stringify(body),
             });
 
+        try {
+            let response = await post(payload);
+            if (response.status === 404) {
+                response = await post({
+                    initialQuery: initialQuery,
+                    candidates: candidates,
+                    followUpQuestions: followUpQuestions,
+                    userFollowupResponse: payload.userFollowupResponse,
+                });
+            }
+
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
 
-            const data = await response.json();
-            const result = data.result;
-            sendBotMessage(result);
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    if (!started) {
+                        started = true;
+                        setLoading(false);
+                        setMessages((prev) => [...prev, { id, text: data, sender: 'bot' }]);
+                    } else {
+                        setMessages((prev) =>
+                            prev.map((m) => (m.id === id ? { ...m, text: m.text + data } : m))
+                        );
+                    }
+                } else if (event === 'error') {
+                    throw new Error(data);
+                }
+            });
         } catch (error) {
             console.error('Error:', error);
             sendBotMessage('There was a problem processing your responses.');
@@ -1,3 +1,7 @@
+// The Flask API keeps /api/generate sessions in SESSION_STORE_PATH (a SQLite
+// file, see api/session_store.py). Every API worker must share that file:
+// run the workers on one host, or pin clients to a host (session affinity).
+// A client whose session isn't found gets a 404 and resends the full payload.
 /** @type {import('next').NextConfig} */
 const nextConfig = {
   rewrites: async () => {